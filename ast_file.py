@@ -0,0 +1,233 @@
+import hashlib
+import marshal
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from collections import deque
+from itertools import repeat, starmap
+from enum import Enum
+import mel_ast as ast
+import context
+import typecaster
+import vartypes
+
+MAGIC = b'MELAST'
+FORMAT_VERSION = 5
+# формат marshal между интерпретаторами не постоянен: файл читает только тот, кто его записал
+INTERPRETER = ('%s/%s' % (sys.implementation.cache_tag, marshal.version)).encode('ascii')
+# магия, версия формата, интерпретатор и версия marshal, уровень оптимизации, sha1 исходника
+HEADER = struct.Struct('<6sH24sB20s')
+
+UNSET = ...  # слот, которому значение не присваивалось
+
+
+class AstFormatError(ValueError):
+    pass
+
+
+def _registry() -> dict:
+    # классы, объекты которых могут встретиться в дереве после анализа; контексты в дерево не попадают
+    bases = (ast.AstNode, ast.Param, vartypes.DataType, context.ObjectDescription, typecaster.TypeCaster, Enum)
+    classes = {}
+    for module in (ast, context, typecaster, vartypes):
+        for value in vars(module).values():
+            if isinstance(value, type) and value.__module__ == module.__name__ and issubclass(value, bases):
+                classes[module.__name__ + '.' + value.__qualname__] = value
+    return classes
+
+
+CLASSES = _registry()
+
+
+def source_digest(source: str) -> bytes:
+    return hashlib.sha1(source.encode('utf-8')).digest()
+
+
+def _is_value_kind(cls) -> bool:
+    # перечисления и интернированные типы пишутся аргументами конструктора: при чтении берутся те же объекты
+    return issubclass(cls, (Enum, vartypes.DataType))
+
+
+def _new_args(obj) -> tuple:
+    return (obj.value,) if isinstance(obj, Enum) else obj.__getnewargs__()
+
+
+def _fields(cls) -> tuple:
+    if _is_value_kind(cls):
+        return ('args',)
+    return ast.slot_names(cls)  # у приведений типов полей нет
+
+
+PLAIN = (bool, int, float, str)
+
+
+def _is_object(value) -> bool:
+    return value is not None and value is not UNSET and type(value) not in PLAIN and type(value) is not list
+
+
+def _encode(value, index: dict):
+    # общий случай: ссылка - кортеж из номера объекта, списки - поэлементно
+    if _is_object(value):
+        return (index[id(value)],)
+    if type(value) is list:
+        return [_encode(item, index) for item in value]
+    return value
+
+
+def _column(values: list, index: dict) -> tuple:
+    # столбец одного поля у всех объектов вида; частые формы читаются без цикла Python по объектам
+    if all(value is None or type(value) in PLAIN for value in values):
+        return 'v', values
+    if all(value is None or _is_object(value) for value in values):
+        return 'r', [-1 if value is None else index[id(value)] for value in values]  # -1 - None
+    if all(type(value) is list and all(_is_object(item) for item in value) for value in values):
+        return 'l', [[index[id(item)] for item in value] for value in values]
+    return 'x', [_encode(value, index) for value in values]
+
+
+def dumps(tree, source: str = '', opt_level: int = 1) -> bytes:
+    '''
+    Дерево после анализа - в байты. Объекты сгруппированы по видам (класс, имена полей, число объектов),
+    у вида - по столбцу на поле; ссылка на объект - его номер, поэтому общие узлы и типы остаются общими.
+    Обход без рекурсии
+    '''
+    found = {}  # id -> объект; заодно держит объекты живыми, пока нужны их id
+    groups = {}
+    queue = [tree]
+    while queue:
+        obj = queue.pop()
+        if type(obj) is list:
+            queue.extend(obj)
+            continue
+        if not _is_object(obj) or id(obj) in found:
+            continue
+        cls = type(obj)
+        if CLASSES.get(cls.__module__ + '.' + cls.__qualname__) is not cls:
+            raise TypeError('can not serialize %r' % (obj,))
+        found[id(obj)] = obj
+        groups.setdefault(cls, []).append(obj)
+        if not _is_value_kind(cls):
+            queue.extend(getattr(obj, field, UNSET) for field in _fields(cls))
+
+    index = {}
+    for objs in groups.values():
+        for obj in objs:
+            index[id(obj)] = len(index)
+
+    kinds = []
+    for cls, objs in groups.items():
+        fields = _fields(cls)
+        if _is_value_kind(cls):
+            columns = [('v', [_new_args(obj) for obj in objs])]
+        else:
+            columns = [_column([getattr(obj, field, UNSET) for obj in objs], index) for field in fields]
+        kinds.append((cls.__module__ + '.' + cls.__qualname__, fields, len(objs), columns))
+
+    payload = marshal.dumps((kinds, index[id(tree)]))
+    return HEADER.pack(MAGIC, FORMAT_VERSION, INTERPRETER, opt_level, source_digest(source)) + payload
+
+
+def read_header(data) -> tuple:
+    if len(data) < HEADER.size:
+        raise AstFormatError('not an AST file')
+    magic, version, interpreter, opt_level, digest = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise AstFormatError('not an AST file')
+    if version != FORMAT_VERSION:
+        raise AstFormatError('AST format version %s, expected %s' % (version, FORMAT_VERSION))
+    if interpreter.rstrip(b'\0') != INTERPRETER:
+        raise AstFormatError('AST file written by %s, expected %s'
+                             % (interpreter.rstrip(b'\0').decode('ascii', 'replace'), INTERPRETER.decode('ascii')))
+    return opt_level, digest
+
+
+def loads(data):
+    read_header(data)
+    try:
+        return _decode(data)
+    except (EOFError, ValueError, TypeError, IndexError, KeyError, AttributeError) as e:
+        # заголовок цел, а данные обрезаны или испорчены (прерванная запись)
+        raise AstFormatError('damaged AST file: %s' % e) from e
+
+
+def _decode(data):
+    with memoryview(data) as view:
+        kinds, root = marshal.loads(view[HEADER.size:])
+
+    # сначала все объекты, потом поля: ссылки могут идти вперед
+    objects = []
+    groups = []
+    for name, fields, count, columns in kinds:
+        cls = CLASSES.get(name)
+        if cls is None:
+            raise AstFormatError('unknown node kind %s' % name)
+        if _is_value_kind(cls):
+            objects.extend(starmap(cls, columns[0][1]))
+            continue
+        objs = list(map(cls.__new__, repeat(cls, count)))
+        objects.extend(objs)
+        groups.append((cls, fields, objs, columns))
+    objects.append(None)  # номер -1 в столбцах ссылок
+    get = objects.__getitem__
+
+    def decode(value):
+        if type(value) is tuple:
+            return objects[value[0]]
+        if type(value) is list:
+            return [decode(item) for item in value]
+        return value
+
+    consume = deque(maxlen=0).extend
+    for cls, fields, objs, columns in groups:
+        for field, (form, values) in zip(fields, columns):
+            setter = getattr(cls, field).__set__  # дескриптор слота
+            if form == 'v':
+                consume(map(setter, objs, values))
+            elif form == 'r':
+                consume(map(setter, objs, map(get, values)))
+            elif form == 'l':
+                consume(map(setter, objs, [list(map(get, value)) for value in values]))
+            else:
+                for obj, value in zip(objs, values):
+                    if value is not UNSET:
+                        setter(obj, decode(value))
+    return objects[root]
+
+
+def dump(tree, file_path: str, source: str = '', opt_level: int = 1):
+    # запись во временный файл рядом и замена: прерванная или параллельная сборка не оставит обрезанный файл
+    data = dumps(tree, source, opt_level)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(file_path)),
+                                    prefix=os.path.basename(file_path) + '.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as file:
+            file.write(data)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load(file_path: str):
+    with open(file_path, 'rb') as file:
+        try:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # пустой файл
+            raise AstFormatError('not an AST file')
+        with data:
+            return loads(data)
+
+
+def load_cached(file_path: str, source: str, opt_level: int):
+    # дерево из файла, если он есть и записан для того же исходника и уровня оптимизации, иначе None
+    if not os.path.exists(file_path):
+        return None
+    try:
+        with open(file_path, 'rb') as file:
+            if read_header(file.read(HEADER.size)) != (opt_level, source_digest(source)):
+                return None
+        return load(file_path)
+    except AstFormatError:
+        return None
@@ -0,0 +1,523 @@
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import ply.lex as lex
+import mel_parser
+import ast_file
+from passes import count_nodes, fold_constants
+from rd_parser import RDParser
+
+
+FUNC_TEMPLATE = '''
+    function sort_%(n)s(arr: array[1..5] of string): none;
+    begin
+        var flag: boolean := true;
+        while flag do
+        begin
+            var i: integer;
+            flag := false;
+            for i := 1 to arr.length - 1 do
+            begin
+                if arr[i] < arr[i + 1] then
+                begin
+                    var tmp: string := arr[i];
+                    arr[i] := arr[i + 1];
+                    arr[i + 1] := tmp;
+                    flag := true;
+                end;
+            end;
+        end;
+    end;
+'''
+
+MAIN_TEMPLATE = '''
+begin
+    var s: string := "hi";
+    var as: array[1..5] of string;
+    var i: integer;
+    for i := 1 to 5 do
+    begin
+        readln(s);
+        as[i] := s;
+    end;
+    sort_0(as);
+    for i := 1 to 5 do
+        writeln("\\n" + as[i]);
+end.
+'''
+
+
+def generate_program(func_count: int) -> str:
+    parts = ['program bench\n']
+    for n in range(func_count):
+        parts.append(FUNC_TEMPLATE % {'n': n})
+    parts.append(MAIN_TEMPLATE)
+    return ''.join(parts)
+
+
+class BaselineLexerRules:
+    '''
+    Правила лексера до таблицы reserved, для сравнения скорости: каждое ключевое слово - отдельное
+    правило-функция, PLY пробует их по порядку на каждом токене. Только для бенчмарка
+    '''
+    tokens = [
+        'ANYTHING', 'PROGBEGIN', 'WRITELN', 'READLN', 'NAME',
+        'FLOAT_TYPE', 'INT_TYPE', 'STRING_TYPE', 'BOOL_TYPE', 'NONE_TYPE',
+        'FLOAT', 'INT', 'STRING', 'BOOL',
+        'PLUS', 'MINUS', 'DIVIDE', 'MULTIPLY',
+        'EQUALS', 'MORE', 'LESS', 'AND', 'OR',
+        'ASSIGNMENT', 'OPEN_COMMENT', 'CLOSE_COMMENT',
+        'END_LINE', 'COMMA', 'COLON', 'DOT', 'BLOCK_OPEN', 'BLOCK_CLOSE',
+        'OPEN_ROUND_BKT', 'CLOSE_ROUND_BKT', 'OPEN_SQUARE_BKT', 'CLOSE_SQUARE_BKT',
+        'VAR_DEF', 'FUNC_DEF', 'RETURN',
+        'IF', 'ELSE', 'THEN', 'WHILE', 'DO', 'FOR', 'TO', 'REPEAT', 'UNTIL',
+        'ARRAY', 'OF', 'LENGTH',
+    ]
+
+    t_ignore = r' '
+
+    t_ANYTHING = r'(\\.|\n)+'
+    t_STRING = r'"(\\.|[^"])*"'
+
+    t_PLUS = r'\+'
+    t_MINUS = r'\-'
+    t_DIVIDE = r'\/'
+    t_MULTIPLY = r'\*'
+
+    t_EQUALS = r'\='
+    t_MORE = r'\>'
+    t_LESS = r'\<'
+
+    t_OPEN_COMMENT = r'\(\*(\\.|[^"])*\*\)'
+    t_CLOSE_COMMENT = r'\(\*(\\.|[^"])*\*\)'
+
+    t_COMMA = r','
+    t_COLON = r':'
+    t_DOT = r'\.'
+    t_END_LINE = r';'
+    t_OPEN_ROUND_BKT = r'\('
+    t_CLOSE_ROUND_BKT = r'\)'
+    t_OPEN_SQUARE_BKT = r'\['
+    t_CLOSE_SQUARE_BKT = r'\]'
+
+    def t_newline(self, t):
+        r'\n+'
+        t.lexer.lineno += t.value.count("\n")
+
+    def t_error(self, t):
+        t.lexer.skip(1)
+
+    def t_PROGBEGIN(self, t):
+        r'program'
+        t.type = 'PROGBEGIN'
+        return t
+
+    def t_WRITELN(self, t):
+        r'writeln'
+        t.type = 'WRITELN'
+        return t
+
+    def t_READLN(self, t):
+        r'readln'
+        t.type = 'READLN'
+        return t
+
+    def t_BLOCK_OPEN(self, t):
+        r'begin'
+        t.type = 'BLOCK_OPEN'
+        return t
+
+    def t_BLOCK_CLOSE(self, t):
+        r'end'
+        t.type = 'BLOCK_CLOSE'
+        return t
+
+    def t_FUNC_DEF(self, t):
+        r'function'
+        t.type = 'FUNC_DEF'
+        return t
+
+    def t_RETURN(self, t):
+        r'return'
+        t.type = 'RETURN'
+        return t
+
+    def t_FLOAT_TYPE(self, t):
+        r'real'
+        t.type = 'FLOAT_TYPE'
+        return t
+
+    def t_INT_TYPE(self, t):
+        r'integer'
+        t.type = 'INT_TYPE'
+        return t
+
+    def t_STRING_TYPE(self, t):
+        r'string'
+        t.type = 'STRING_TYPE'
+        return t
+
+    def t_BOOL_TYPE(self, t):
+        r'boolean'
+        t.type = 'BOOL_TYPE'
+        return t
+
+    def t_NONE_TYPE(self, t):
+        r'none'
+        t.type = 'NONE_TYPE'
+        return t
+
+    def t_VAR_DEF(self, t):
+        r'var'
+        t.type = 'VAR_DEF'
+        return t
+
+    def t_AND(self, t):
+        r'and'
+        t.type = 'AND'
+        return t
+
+    def t_OR(self, t):
+        r'or'
+        t.type = 'OR'
+        return t
+
+    def t_IF(self, t):
+        r'if'
+        t.type = 'IF'
+        return t
+
+    def t_ELSE(self, t):
+        r'else'
+        t.type = 'ELSE'
+        return t
+
+    def t_THEN(self, t):
+        r'then'
+        t.type = 'THEN'
+        return t
+
+    def t_WHILE(self, t):
+        r'while'
+        t.type = 'WHILE'
+        return t
+
+    def t_DO(self, t):
+        r'do'
+        t.type = 'DO'
+        return t
+
+    def t_FOR(self, t):
+        r'for'
+        t.type = 'FOR'
+        return t
+
+    def t_TO(self, t):
+        r'to'
+        t.type = 'TO'
+        return t
+
+    def t_REPEAT(self, t):
+        r'repeat'
+        t.type = 'REPEAT'
+        return t
+
+    def t_UNTIL(self, t):
+        r'until'
+        t.type = 'UNTIL'
+        return t
+
+    def t_ARRAY(self, t):
+        r'array'
+        t.type = 'ARRAY'
+        return t
+
+    def t_OF(self, t):
+        r'of'
+        t.type = 'OF'
+        return t
+
+    def t_LENGTH(self, t):
+        r'length'
+        t.type = 'LENGTH'
+        return t
+
+    def t_BOOL(self, t):
+        r'true'
+        t.value = True
+        t.type = 'BOOL'
+        return t
+
+    def t_BOOL_f(self, t):
+        r'false'
+        t.value = False
+        t.type = 'BOOL'
+        return t
+
+    def t_FLOAT(self, t):
+        r'\d+\.\d+'
+        t.value = float(t.value)
+        return t
+
+    def t_INT(self, t):
+        r'\d+'
+        t.value = int(t.value)
+        return t
+
+    def t_NAME(self, t):
+        r'[a-zA-Z_][a-zA-Z0-9_]*'
+        t.type = 'NAME'
+        return t
+
+    def t_ASSIGNMENT(self, t):
+        r'\:='
+        t.type = 'ASSIGNMENT'
+        return t
+
+
+def baseline_lexer():
+    return lex.lex(module=BaselineLexerRules(), errorlog=lex.NullLogger())
+
+
+def bench_lexer(s: str, lexer=None, repeat: int = 3):
+    # tokens/sec лексера, по умолчанию текущего (mel_parser.lexer)
+    if lexer is None:
+        lexer = mel_parser.lexer
+    best = None
+    count = 0
+    for _ in range(repeat):
+        lexer.input(s)
+        lexer.lineno = 1
+        count = 0
+        start = time.perf_counter()
+        while lexer.token():
+            count += 1
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return count, best
+
+
+def lex_to_list(s: str):
+    lexer = mel_parser.lexer
+    lexer.input(s)
+    lexer.lineno = 1
+    return list(iter(lexer.token, None))
+
+
+def bench_token_memory(s: str):
+    result = {}
+    for name, func in (('LexToken list', lex_to_list), ('TokenStream', mel_parser.tokenize)):
+        tracemalloc.start()
+        tokens = func(s)
+        result[name] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        del tokens
+    return result
+
+
+def bench_relex(s: str):
+    stream = mel_parser.tokenize(s)
+    pos = s.index('flag := false', len(s) // 2)
+    new_text = s[:pos] + 'flag := true' + s[pos + len('flag := false'):]
+    start = time.perf_counter()
+    span = stream.relex(mel_parser.lexer, new_text, pos + 8, pos + 13, pos + 12)
+    return span, time.perf_counter() - start
+
+
+def bench_parse_scaling(sizes=(50000, 100000, 200000)):
+    result = []
+    for n in sizes:
+        s = 'program begin var a: integer; ' + 'a := a + 1; ' * n + 'end.'
+        stream = mel_parser.tokenize(s)
+        start = time.perf_counter()
+        mel_parser.parser.parse(lexer=stream.lexer())
+        result.append((n, time.perf_counter() - start))
+    return result
+
+
+def bench_engines(s: str, repeat: int = 3):
+    # только разбор, поток токенов общий для обоих парсеров
+    stream = mel_parser.tokenize(s)
+    parsers = {
+        'ply': lambda: mel_parser.parser.parse(lexer=stream.lexer()),
+        'rd': lambda: RDParser(stream).parse(),
+    }
+    result = {}
+    for name, parse in parsers.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result[name] = best
+    return len(stream), result
+
+
+def bench_ast_memory(s: str):
+    # память, которую держит дерево после разбора и после семантического анализа (типы, описания переменных)
+    stream = mel_parser.tokenize(s)
+    tracemalloc.start()
+    tree = RDParser(stream).parse()
+    parsed = tracemalloc.get_traced_memory()[0]
+    tree.semantic_analysis(None)
+    analysed = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return count_nodes(tree), parsed, analysed
+
+
+def bench_ast_reload(s: str):
+    # разбор и анализ против загрузки сохраненного дерева (ast_file) из файла
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'bench.ast')
+        start = time.perf_counter()
+        tree = mel_parser.parse(s, 'rd')
+        tree.semantic_analysis(None)
+        fold_constants(tree)
+        analysed = time.perf_counter() - start
+        ast_file.dump(tree, file_path, s)
+        size = os.path.getsize(file_path)
+        start = time.perf_counter()
+        ast_file.load(file_path)
+        return analysed, time.perf_counter() - start, size
+
+
+def bench_passes(s: str, opt_level: int = 2, repeat: int = 3):
+    # компиляция без статистики и с collect_stats (число узлов после каждого прохода), отчет по проходам
+    result = {}
+    report = None
+    for collect_stats in (False, True):
+        best = None
+        for _ in range(repeat):
+            compiler = mel_parser.Compiler('rd', opt_level=opt_level, collect_stats=collect_stats)
+            start = time.perf_counter()
+            compiler.compile(s, [])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        result[collect_stats] = best
+        report = [str(stats) for stats in compiler.stats.values()]
+    return result[False], result[True], report
+
+
+AST_MEMORY_SCRIPT = '''
+import resource, sys
+sys.path.insert(0, %r)
+import mel_parser, benchmarks
+tree = mel_parser.parse(benchmarks.generate_program(%s), 'rd')
+tree.semantic_analysis(None)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def bench_ast_rss(func_count: int):
+    # пиковый RSS (KB) разбора и анализа в свежем интерпретаторе
+    script = AST_MEMORY_SCRIPT % (os.path.dirname(os.path.abspath(__file__)), func_count)
+    out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+    return int(out.stdout.split()[-1])
+
+
+COLD_START_SCRIPT = '''
+import sys, time
+sys.path.insert(0, %r)
+import ply.yacc, mel_ast
+start = time.perf_counter()
+import mel_parser
+imported = time.perf_counter()
+mel_parser.code_generate(%r)
+print(imported - start, time.perf_counter() - start)
+'''
+
+
+def bench_cold_start(repeat: int = 5):
+    # импорт mel_parser и компиляция крошечной программы в свежем интерпретаторе
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'tiny')
+        with open(file_path, 'w', encoding='utf-8') as file:
+            file.write('program begin var a: integer; a := 1; writeln(a); end.')
+
+        script = COLD_START_SCRIPT % (os.path.dirname(os.path.abspath(__file__)), file_path)
+        runs = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+            runs.append(tuple(float(x) for x in out.stdout.split()[-2:]))
+    return min(runs)
+
+
+PIPELINE_MEMORY_SCRIPT = '''
+import resource, sys
+sys.path.insert(0, %r)
+import mel_parser, pipeline
+if %r:
+    pipeline.code_generate_pipeline(%r)
+else:
+    mel_parser.code_generate(%r)
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def bench_pipeline_memory(sizes=(250, 1000, 4000)):
+    # пиковый RSS (KB) полной компиляции и компиляции по одной функции в свежем интерпретаторе
+    result = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        file_path = os.path.join(tmp_dir, 'bench')
+        for n in sizes:
+            with open(file_path, 'w', encoding='utf-8') as file:
+                file.write(generate_program(n))
+            row = [n]
+            for use_pipeline in (False, True):
+                script = PIPELINE_MEMORY_SCRIPT % (os.path.dirname(os.path.abspath(__file__)), use_pipeline,
+                                                   file_path, file_path)
+                out = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True)
+                row.append(int(out.stdout.split()[-1]))
+            result.append(tuple(row))
+    return result
+
+
+def main(func_count: int = 2000):
+    import_time, compile_time = bench_cold_start()
+    print('cold start: import %.2f ms, import + tiny compile %.2f ms' % (import_time * 1000, compile_time * 1000))
+
+    s = generate_program(func_count)
+    count, elapsed = bench_lexer(s)
+    base_count, base_elapsed = bench_lexer(s, baseline_lexer())
+    print('lexer: %s bytes, %s tokens, %.3f s, %.0f tokens/sec; per-keyword rules (before): %s tokens, %.3f s, '
+          '%.0f tokens/sec; speedup %.2fx' % (len(s), count, elapsed, count / elapsed, base_count, base_elapsed,
+                                               base_count / base_elapsed, (count / elapsed) / (base_count / base_elapsed)))
+
+    for name, peak in bench_token_memory(s).items():
+        print('lexing peak memory, %s: %.1f MB (%.1f bytes/token)' % (name, peak / 2 ** 20, peak / count))
+
+    for n, elapsed in bench_parse_scaling():
+        print('parse of %s statements: %.3f s (%.2f us/statement)' % (n, elapsed, elapsed / n * 1e6))
+
+    count, result = bench_engines(s)
+    for name, elapsed in result.items():
+        print('parse, %s engine: %.3f s, %.0f tokens/sec' % (name, elapsed, count / elapsed))
+    print('rd speedup: %.2fx' % (result['ply'] / result['rd']))
+
+    nodes, parsed, analysed = bench_ast_memory(s)
+    print('AST: %s nodes, %.1f bytes/node after parse, %.1f bytes/node after semantic analysis, peak RSS %.1f MB'
+          % (nodes, parsed / nodes, analysed / nodes, bench_ast_rss(func_count) / 1024))
+
+    plain, counted, report = bench_passes(generate_program(func_count // 5))
+    print('compile of %s functions at -O2: %.3f s, with node counts (--stats) %.3f s'
+          % (func_count // 5, plain, counted))
+    for line in report:
+        print('    ' + line)
+
+    analysed, loaded, size = bench_ast_reload(s)
+    print('parse + analysis %.3f s, reload of saved tree %.3f s (%.1f MB file)' % (analysed, loaded, size / 2 ** 20))
+
+    for n, full_rss, pipeline_rss in bench_pipeline_memory():
+        print('peak RSS for %s functions: whole program %.1f MB, function at a time %.1f MB'
+              % (n, full_rss / 1024, pipeline_rss / 1024))
+
+    span, elapsed = bench_relex(s)
+    print('relex of one edited token: tokens [%s:%s] -> [%s:%s], %.4f s' % (span[0], span[1], span[0], span[2], elapsed))
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:]))
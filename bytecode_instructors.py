@@ -2,19 +2,25 @@ from vartypes import DataType as DT, ArrayDataType as ADT, ValListDataType, Data
 from typing import Union, List
 from typecaster import BoolCaster, IntCaster, StringCaster, FloatCaster
 
-#                int   float  bool  str
-__cast_map__ = [[None, 'f2i', None, None],  # to int
-                ['i2f', None, 'i2f', None],  # to float
-                ['invokestatic          Puppy/toBoolean(I)Z',  # to bool
+# таблицы по type_id простого типа (у массива - по elem_id), порядок DataTypeEnum
+#                none  int    float  bool  str
+__cast_map__ = [[None, None, None, None, None],  # to none
+                [None, None, 'f2i', None, None],  # to int
+                [None, 'i2f', None, 'i2f', None],  # to float
+                [None,
+                 'invokestatic          Puppy/toBoolean(I)Z',  # to bool
                  'invokestatic          Puppy/toBoolean(F)Z',
                  None,
                  'invokestatic          Puppy/toBoolean(Ljava/lang/String;)Z'],
-                ['invokestatic          java/lang/String/valueOf(I)Ljava/lang/String;',  # to string
+                [None,
+                 'invokestatic          java/lang/String/valueOf(I)Ljava/lang/String;',  # to string
                  'invokestatic          java/lang/String/valueOf(F)Ljava/lang/String;',
                  'invokestatic          java/lang/String/valueOf(I)Ljava/lang/String;',
                  None]
                 ]
-__type_map__ = {DTE.int: 0, DTE.float: 1, DTE.bool: 2, DTE.string: 3}
+__descriptors__ = ('V', 'I', 'F', 'Z', 'Ljava/lang/String;')
+__array_descriptors__ = tuple('[' + descriptor for descriptor in __descriptors__)
+__lower__ = ('', 'i', 'f', 'i', 'a')
 
 
 def __init__(self):
@@ -49,17 +55,17 @@ class JBCInstructor:
     @staticmethod
     def get_type(data_type: Union[DT, ADT])-> str:
         if type(data_type) is ADT:
-            return '[' + JBCInstructor.get_type_dte(data_type.dte)
-        return JBCInstructor.get_type_dte(data_type.dte)
+            return __array_descriptors__[data_type.elem_id]
+        return __descriptors__[data_type.elem_id]
 
     @staticmethod
     def get_type_lower(data_type: Union[DT, ADT, DTE])-> str:
         if type(data_type) is ADT:
             return 'a'
-        elif type(data_type) is DT:
-            return JBCInstructor.get_type_dte_lower(data_type.dte)
+        elif type(data_type) is DTE:
+            data_type = DT(data_type)
 
-        return JBCInstructor.get_type_dte_lower(data_type)
+        return __lower__[data_type.elem_id]
 
     @staticmethod
     def get_type_full(data_type: DTE):
@@ -71,14 +77,12 @@ class JBCInstructor:
 
     @staticmethod
     def get_return(data_type: DT)-> str:
-        return JBCInstructor.get_type_dte_lower(data_type.dte) + 'return'
+        return __lower__[data_type.elem_id] + 'return'
 
 
     @staticmethod
     def get_cast_command(what: DT, to: DT)->str:
-        to_int = __type_map__[to.dte]
-        what_int = __type_map__[what.dte]
-        return __cast_map__[to_int][what_int]
+        return __cast_map__[to.elem_id][what.elem_id]
 
     @staticmethod
     def get_equal_command(code: List[str], label_false: int, label_out: int, data_type: Union[DT, ADT]):
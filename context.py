@@ -1,15 +1,18 @@
 from vartypes import DataTypeEnum as dte, DataType, ArrayDataType, VarType
 from typing import List
+from diagnostics import Diagnostics
 #from mel_ast import VarCounterNode
 
 
 class ObjectDescription:
+    __slots__ = ('name', 'data_type', 'prog_name')
     def __init__(self, name: str, object_type: DataType, prog_name=None):
         self.name = name
         self.data_type = object_type
         self.prog_name = prog_name
 
 class VarDescription(ObjectDescription):
+    __slots__ = ('var_type', 'index', 'value')
     def __init__(self, name: str, data_type: DataType, var_type: VarType, index: int, value, prog_name=None):
         super().__init__(name, data_type, prog_name)
         self.var_type = var_type
@@ -22,12 +25,12 @@ class VarDescription(ObjectDescription):
 
 
 class FuncDescription(ObjectDescription):
-    # params LIST[DataType]
-    def __init__(self, name: str, return_type: DataType, params: List[DataType], context):
+    # params LIST[DataType]; только сигнатура, без контекста тела
+    __slots__ = ('params', 'params_count')
+    def __init__(self, name: str, return_type: DataType, params: List[DataType]):
         super().__init__(name, return_type)
         self.params = params
         self.params_count = len(params)
-        self.func_context = context
 
     def __getitem__(self, item: int):
         if len(self.params) > item:
@@ -54,7 +57,90 @@ class IndexCounter:
             return self.param_count - 1
 
 
+class NodeTable:
+    '''
+    Общие узлы выражений (hash-consing): ключ узла - вид, операция, разрешенный символ
+    и уже общие дети (intern_key узла), равные проанализированные поддеревья сводятся к одному объекту.
+    Выключенная таблица (enabled=False) узлы не сводит
+    '''
+    __slots__ = ('enabled', 'nodes', 'hits')
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.nodes = {}
+        self.hits = 0
+
+    def lookup(self, node):
+        if not self.enabled:
+            return None
+        key = node.intern_key()
+        return None if key is None else self.nodes.get(key)
+
+    def intern(self, node):
+        if not self.enabled:
+            return node
+        key = node.intern_key()
+        if key is None:
+            return node
+        shared = self.nodes.get(key)
+        if shared is None:
+            self.nodes[key] = node
+            return node
+        self.hits += 1
+        return shared
+
+
+class SymbolTable:
+    '''
+    Таблица символов функции (или программы): имя -> стек видимых объявлений, сверху - ближайшее.
+    Блоки (Context) кладут свои объявления при добавлении и снимают при закрытии (Context.close).
+    Имени нет в таблице функции - ищется в таблице, где функция объявлена (parent)
+    '''
+    __slots__ = ('variables', 'functions', 'parent')
+    def __init__(self, parent: 'SymbolTable' = None):
+        self.variables = {}
+        self.functions = {}
+        self.parent = parent
+
+    @staticmethod
+    def push(bindings: dict, name: str, description: ObjectDescription):
+        stack = bindings.get(name)
+        if stack is None:
+            bindings[name] = [description]
+        else:
+            stack.append(description)
+
+    @staticmethod
+    def pop(bindings: dict, name: str):
+        stack = bindings[name]
+        stack.pop()
+        if not stack:
+            del bindings[name]
+
+    def get_var(self, name: str) -> VarDescription:
+        table = self
+        while table is not None:  # по таблицам вложенных функций, не по блокам
+            stack = table.variables.get(name)
+            if stack is not None:
+                return stack[-1]
+            table = table.parent
+        return None
+
+    def get_func(self, name: str) -> FuncDescription:
+        table = self
+        while table is not None:
+            stack = table.functions.get(name)
+            if stack is not None:
+                return stack[-1]
+            table = table.parent
+        return None
+
+
 class Context:
+    '''
+    Блок: variables и functions - только его собственные объявления (они же журнал для close),
+    поиск имен - по общей таблице символов функции. Поиск верен для самого внутреннего
+    открытого блока: анализ идет по блокам по порядку, вложенный блок закрывается до продолжения внешнего
+    '''
     def __init__(self, parent: 'Context'=None):
         self.variables = {}
         self.functions = {}
@@ -62,17 +148,28 @@ class Context:
         self.general_context = self
         if parent is not None:
             self.general_context = parent.general_context
+            self.node_table = parent.node_table
+            self.symbols = parent.symbols
+            self.diagnostics = parent.diagnostics
             self.is_global = False
 
             if parent.parent is None:
                 self.is_global = True  # основной блок программы
         else:
+            self.node_table = NodeTable()
+            self.symbols = SymbolTable()
+            self.diagnostics = Diagnostics()
             self.is_global = True
 
     def add_var(self, name: str, data_type: DataType, var_type: VarType, value=None):
-        if name in self.variables.keys():
+        if name in self.variables:
             return 'error: variable is defined'
 
+        if var_type == VarType.CONST:
+            # константа - имя и значение: ни слота, ни поля класса
+            self.bind_var(VarDescription(name, data_type, var_type, -1, value))
+            return None
+
         index = self.general_context.get_index(var_type)
 
         # должны ли локальные переменные основного блока быть глобальными
@@ -82,38 +179,64 @@ class Context:
         else:
             prog_name = None
 
-        self.variables[name] = VarDescription(name, data_type, var_type, index, value, prog_name)
-        self.general_context.register_var_description(self.variables[name])
+        var_dis = VarDescription(name, data_type, var_type, index, value, prog_name)
+        self.variables[name] = var_dis
+        SymbolTable.push(self.symbols.variables, name, var_dis)
+        self.general_context.register_var_description(var_dis)
         return None
 
-    def add_func(self, name: str, return_type: DataType, params: List[DataType], context):
-        if name in self.functions.keys():
+    def add_func(self, name: str, return_type: DataType, params: List[DataType]):
+        if name in self.functions:
             return 'error: function is defined'
-        self.functions[name] = FuncDescription(name, return_type, params, context)
+        self.bind_func(FuncDescription(name, return_type, params))
         return None
 
+    def bind_var(self, var_dis: VarDescription):
+        # уже готовое описание (например, из другого процесса): без нового индекса и регистрации
+        self.variables[var_dis.name] = var_dis
+        SymbolTable.push(self.symbols.variables, var_dis.name, var_dis)
+
+    def bind_func(self, func_dis: FuncDescription):
+        self.functions[func_dis.name] = func_dis
+        SymbolTable.push(self.symbols.functions, func_dis.name, func_dis)
+
+    def close(self):
+        # конец блока: его объявления больше не видны; цена - число объявлений блока
+        for name in self.variables:
+            SymbolTable.pop(self.symbols.variables, name)
+        for name in self.functions:
+            SymbolTable.pop(self.symbols.functions, name)
+
     def get_var(self, name: str)->VarDescription:
-        if name in self.variables.keys():
-            return self.variables[name]
-        if self.parent is None:
-            return None
-        return self.parent.get_var(name)
+        return self.symbols.get_var(name)
 
     def get_func(self, name: str)->FuncDescription:
-        if name in self.functions.keys():
-            return self.functions[name]
-        if self.parent is None:
-            return None
-        return self.parent.get_func(name)
+        return self.symbols.get_func(name)
 
     def get_prog_name(self):
         return self.general_context.get_prog_name()
 
+    def intern(self, node):
+        # общий узел для равного поддерева; узел должен быть проанализирован без ошибок
+        return self.node_table.intern(node)
+
+    def lookup(self, node):
+        # общий узел с тем же ключом, если он уже есть
+        return self.node_table.lookup(node)
+
+    def error(self, node, code: str, message: str, *args):
+        # запись в общий для программы сборщик ошибок; возвращает FAILED для узла
+        return self.diagnostics.error(node, code, message, *args)
+
 class GeneralContext(Context):
     def __init__(self, node, parent=None, is_func: bool=False):
         super().__init__(parent)
         self.node = node
         self.counter = IndexCounter()
+        # своя на функцию: ключи содержат ее локальные символы
+        self.node_table = NodeTable(parent is not None and parent.node_table.enabled)
+        # своя таблица символов: после анализа функции ее блоки снимать не нужно
+        self.symbols = SymbolTable(None if parent is None else parent.symbols)
         self.general_context = self
         self.is_func = is_func
         self.prog_name = 'prog'
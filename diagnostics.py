@@ -0,0 +1,83 @@
+class SyntaxErrorInfo:
+    '''
+    Синтаксическая ошибка: позиция и токен, на котором разбор споткнулся.
+    value None - неожиданный конец файла
+    '''
+    def __init__(self, line: int, col: int, value=None):
+        self.line = line
+        self.col = col
+        self.value = value
+
+    def __str__(self):
+        if self.value is None:
+            return 'Syntax error at line %s, column %s: unexpected end of input' % (self.line, self.col)
+        return 'Syntax error at line %s, column %s: %s' % (self.line, self.col, self.value)
+
+    def __repr__(self):
+        return 'SyntaxErrorInfo(%r, %r, %r)' % (self.line, self.col, self.value)
+
+
+FAILED = False  # результат semantic_steps узла с ошибкой (ошибка уже в Diagnostics); успех - None
+
+
+class SemanticErrorInfo:
+    '''
+    Семантическая ошибка: узел, смещение в исходнике (pos оператора, None - неизвестно),
+    код и сообщение. Текст сообщения собирается из message % args только при выводе
+    '''
+    __slots__ = ('node', 'pos', 'code', 'message', 'args', 'line_index')
+    def __init__(self, node, pos, code: str, message: str, args: tuple = (), line_index=None):
+        self.node = node
+        self.pos = pos
+        self.code = code
+        self.message = message
+        self.args = args
+        self.line_index = line_index
+
+    @property
+    def text(self) -> str:
+        return self.message % self.args if self.args else self.message
+
+    def __str__(self):
+        if self.pos is None:
+            return 'Semantic error: %s' % self.text
+        if self.line_index is None:
+            return 'Semantic error at offset %s: %s' % (self.pos, self.text)
+        return 'Semantic error at line %s, column %s: %s' % (*self.line_index.line_col(self.pos), self.text)
+
+    def __repr__(self):
+        return 'SemanticErrorInfo(%r, %r, %r)' % (self.pos, self.code, self.text)
+
+    def __reduce__(self):
+        # в другой процесс - без узла и таблицы строк: они тянут за собой дерево и весь исходник
+        return SemanticErrorInfo, (None, self.pos, self.code, self.message, self.args)
+
+
+class Diagnostics:
+    '''
+    Общий на весь анализ сборщик семантических ошибок (Context.diagnostics).
+    Узел сообщает ошибку через error() и возвращает FAILED; без ошибок ничего не создается.
+    statement - оператор, который сейчас анализируется: его pos - позиция ошибки,
+    если у самого узла позиции нет. line_index (source_file.LineIndex) - для номеров строк при выводе
+    '''
+    __slots__ = ('errors', 'statement', 'line_index')
+    def __init__(self, line_index=None):
+        self.errors = []
+        self.statement = None
+        self.line_index = line_index
+
+    def error(self, node, code: str, message: str, *args):
+        pos = getattr(node, 'pos', None)
+        if pos is None:
+            pos = getattr(self.statement, 'pos', None)
+        self.errors.append(SemanticErrorInfo(node, pos, code, message, args, self.line_index))
+        return FAILED
+
+    def __len__(self):
+        return len(self.errors)
+
+    def __iter__(self):
+        return iter(self.errors)
+
+    def __str__(self):
+        return '\n'.join(map(str, self.errors))
@@ -0,0 +1,299 @@
+import hashlib
+import io
+import os
+import sys
+import time
+from bisect import bisect_right
+import mel_parser
+from context import FuncDescription
+from passes import PassManager
+from pipeline import (Part, analyse_part, function_results, header_end, parse_header, program_context,
+                      top_level_ends)
+from rd_parser import RDParser, ParseError
+from source_file import SourceFile
+from token_stream import TokenStream
+
+
+def common_prefix(a: str, b: str) -> int:
+    # длина общего начала: бинарный поиск, сравнивается только еще не проверенный срез
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def common_suffix(a: str, b: str, limit: int) -> int:
+    # длина общего конца, не больше limit
+    lo, hi = 0, limit
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[len(a) - mid:len(a) - lo] == b[len(b) - mid:len(b) - lo]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def format_code(code: list) -> str:
+    file = io.StringIO()
+    mel_parser.write_code(file, code)
+    return file.getvalue()
+
+
+class FunctionEntry:
+    # функция, скомпилированная без ошибок: сигнатура, ссылки на глобальные символы и готовый текст метода
+    __slots__ = ('func_dis', 'refs', 'globals', 'code')
+    def __init__(self, func_dis: FuncDescription, refs: set, code: str):
+        self.func_dis = func_dis
+        self.refs = refs
+        self.globals = tuple(name for kind, name in refs if kind == 'var')
+        self.code = code
+
+
+class IncrementalCompiler:
+    '''
+    Повторная компиляция одного и того же, понемногу меняющегося исходника с кешем методов.
+    Поток токенов перелексируется только вокруг правки (TokenStream.relex), операторы верхнего
+    уровня заново делятся от оператора с правкой, пока граница не совпадет со старой.
+    Отпечаток функции - sha1 текста ее оператора. Метод берется из кеша, если отпечаток тот же
+    и не поменялись символы, на которые функция ссылается: сигнатуры вызываемых функций,
+    типы глобальных переменных, значения констант и то, что они объявлены раньше функции. Граф dependents
+    (символ -> отпечатки ссылающихся функций) по изменившимся символам дает функции,
+    которые надо пересобрать. Остальные функции компилируются заново (FunctionJob),
+    операторы вне функций - всегда. .j и ошибки те же, что у pipeline.code_generate_pipeline
+    '''
+    def __init__(self, opt_level: int = 1, jobs: int = 1, lexer=None, collect_stats: bool = False):
+        self.opt_level = opt_level
+        self.jobs = jobs
+        self.lexer = mel_parser.get_lexer() if lexer is None else lexer
+        self.collect_stats = collect_stats
+        self.manager = PassManager(opt_level, collect_stats)
+        self.output = None  # текст .j последней компиляции по кускам, None - были ошибки
+        self.reset()
+
+    def reset(self):
+        self.text = None
+        self.stream = None
+        self.header = 0  # конец заголовка в потоке
+        self.bounds = []  # концы операторов верхнего уровня
+        self.digests = []  # отпечатки операторов
+        self.program_name = None
+        self.entries = {}  # отпечаток -> FunctionEntry
+        self.dependents = {}  # символ -> отпечатки функций, которые на него ссылаются
+        self.symbols = {}  # символ -> (тип, параметры или вид переменной) прошлой компиляции
+        self.compiled = 0
+        self.reused = 0
+
+    def digest(self, start: int, end: int) -> bytes:
+        stream = self.stream
+        first = stream.start(start)
+        return hashlib.sha1(stream.text[first:stream.start(end - 1) + stream.lengths[end - 1]].encode('utf-8')).digest()
+
+    def split(self, k: int, first: int, old_stop: int, new_stop: int):
+        # операторы с k-го заново до совпадения границы со старой за правкой (токены [first:new_stop])
+        start = self.header if k == 0 else self.bounds[k - 1]
+        old_bounds, old_digests = self.bounds, self.digests
+        delta = new_stop - old_stop
+        bounds, digests = old_bounds[:k], old_digests[:k]
+        j = k
+        for end in top_level_ends(self.stream, start):
+            bounds.append(end)
+            digests.append(self.digest(start, end))
+            start = end
+            if end >= new_stop:
+                # за правкой токены прежние: с общей границы и деление прежнее, со сдвигом
+                while j < len(old_bounds) and old_bounds[j] + delta < end:
+                    j += 1
+                if j < len(old_bounds) and old_bounds[j] + delta == end:
+                    bounds.extend(bound + delta for bound in old_bounds[j + 1:])
+                    digests.extend(old_digests[j + 1:])
+                    break
+        self.bounds, self.digests = bounds, digests
+
+    def tokenize(self, text: str):
+        old = self.text
+        if old == text:
+            return
+        self.text = text
+        if old is None:
+            self.stream = TokenStream.from_lexer(self.lexer, text, mel_parser.tokens)
+            self.header = header_end(self.stream)
+            self.bounds = []
+            self.split(0, 0, len(self.stream), len(self.stream))
+            return
+
+        start = common_prefix(old, text)
+        suffix = common_suffix(old, text, min(len(old), len(text)) - start)
+        first, old_stop, new_stop = self.stream.relex(self.lexer, text, start, len(old) - suffix, len(text) - suffix)
+        header = header_end(self.stream)
+        if header != self.header or first < header:
+            self.header = header
+            self.bounds = []
+            self.split(0, 0, len(self.stream), len(self.stream))
+        else:
+            self.split(bisect_right(self.bounds, first), first, old_stop, new_stop)
+
+    def forget(self, digest: bytes):
+        entry = self.entries.pop(digest)
+        for symbol in entry.refs:
+            digests = self.dependents[symbol]
+            digests.discard(digest)
+            if len(digests) == 0:
+                del self.dependents[symbol]
+
+    def remember(self, digest: bytes, entry: FunctionEntry):
+        if digest in self.entries:
+            self.forget(digest)
+        self.entries[digest] = entry
+        for symbol in entry.refs:
+            self.dependents.setdefault(symbol, set()).add(digest)
+
+    def compile(self, text: str) -> list:
+        # ошибки как у code_generate_pipeline; текст .j - в self.output
+        self.tokenize(text)
+        stream = self.stream
+        manager = self.manager = PassManager(self.opt_level, self.collect_stats)
+        self.compiled = self.reused = 0
+        errors = []
+        program = parse_header(stream.sub(0, self.header), errors)
+        if program.name != self.program_name:
+            # имя программы есть в каждом обращении к глобальным символам
+            for digest in list(self.entries):
+                self.forget(digest)
+            self.symbols = {}
+            self.program_name = program.name
+        context = program_context(program, manager.share, stream.line_index)
+
+        # первая фаза: сигнатуры функций из кеша или по заголовку, остальные операторы разбираются
+        parts = []
+        functions = []  # (часть, отпечаток, описание функции)
+        func_def = stream.type_ids['FUNC_DEF']
+        kinds = stream.kinds
+        start = self.header
+        for end, digest in zip(self.bounds, self.digests):
+            if kinds[start] == func_def:
+                part = Part(task=(start, end))
+                entry = self.entries.get(digest)
+                func_dis = None if entry is None else entry.func_dis
+                if func_dis is None:
+                    try:
+                        func_dis = FuncDescription(*RDParser(stream.sub(start, end), []).func_header().signature())
+                    except ParseError:
+                        pass
+                # описание из кеша не меняется, его можно объявить как есть (как add_func)
+                if func_dis is not None and func_dis.name not in context.functions:
+                    context.bind_func(func_dis)
+                functions.append((part, digest, func_dis))
+            else:
+                part = Part()
+                part.states = RDParser(stream.sub(start, end), part.syntax_errors).parse_part()
+            parts.append(part)
+            start = end
+        generate = len(errors) == 0 and all(len(part.syntax_errors) == 0 for part in parts)
+
+        # вторая фаза: операторы вне функций, затем окружение функций
+        clinit = program.generate_clinit_header()
+        for part in parts:
+            if part.task is not None:
+                part.task += (len(context.variables),)
+            else:
+                analyse_part(part, program, context, manager, clinit, generate)
+
+        symbols = {}
+        for name, func_dis in context.functions.items():
+            symbols[('func', name)] = (func_dis.data_type, tuple(func_dis.params))
+        order = {}
+        for name, var_dis in context.variables.items():
+            symbols[('var', name)] = (var_dis.data_type, var_dis.var_type, var_dis.value)  # значение - у констант
+            order[name] = len(order)
+        dirty = set()
+        for symbol in self.symbols.keys() | symbols.keys():
+            if self.symbols.get(symbol) != symbols.get(symbol):
+                dirty.update(self.dependents.get(symbol, ()))
+        self.symbols = symbols
+
+        tasks = []
+        for part, digest, func_dis in functions:
+            start, end, count = part.task
+            entry = self.entries.get(digest)
+            # имени нет среди глобальных - локальная константа функции (удаленная глобальная уже в dirty)
+            if entry is not None and digest not in dirty and all(order.get(name, -1) < count for name in entry.globals):
+                part.code = entry.code
+                part.task = None
+                self.reused += 1
+            else:
+                chunk = stream.sub(start, end)
+                part.task = (chunk.kinds, chunk.starts, chunk.lengths, count)
+                tasks.append(part.task)
+        self.compiled = len(tasks)
+
+        job_args = (text, program.name, list(context.variables.values()), list(context.functions.values()),
+                    manager.opt_level, True, manager.collect_stats)
+        results = function_results(job_args, tasks, self.jobs)
+        try:
+            for part, digest, func_dis in functions:
+                if part.task is None:
+                    continue
+                part.syntax_errors, part.semantic_errors, code, stats, refs = next(results)
+                for error in part.semantic_errors:
+                    error.line_index = stream.line_index
+                manager.merge(stats)
+                part.code = format_code(code)
+                if len(part.syntax_errors) == 0 and len(part.semantic_errors) == 0:
+                    self.remember(digest, FunctionEntry(func_dis, refs, part.code))
+        finally:
+            results.close()
+
+        live = set(digest for part, digest, func_dis in functions)
+        for digest in [digest for digest in self.entries if digest not in live]:
+            self.forget(digest)
+
+        for part in parts:
+            errors.extend(part.syntax_errors)
+        for part in parts:
+            errors.extend(part.semantic_errors)
+        for error in errors:
+            print(error)
+        if len(errors) != 0:
+            self.output = None
+            return errors
+
+        code = []
+        program.generate_header(code)
+        output = [format_code(code)]
+        for part in parts:
+            output.append(part.code if type(part.code) is str else format_code(part.code))
+        clinit = program.generate_clinit_footer(clinit)
+        manager.optimize_code(program, clinit)
+        output.append(format_code(clinit))
+        self.output = output
+        return errors
+
+    def code_generate(self, file_path) -> list:
+        errors = self.compile(SourceFile(file_path).text)
+        if self.output is not None:
+            with open(file_path + '.j', "tw", encoding='utf-8') as file:
+                file.writelines(self.output)
+        return errors
+
+
+def watch(file_path, compiler: IncrementalCompiler, interval: float = 0.2):
+    # пересборка при каждом изменении файла, до Ctrl+C
+    mtime = None
+    try:
+        while True:
+            current = os.stat(file_path).st_mtime_ns
+            if current != mtime:
+                mtime = current
+                start = time.perf_counter()
+                compiler.code_generate(file_path)
+                print('%s: %s functions compiled, %s reused, %.1f ms'
+                      % (file_path, compiler.compiled, compiler.reused, (time.perf_counter() - start) * 1000),
+                      file=sys.stderr)
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        pass
@@ -1,6 +1,35 @@
-import os
+import argparse
 import sys
 import mel_parser
 
 if __name__ == '__main__':
-    mel_parser.code_generate(sys.argv[1])
\ No newline at end of file
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--engine', choices=['ply', 'rd'], default='ply',
+                            help='ply - таблицы yacc, rd - рекурсивный спуск')
+    arg_parser.add_argument('--pipeline', action='store_true',
+                            help='компилировать по одной функции с ограниченной памятью (только rd)')
+    arg_parser.add_argument('--jobs', type=int, default=1,
+                            help='с --pipeline: анализировать и генерировать функции в стольких процессах')
+    arg_parser.add_argument('--watch', action='store_true',
+                            help='пересобирать при каждом изменении файла, из кеша - только не затронутые правкой функции')
+    arg_parser.add_argument('-O', dest='opt_level', type=int, choices=[0, 1, 2], default=1,
+                            help='0 - без оптимизаций, 1 - свертка констант, 2 - еще и чистка переходов')
+    arg_parser.add_argument('--ast-cache', action='store_true',
+                            help='брать дерево после анализа из <file>.ast, если исходник не менялся, иначе сохранить его туда')
+    arg_parser.add_argument('--stats', action='store_true',
+                            help='время и число узлов по каждому проходу')
+    args = arg_parser.parse_args()
+    if args.watch:
+        import incremental
+        incremental.watch(args.file, incremental.IncrementalCompiler(args.opt_level, args.jobs))
+        sys.exit(0)
+    compiler = mel_parser.shared_compiler(args.engine, args.opt_level, args.stats)
+    if args.pipeline:
+        errors = compiler.code_generate_pipeline(args.file, args.jobs)
+    else:
+        errors = compiler.code_generate(args.file, args.ast_cache)
+    if args.stats:
+        for stats in compiler.stats.values():
+            print(stats, file=sys.stderr)
+    sys.exit(1 if errors else 0)
@@ -1,49 +1,173 @@
 from abc import ABC, abstractmethod
+from types import GeneratorType
 from typing import Tuple, List, Union
 from enum import Enum
-from vartypes import VarType, DataType, ArrayDataType, ValListDataType, DataTypeEnum as dte
+from vartypes import VarType, DataType, ArrayDataType, ValListDataType, DataTypeEnum as dte, \
+    SCALAR_TYPES, INT_TYPE, FLOAT_TYPE, BOOL_TYPE, STRING_TYPE
 from context import Context, GeneralContext, VarDescription
+from diagnostics import Diagnostics, FAILED
 from bytecode_instructors import JBCInstructor as JBCI
 import typecaster as tc
 
+FIRST_LABEL = 7  # первая метка метода, LABEL1..LABEL6 - в служебных методах JBCI.to_bool_func
+
 CHAR1 = '├'
 CHAR2 = '│'
 CHAR3 = '└'
 
 
+def slot_names(cls) -> Tuple[str, ...]:
+    # узлы без __dict__: все поля объекта - слоты его класса и базовых классов
+    names = []
+    for klass in reversed(cls.__mro__):
+        names.extend(klass.__dict__.get('__slots__', ()))
+    return tuple(names)
+
+
+def run_steps(steps):
+    '''
+    Обход дерева без рекурсии Python. semantic_steps / code_steps узлов с детьми - генераторы:
+    вместо вызова метода ребенка они отдают через yield его шаги и получают обратно результат.
+    Генераторы лежат в явном стеке, глубина дерева ограничена только памятью.
+    Листья возвращают результат сразу, без генератора
+    '''
+    if type(steps) is not GeneratorType:
+        return steps
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    top = steps
+    value = None
+    while True:
+        try:
+            request = top.send(value)
+        except StopIteration as stop:
+            value = stop.value
+            if not stack:
+                return value
+            top = pop()
+            continue
+        if type(request) is GeneratorType:
+            push(top)
+            top = request
+            value = None
+        else:
+            value = request
+
+
+def const_command(data_type, value) -> str:
+    # команда, которая кладет на стек известное значение типа data_type
+    if data_type == dte.bool:
+        return 'iconst_1' if value else 'iconst_0'
+    if data_type == dte.string:
+        if value[:1] != '"':
+            value = '"%s"' % value  # строка из приведения (StringCaster) - без кавычек
+        return 'ldc                   %s' % value.replace('\n', r'\012')
+    return 'ldc                   %s' % value
+
+
+def wrap_int(value: int) -> int:
+    # целые в JVM 32-битные: результат свертки переполняется так же, как iadd / imul
+    return (value + 0x80000000) % 0x100000000 - 0x80000000
+
+
+def shared_id(node) -> int:
+    # часть ключа родителя: общий ребенок - по объекту. Приведение родитель вставляет сам по типам детей,
+    # поэтому оно в ключ не входит - ключ узла до и после его анализа один и тот же
+    if type(node) is CastNode:
+        return id(node.node)
+    return id(node)
+
+
 class AstNode(ABC):
+    __slots__ = ()
     @property
     def children(self) -> Tuple['AstNode', ...]:
         return tuple()
 
     @property
-    def tree(self) -> [str, ...]:
-        res = [str(self)]
-        if type(self.children) != tuple:
-            print(str(self))
-        children_temp = self.children
-
-        for i, child in enumerate(children_temp):
-            ch0, ch = '├', '│'
-            if i == len(children_temp) - 1:
-                ch0, ch = '└', ' '
-            res.extend(((ch0 if j == 0 else ch) + ' ' + s for j, s in enumerate(child.tree)))
-        return res
+    def tree(self) -> List[str]:
+        return list(self.iter_tree())
+
+    def iter_tree(self, max_depth: int = None):
+        '''
+        Строки дерева по одной, за один обход без рекурсии: в стеке узел и префиксы его первой строки
+        и строк его детей. Списки среди детей раскрываются на месте. Ниже max_depth уровней
+        поддерево заменяется строкой '...'
+        '''
+        stack = [(self, '', '', 0)]
+        while stack:
+            node, head, tail, depth = stack.pop()
+            yield head + str(node)
+            children = []
+            for child in node.children:
+                if type(child) is list or type(child) is tuple:
+                    children.extend(child)
+                elif child is not None:
+                    children.append(child)
+            if not children:
+                continue
+            if max_depth is not None and depth >= max_depth:
+                yield tail + CHAR3 + ' ...'
+                continue
+
+            inner = tail + CHAR2 + ' '
+            stack.append((children[-1], tail + CHAR3 + ' ', tail + '  ', depth + 1))
+            for child in reversed(children[:-1]):
+                stack.append((child, tail + CHAR1 + ' ', inner, depth + 1))
+
+    def write_tree(self, file, max_depth: int = None):
+        for line in self.iter_tree(max_depth):
+            file.write(line)
+            file.write('\n')
 
     @abstractmethod
     def __str__(self)->str:
         pass
 
+    def semantic_analysis(self, context: Context, *args)->Diagnostics:
+        # ошибки копятся в context.diagnostics, он и возвращается
+        run_steps(self.semantic_steps(context, *args))
+        return context.diagnostics
+
+    def fold(self):
+        # свертка констант (проход fold из passes), дети к этому моменту уже свернуты
+        pass
+
+    def intern_key(self):
+        # ключ для Context.intern, None - узел не сводится к общему
+        return None
+
+    def adopt(self, shared):
+        # равный уже проверенный узел (Context.lookup): тип, значение и приведения детей берутся у него,
+        # так что узел готов, даже если родитель не заменит его общим (выражение-оператор)
+        for name in slot_names(type(self)):
+            if hasattr(shared, name):
+                setattr(self, name, getattr(shared, name))
+
+    def copy(self):
+        # неглубокая копия: общий узел (Context.intern) не правится на месте, правится его копия
+        node = object.__new__(type(self))
+        for name in slot_names(type(self)):
+            if hasattr(self, name):
+                setattr(node, name, getattr(self, name))
+        return node
+
+    def generate_code(self, code: List[str], label_count: List[int], *args):
+        run_steps(self.code_steps(code, label_count, *args))
+
     @abstractmethod
-    def semantic_analysis(self, context: Context)->dict:
+    def semantic_steps(self, context: Context):
+        # None - без ошибок, FAILED - ошибка уже в context.diagnostics
         pass
 
     @abstractmethod
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         pass
 
 
 class ValueNode(AstNode):
+    __slots__ = ('value', 'data_type', 'const_val')
     def __init__(self, value, data_type: DataType=None):
         super().__init__()
         self.value = value
@@ -53,10 +177,12 @@ class ValueNode(AstNode):
     def __str__(self)->str:
         return str(self.value) + ':' + str(self.data_type)
 
-    def semantic_analysis(self, context: Context)->dict:
+    def semantic_steps(self, context: Context):
         if self.value is not None:
             self.const_val = self.value
-        return {}
+
+    def intern_key(self):
+        return type(self), self.value
 
     def get_value(self):
         return self.value
@@ -64,17 +190,16 @@ class ValueNode(AstNode):
     def set_value(self, value):
         self.value = value
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         code.append('ldc                   %s' % self.value)
 
 
 class CastNode(ValueNode):
+    __slots__ = ('caster', 'node')
     def __init__(self, caster: tc.TypeCaster, node: ValueNode, value=None):
         super().__init__(value, caster.get_type())
         self.caster = caster
         self.node = node
-        if node.const_val is not None:
-            self.const_val = self.caster.cast_in_real_time(node.const_val, self.node.data_type)
 
     @property
     def children(self):
@@ -83,15 +208,22 @@ class CastNode(ValueNode):
     def __str__(self)->str:
         return 'CastTo_' + str(self.data_type) + ('| const_val = ' + str(self.const_val) if self.const_val else '')
 
-    def semantic_analysis(self, context: Context)->dict:
-        return {}
+    def semantic_steps(self, context: Context):
+        pass
+
+    def intern_key(self):
+        return None
+
+    def fold(self):
+        if self.node.const_val is not None:
+            self.const_val = self.caster.cast_in_real_time(self.node.const_val, self.node.data_type)
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if self.const_val is not None:
-            code.append('ldc                   %s' % self.const_val)
+            code.append(const_command(self.data_type, self.const_val))
             return
         else:
-            self.node.generate_code(code, label_count)
+            yield self.node.code_steps(code, label_count)
 
         command = JBCI.get_cast_command(self.node.data_type, self.data_type)
         if command is not None:
@@ -99,6 +231,7 @@ class CastNode(ValueNode):
 
 
 class ExprListNode(ValueNode):
+    __slots__ = ()
     def __init__(self, values: List[ValueNode]):
         super().__init__(values, ValListDataType(dte.none, len(values)))
 
@@ -109,21 +242,22 @@ class ExprListNode(ValueNode):
     def __str__(self) -> str:
         return 'expr_list ' + str(self.data_type)
 
-    def semantic_analysis(self, context: Context) -> dict:
+    def intern_key(self):
+        return None  # тип элементов задает присваивание
+
+    def semantic_steps(self, context: Context):
         for i, val in enumerate(self.value):
-            message = val.semantic_analysis(context)
-            if 'error' in message.keys():
-                return message
+            if (yield val.semantic_steps(context)) is FAILED:
+                return FAILED
+            self.value[i] = val = context.intern(val)
 
             if self.data_type.dte != val.data_type:
                 if not val.data_type.can_casted_to(self.data_type.dte):
-                    return {'error': 'can not cast %s to %s in pos %s' % (val.data_type, self.data_type, i)}
+                    return context.error(self, 'cast', 'can not cast %s to %s in pos %s', val.data_type, self.data_type, i)
                 caster = tc.get_caster(self.data_type.dte)
                 self.value[i] = CastNode(caster, self.value[i])
 
-        return {}
-
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         code.append('ldc                   %s' % self.data_type.length)
 
         if self.data_type.dte == dte.string:
@@ -134,25 +268,28 @@ class ExprListNode(ValueNode):
         for i, val in enumerate(self.value):
             code.append('dup')
             code.append('ldc                   %s' % i)
-            val.generate_code(code, label_count)
+            yield val.code_steps(code, label_count)
             code.append('%sastore               ' % JBCI.get_type_dte_lower(self.data_type.dte))
 
 
 class IntNode(ValueNode):
+    __slots__ = ()
     def __init__(self, value: int):
-        super().__init__(value, DataType(dte.int))
+        super().__init__(value, INT_TYPE)
 
 
 class FloatNode(ValueNode):
+    __slots__ = ()
     def __init__(self, value: float):
-        super().__init__(value, DataType(dte.float))
+        super().__init__(value, FLOAT_TYPE)
 
 
 class BoolNode(ValueNode):
+    __slots__ = ()
     def __init__(self, value: bool):
-        super().__init__(value, DataType(dte.bool))
+        super().__init__(value, BOOL_TYPE)
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if self.value:
             code.append('iconst_1')
         else:
@@ -160,15 +297,17 @@ class BoolNode(ValueNode):
 
 
 class StringNode(ValueNode):
+    __slots__ = ()
     def __init__(self, value: float):
-        super().__init__(value, DataType(dte.string))
+        super().__init__(value, STRING_TYPE)
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         self.value = self.value.replace('\n', r'\012')
         code.append('ldc                   %s' % self.value)
 
 
 class IdentNode(ValueNode):
+    __slots__ = ('name', 'var_type', 'index', 'prog_name')
     def __init__(self, name: str, data_type: DataType = None):
         super().__init__(None, data_type)
         self.name = name
@@ -179,21 +318,33 @@ class IdentNode(ValueNode):
     def __str__(self)->str:
         return '%s(%s, %s, %s)' % (self.name, self.index, self.data_type, self.var_type.value)
 
-    def semantic_analysis(self, context: Context)->dict:
+    def semantic_steps(self, context: Context):
         var_dis = context.get_var(self.name)
         if var_dis is None:
-            return {'error': 'Var is not defined: %s;\n' % self.name}
-        else:
-            self.get_description(var_dis)
-            self.prog_name = context.general_context.get_prog_name()
-            return {}
+            return context.error(self, 'undefined-var', 'Var is not defined: %s', self.name)
+        self.get_description(var_dis)
+        self.prog_name = context.general_context.get_prog_name()
+
+    def intern_key(self):
+        if self.var_type == VarType.CONST:
+            # у констант нет индекса, одноименные во вложенных блоках различаются значением и типом
+            return IdentNode, self.name, id(self.data_type), self.const_val
+        # разрешенный символ: индекс уникален для вида переменной в пределах GeneralContext
+        return IdentNode, self.name, self.var_type.value, self.index
 
     def get_description(self, description: VarDescription):
         self.data_type = description.data_type
         self.var_type = description.var_type
         self.index = description.index
+        if description.var_type == VarType.CONST:
+            self.const_val = description.value
+
+    def code_steps(self, code: List[str], label_count: List[int], get: bool=True):
+        if get and self.const_val is not None:
+            # константа или известное значение (проход propagate): значение вместо чтения
+            code.append(const_command(self.data_type, self.const_val))
+            return
 
-    def generate_code(self, code: List[str], label_count: List[int], get: bool=True):
         if self.var_type == VarType.GLOBAL:
             s = '%s/%s %s' % (self.prog_name, self.name, JBCI.get_type(self.data_type))
             if get:
@@ -216,10 +367,11 @@ class IdentNode(ValueNode):
 
 
 class LengthNode(ValueNode):
+    __slots__ = ('var',)
     def __init__(self, var: IdentNode):
-        super().__init__(None, DataType(dte.string))
+        super().__init__(None, STRING_TYPE)
         self.var = var
-        self.data_type = DataType(dte.int)
+        self.data_type = INT_TYPE
 
     @property
     def children(self):
@@ -228,18 +380,24 @@ class LengthNode(ValueNode):
     def __str__(self) -> str:
         return 'length'
 
-    def semantic_analysis(self, context: Context) -> dict:
-        message = self.var.semantic_analysis(context)
-        if 'error' in message:
-            return message
+    def semantic_steps(self, context: Context):
+        if (yield self.var.semantic_steps(context)) is FAILED:
+            return FAILED
+        self.var = context.intern(self.var)
+
+    def intern_key(self):
+        return LengthNode, shared_id(self.var)
 
+    def fold(self):
         if type(self.var.data_type) is ArrayDataType:
             self.const_val = self.var.data_type.length
 
-        return {}
+    def code_steps(self, code: List[str], label_count: List[int]):
+        if self.const_val is not None:
+            code.append('ldc                   %s' % self.const_val)
+            return
 
-    def generate_code(self, code: List[str], label_count: List[int]):
-        self.var.generate_code(code, label_count)
+        yield self.var.code_steps(code, label_count)
 
         if type(self.var.data_type) is ArrayDataType:
             code.append('arraylength')
@@ -249,7 +407,16 @@ class LengthNode(ValueNode):
             code.append('iconst_1')
 
 
-class VarDefNode(AstNode):
+class StatementNode(AstNode):
+    # pos - смещение в исходнике ключевого слова оператора (у присваивания - ':='), None - неизвестно
+    __slots__ = ('pos',)
+    def __init__(self):
+        super().__init__()
+        self.pos = None
+
+
+class VarDefNode(StatementNode):
+    __slots__ = ('name', 'data_type')
     def __init__(self, name: str, data_type: str):
         super().__init__()
         self.name = name
@@ -258,19 +425,53 @@ class VarDefNode(AstNode):
     def __str__(self)->str:
         return 'var ' + str(self.name) + ': ' + str(self.data_type)
 
-    def semantic_analysis(self, context: Context)->dict:
+    def semantic_steps(self, context: Context):
         var_type = VarType.GLOBAL if context.is_global else VarType.LOCAL
 
         s = context.add_var(self.name, self.data_type, var_type)
         if s is not None:
-            return {'error': '%s: %s;\n' % (s, self.name)}
-        return {}
+            return context.error(self, 'redefined-var', '%s: %s', s, self.name)
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         pass
 
 
-class AssignNode(AstNode):
+class ConstDefNode(StatementNode):
+    __slots__ = ('name', 'expr', 'data_type')
+    def __init__(self, name: str, expr: ValueNode):
+        super().__init__()
+        self.name = name
+        self.expr = expr
+        self.data_type = None
+
+    @property
+    def children(self):
+        return (self.expr,)
+
+    def __str__(self)->str:
+        return 'const ' + str(self.name) + ': ' + str(self.data_type)
+
+    def semantic_steps(self, context: Context):
+        from passes import fold_constants
+        if (yield self.expr.semantic_steps(context)) is FAILED:
+            return FAILED
+        self.expr = context.intern(self.expr)  # при share узел, совпавший с общим, не проанализирован до конца
+        # значение считается сразу, при любом уровне оптимизации: им пользуются следующие операторы
+        fold_constants(self.expr)
+        if self.expr.const_val is None or type(self.expr.data_type) is not DataType:
+            return context.error(self, 'not-const', 'Value of constant %s is not known at compile time', self.name)
+        self.data_type = self.expr.data_type
+
+        s = context.add_var(self.name, self.data_type, VarType.CONST, self.expr.const_val)
+        if s is not None:
+            return context.error(self, 'redefined-var', '%s: %s', s, self.name)
+
+    def code_steps(self, code: List[str], label_count: List[int]):
+        pass
+
+
+class AssignNode(StatementNode):
+    __slots__ = ('var', 'expr')
     def __init__(self, var: IdentNode, expr: ValueNode):
         super().__init__()
         self.var = var
@@ -283,41 +484,42 @@ class AssignNode(AstNode):
     def __str__(self) -> str:
         return ':='
 
-    def semantic_analysis(self, context: Context)->dict:
-        message1 = self.var.semantic_analysis(context)
+    def semantic_steps(self, context: Context):
+        result1 = yield self.var.semantic_steps(context)
 
-        if type(self.expr) is ExprListNode:
-            self.expr.data_type.dte = self.var.data_type.dte
+        if type(self.expr) is ExprListNode and self.var.data_type is not None:
+            # типы общие и не меняются: список значений получает тип с элементами переменной
+            self.expr.data_type = ValListDataType(self.var.data_type.dte, self.expr.data_type.length)
 
-        message2 = self.expr.semantic_analysis(context)
+        result2 = yield self.expr.semantic_steps(context)
 
-        if 'error' in message1.keys():
-            return message1
-        elif 'error' in message2.keys():
-            return message2
+        if result1 is FAILED or result2 is FAILED:
+            return FAILED
 
         if type(self.var) is VarDefNode or type(self.var) is ArrayDefNode:
             self.var = IdentNode(self.var.name, self.var.data_type)
-            self.var.semantic_analysis(context)
+            yield self.var.semantic_steps(context)
+        elif type(self.var) is IdentNode and self.var.var_type == VarType.CONST:
+            return context.error(self, 'const-assign', 'Can not assign to constant %s', self.var.name)
+        self.var = context.intern(self.var)
+        self.expr = context.intern(self.expr)
 
         if self.var.data_type != self.expr.data_type:
             if not self.expr.data_type.can_casted_to(self.var.data_type):
-                return {'error': 'can not cast %s to %s' % (self.expr.data_type, self.var.data_type)}
+                return context.error(self, 'cast', 'can not cast %s to %s', self.expr.data_type, self.var.data_type)
 
             caster = tc.get_caster(self.var.data_type)
             self.expr = CastNode(caster, self.expr)
 
-        return {}
-
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if type(self.var) is ArrayCallNode:
-            self.var.generate_code(code, label_count, False)
+            yield self.var.code_steps(code, label_count, False)
             last_command = code.pop()
-            self.expr.generate_code(code, label_count)
+            yield self.expr.code_steps(code, label_count)
             code.append(last_command)
         else:
-            self.expr.generate_code(code, label_count)
-            self.var.generate_code(code, label_count, False)
+            yield self.expr.code_steps(code, label_count)
+            yield self.var.code_steps(code, label_count, False)
 
 
 class BinOp(Enum):
@@ -334,6 +536,7 @@ class BinOp(Enum):
 
 
 class MathBinOpNode(ValueNode):
+    __slots__ = ('op', 'arg1', 'arg2')
     def __init__(self, op: str, arg1: ValueNode, arg2: ValueNode):
         super().__init__(None)
         self.op = BinOp(op)
@@ -347,72 +550,93 @@ class MathBinOpNode(ValueNode):
     def __str__(self)->str:
         return str(self.op.value) + (' | const_val = ' + str(self.const_val) if self.const_val else '')
 
-    def semantic_analysis(self, context: Context)->dict:
-        message1 = self.arg1.semantic_analysis(context)
-        message2 = self.arg2.semantic_analysis(context)
-
-        if 'error' in message1.keys():
-            return message1
-        elif 'error' in message2.keys():
-            return message2
-
-        if 'noneFunc' in message1.keys():
-            return {'error': 'error noneFunc ' + message1['name'] + ' in binOp ' + str(self.op.value) + ';\n'}
-        elif 'noneFunc' in message2.keys():
-            return {'error': 'error noneFunc ' + message2['name'] + ' in binOp ' + str(self.op.value) + ';\n'}
+    def semantic_steps(self, context: Context):
+        result1 = yield self.arg1.semantic_steps(context)
+        result2 = yield self.arg2.semantic_steps(context)
+        if result1 is FAILED or result2 is FAILED:
+            return FAILED
+
+        self.arg1 = context.intern(self.arg1)
+        self.arg2 = context.intern(self.arg2)
+        shared = context.lookup(self)
+        if shared is not None:
+            self.adopt(shared)  # такое же выражение уже проверено, родитель возьмет общий узел
+            return
 
         if self.arg1.data_type != self.arg2.data_type:
             caster, priority_type = tc.get_priority_caster(self.arg1.data_type, self.arg2.data_type)
             if caster is None:
-                return {'error': 'Can not cast %s to %s' % (str(self.arg1.data_type), str(self.arg2.data_type))}
+                return context.error(self, 'cast', 'Can not cast %s to %s', self.arg1.data_type, self.arg2.data_type)
 
             if self.arg1.data_type != priority_type:
                 self.arg1 = CastNode(caster, self.arg1)
             elif self.arg2.data_type != priority_type:
                 self.arg2 = CastNode(caster, self.arg2)
 
-        self.data_type = DataType(self.arg1.data_type.dte)
+        self.data_type = SCALAR_TYPES[self.arg1.data_type.elem_id]
 
         if self.data_type == dte.string and self.op != BinOp.ADD:
-            return {'error': 'Operation %s is not allowed for string' % self.op.value}
+            return context.error(self, 'operation', 'Operation %s is not allowed for string', self.op.value)
         elif type(self.data_type) is ArrayDataType:
-            return {'error': 'Operation %s is not allowed for arrays' % self.op.value}
+            return context.error(self, 'operation', 'Operation %s is not allowed for arrays', self.op.value)
 
-        if self.arg1.const_val is not None and self.arg2.const_val is not None:
+    def fold(self):
+        # data_type не задан - анализ узла не прошел
+        if self.data_type is None or self.arg1.const_val is None or self.arg2.const_val is None:
+            return
+        if self.data_type == dte.string and self.op != BinOp.ADD or type(self.data_type) is ArrayDataType:
+            return
+        try:
             self.optimize()
+        except ZeroDivisionError:
+            self.const_val = None  # деление на ноль остается до выполнения
 
-        return {}
+    def intern_key(self):
+        return MathBinOpNode, self.op.value, shared_id(self.arg1), shared_id(self.arg2)
 
     def optimize(self):
         if self.op == BinOp.ADD:
-            self.const_val = self.arg1.const_val + self.arg2.const_val
+            if self.data_type == dte.string:
+                # у строковых литералов значение в кавычках: склеивается содержимое
+                if self.arg1.const_val[:1] == '"' and self.arg2.const_val[:1] == '"':
+                    self.const_val = self.arg1.const_val[:-1] + self.arg2.const_val[1:]
+            else:
+                self.const_val = self.arg1.const_val + self.arg2.const_val
         elif self.op == BinOp.SUB:
             self.const_val = self.arg1.const_val - self.arg2.const_val
         elif self.op == BinOp.MUL:
             self.const_val = self.arg1.const_val * self.arg2.const_val
         elif self.op == BinOp.DIV:
-            self.const_val = self.arg1.const_val / self.arg2.const_val
+            if self.data_type == dte.int:
+                # как idiv: дробная часть отбрасывается (к нулю), результат - целое
+                quotient = abs(self.arg1.const_val) // abs(self.arg2.const_val)
+                negative = (self.arg1.const_val < 0) != (self.arg2.const_val < 0)
+                self.const_val = -quotient if negative else quotient
+            else:
+                self.const_val = self.arg1.const_val / self.arg2.const_val
+        if self.data_type == dte.int and self.const_val is not None:
+            self.const_val = wrap_int(self.const_val)
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if self.const_val is not None:
-            code.append('ldc                   %s' % self.const_val)
+            code.append(const_command(self.data_type, self.const_val))
             return
 
         if self.data_type == dte.string:
             code.append('new                   java/lang/StringBuilder')
             code.append('dup')
             code.append('invokespecial         java/lang/StringBuilder/<init>()V')
-            self.arg1.generate_code(code, label_count)
+            yield self.arg1.code_steps(code, label_count)
             code.append(
                 'invokevirtual         java/lang/StringBuilder/append(Ljava/lang/String;)Ljava/lang/StringBuilder;')
-            self.arg2.generate_code(code, label_count)
+            yield self.arg2.code_steps(code, label_count)
             code.append(
                 'invokevirtual         java/lang/StringBuilder/append(Ljava/lang/String;)Ljava/lang/StringBuilder;')
             code.append('invokevirtual         java/lang/StringBuilder/toString()Ljava/lang/String;')
             return
 
-        self.arg1.generate_code(code, label_count)
-        self.arg2.generate_code(code, label_count)
+        yield self.arg1.code_steps(code, label_count)
+        yield self.arg2.code_steps(code, label_count)
         if self.op == BinOp.ADD:
             code.append("%sadd" % JBCI.get_type_lower(self.data_type))
         elif self.op == BinOp.SUB:
@@ -424,12 +648,13 @@ class MathBinOpNode(ValueNode):
 
 
 class LogicBinOpNode(ValueNode):
+    __slots__ = ('op', 'arg1', 'arg2')
     def __init__(self, op: BinOp, arg1: ValueNode, arg2: ValueNode):
         super().__init__(None)
         self.op = BinOp(op)
         self.arg1 = arg1
         self.arg2 = arg2
-        self.data_type = DataType(dte.bool)
+        self.data_type = BOOL_TYPE
 
     @property
     def children(self):
@@ -438,22 +663,21 @@ class LogicBinOpNode(ValueNode):
     def __str__(self)->str:
         return str(self.op.value) + (' | const_val = ' + str(self.const_val) if self.const_val else '')
 
-    def semantic_analysis(self, context: Context)->dict:
-        message1 = self.arg1.semantic_analysis(context)
-        message2 = self.arg2.semantic_analysis(context)
-
-        if 'error' in message1.keys():
-            return message1
-        elif 'error' in message2.keys():
-            return message2
-
-        if 'noneFunc' in message1.keys():
-            return {'error': 'error noneFunc ' + message1['name'] + ' in binOp ' + str(self.op.value) + ';\n'}
-        elif 'noneFunc' in message2.keys():
-            return {'error': 'error noneFunc ' + message2['name'] + ' in binOp ' + str(self.op.value) + ';\n'}
+    def semantic_steps(self, context: Context):
+        result1 = yield self.arg1.semantic_steps(context)
+        result2 = yield self.arg2.semantic_steps(context)
+        if result1 is FAILED or result2 is FAILED:
+            return FAILED
+
+        self.arg1 = context.intern(self.arg1)
+        self.arg2 = context.intern(self.arg2)
+        shared = context.lookup(self)
+        if shared is not None:
+            self.adopt(shared)  # такое же выражение уже проверено, родитель возьмет общий узел
+            return
 
         if self.op == BinOp.AND or self.op == BinOp.OR:
-            caster = tc.BoolCaster()
+            caster = tc.BOOL_CASTER
             if self.arg1.data_type != dte.bool:
                 self.arg1 = CastNode(caster, self.arg1)
             if self.arg2.data_type != dte.bool:
@@ -461,20 +685,26 @@ class LogicBinOpNode(ValueNode):
         elif self.arg1.data_type != self.arg2.data_type:
             caster, priority_type = tc.get_priority_caster(self.arg1.data_type, self.arg2.data_type)
             if caster is None:
-                return {'error': 'Can not cast ' + str(self.arg1.data_type) + ' to ' + str(self.arg2.data_type)}
+                return context.error(self, 'cast', 'Can not cast %s to %s', self.arg1.data_type, self.arg2.data_type)
 
             if self.arg1.data_type != priority_type:
                 self.arg1 = CastNode(caster, self.arg1)
             elif self.arg2.data_type != priority_type:
                 self.arg2 = CastNode(caster, self.arg2)
 
+    def fold(self):
+        # строки код сравнивает по длине (String/length), а длина литерала с escape-последовательностями
+        # до выполнения не известна - сравнения строк не сворачиваются
+        if self.arg1.data_type == dte.string or self.arg2.data_type == dte.string:
+            return
         if self.arg1.const_val is not None and self.arg2.const_val is not None:
             self.optimize(self.arg1.const_val, self.arg2.const_val)
 
         if type(self.arg1.data_type) is ArrayDataType and self.op != BinOp.AND and self.op != BinOp.OR:
             self.optimize(self.arg1.data_type.length, self.arg1.data_type.length)
 
-        return {}
+    def intern_key(self):
+        return LogicBinOpNode, self.op.value, shared_id(self.arg1), shared_id(self.arg2)
 
     def optimize(self, const_val_1, const_val_2):
         if self.op == BinOp.EQUAL:
@@ -490,9 +720,7 @@ class LogicBinOpNode(ValueNode):
         elif self.op == BinOp.OR:
             self.const_val = const_val_1 or const_val_2
 
-        return {}
-
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if self.const_val is not None:
             code.append('iconst_1' if self.const_val else 'iconst_0')
             return
@@ -513,9 +741,9 @@ class LogicBinOpNode(ValueNode):
                iconst_0              
             LABEL_out:
             '''
-            self.arg1.generate_code(code, label_count)
+            yield self.arg1.code_steps(code, label_count)
             code.append('ifeq                  LABEL_%s' % label_false)
-            self.arg2.generate_code(code, label_count)
+            yield self.arg2.code_steps(code, label_count)
             code.append('ifeq                  LABEL_%s' % label_false)
             code.append('LABEL_%s:' % label_true)
             code.append('iconst_1')
@@ -536,9 +764,9 @@ class LogicBinOpNode(ValueNode):
             LABEL_fale:
                iconst_0              
             LABEL_out:'''
-            self.arg1.generate_code(code, label_count)
+            yield self.arg1.code_steps(code, label_count)
             code.append('ifne                  LABEL_%s' % label_true)
-            self.arg2.generate_code(code, label_count)
+            yield self.arg2.code_steps(code, label_count)
             code.append('ifeq                  LABEL_%s' % label_false)
             code.append('LABEL_%s:' % label_true)
             code.append('iconst_1')
@@ -548,13 +776,13 @@ class LogicBinOpNode(ValueNode):
             code.append('LABEL_%s:' % label_out)
             return
 
-        self.arg1.generate_code(code, label_count)
+        yield self.arg1.code_steps(code, label_count)
         if type(self.arg1.data_type) is ArrayDataType:
             code.append('arraylength')
         elif self.arg1.data_type == dte.string:
             code.append('invokevirtual         java/lang/String/length()I')
 
-        self.arg2.generate_code(code, label_count)
+        yield self.arg2.code_steps(code, label_count)
         if type(self.arg2.data_type) is ArrayDataType:
             code.append('arraylength')
         elif self.arg2.data_type == dte.string:
@@ -571,6 +799,7 @@ class LogicBinOpNode(ValueNode):
 
 
 class StateListNode(AstNode):
+    __slots__ = ('states', 'prog_name')
     def __init__(self, states: List[AstNode]):
         super().__init__()
         self.states = states
@@ -586,27 +815,38 @@ class StateListNode(AstNode):
     def __str__(self)->str:
         return 'begin'
 
-    def semantic_analysis(self, context: Context, local_context: Context = None)->dict:
-        if local_context is not None:
+    def semantic_steps(self, context: Context, local_context: Context = None):
+        # переданный блок закрывает тот, кто его создал
+        own_context = local_context is None
+        if not own_context:
             pass
         elif context is None:
-            return {'error': 'None context!'}
+            raise ValueError('None context!')
         else:
             local_context = Context(context)
 
-        error = ''
+        # сигнатуры функций блока - до анализа операторов: вызов может стоять раньше определения
         for s in self.states:
-            message = s.semantic_analysis(local_context)  # state list
-            if 'error' in message.keys():
-                error += message['error'] + '. \n'
-
-        if len(error) == 0:
-            self.prog_name = context.get_prog_name()
-            return {}
+            if type(s) is FuncDefNode:
+                s.declare(local_context)
 
-        return {'error': error}
+        # ошибка оператора без своей позиции получает позицию оператора (Diagnostics.statement)
+        diagnostics = local_context.diagnostics
+        outer = diagnostics.statement
+        failed = False
+        for s in self.states:
+            diagnostics.statement = s
+            if (yield s.semantic_steps(local_context)) is FAILED:  # state list
+                failed = True
+        diagnostics.statement = outer
+        if own_context:
+            local_context.close()
+
+        if failed:
+            return FAILED
+        self.prog_name = context.get_prog_name()
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         for node in self.states:
             if type(node) is ArrayDefNode and node.var_type == VarType.GLOBAL:
                 code.append('ldc                   %s' % node.data_type.length)
@@ -615,10 +855,11 @@ class StateListNode(AstNode):
                     ('a' if node.data_type.dte == dte.string else '', JBCI.get_type_full(node.data_type.dte)))
                 code.append('putstatic             %s/%s %s'
                               % (self.prog_name, node.name, JBCI.get_type(node.data_type)))
-            node.generate_code(code, label_count)
+            yield node.code_steps(code, label_count)
 
 
-class WritelnNode(AstNode):
+class WritelnNode(StatementNode):
+    __slots__ = ('expr', 'prog_name')
     def __init__(self, expr: ValueNode):
         super().__init__()
         self.expr = expr
@@ -631,30 +872,29 @@ class WritelnNode(AstNode):
     def __str__(self)->str:
         return 'writeln (' + str(self.expr) + ')'
 
-    def semantic_analysis(self, context: Context)->dict:
-        message = self.expr.semantic_analysis(context)
-
-        if 'error' in message.keys():
-            return message
+    def semantic_steps(self, context: Context):
+        if (yield self.expr.semantic_steps(context)) is FAILED:
+            return FAILED
+        self.expr = context.intern(self.expr)
 
         self.prog_name = context.general_context.get_prog_name()
-        return {}
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if type(self.expr.data_type) is ArrayDataType:
             for i in range(self.expr.data_type.length):
                 code.append('getstatic             java/lang/System/out Ljava/io/PrintStream;')
-                self.expr.generate_code(code, label_count)
+                yield self.expr.code_steps(code, label_count)
                 code.append('ldc                   %s' % i)
                 code.append('%saload' % JBCI.get_type_lower(self.expr.data_type))
                 code.append('invokevirtual         java/io/PrintStream/print(%s)V' % JBCI.get_type(self.expr.data_type))
         else:
             code.append('getstatic             java/lang/System/out Ljava/io/PrintStream;')
-            self.expr.generate_code(code, label_count)
+            yield self.expr.code_steps(code, label_count)
             code.append('invokevirtual         java/io/PrintStream/print(%s)V' % JBCI.get_type(self.expr.data_type))
 
 
-class ReadlnNode(AstNode):
+class ReadlnNode(StatementNode):
+    __slots__ = ('var',)
     def __init__(self, var: IdentNode):
         super().__init__()
         self.var = var
@@ -666,10 +906,14 @@ class ReadlnNode(AstNode):
     def __str__(self)->str:
         return 'readln (' + str(self.var) + ')'
 
-    def semantic_analysis(self, context: Context)->dict:
-        return self.var.semantic_analysis(context)
+    def semantic_steps(self, context: Context):
+        if (yield self.var.semantic_steps(context)) is FAILED:
+            return FAILED
+        if self.var.var_type == VarType.CONST:
+            return context.error(self, 'const-assign', 'Can not assign to constant %s', self.var.name)
+        self.var = context.intern(self.var)
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         s1 = 'getstatic             %s/SCANER Ljava/util/Scanner;' % self.var.prog_name
         s2 = ''
         if self.var.data_type.dte == dte.int:
@@ -683,22 +927,23 @@ class ReadlnNode(AstNode):
 
         if type(self.var.data_type) is ArrayDataType:
             for i in range(self.var.data_type.length):
-                self.var.generate_code(code, label_count, False)
+                yield self.var.code_steps(code, label_count, False)
                 code.append('ldc                   %s' % i)
                 code.append(s1)
                 code.append(s2)
                 code.append('%sastore' % JBCI.get_type_lower(self.var.data_type))
         elif type(self.var) is ArrayCallNode:
-            self.var.generate_code(code, label_count, False)
+            yield self.var.code_steps(code, label_count, False)
             code.insert(len(code) - 1, s1)
             code.insert(len(code) - 1, s2)
         else:
             code.append(s1)
             code.append(s2)
-            self.var.generate_code(code, label_count, False)
+            yield self.var.code_steps(code, label_count, False)
 
 
-class IfNode(AstNode):  # Not leaf
+class IfNode(StatementNode):  # Not leaf
+    __slots__ = ('condition', 'then_body', 'else_body')
     def __init__(self, condition: ValueNode, then_body: StateListNode, else_body: StateListNode = None):
         super().__init__()
         self.condition = condition
@@ -712,47 +957,47 @@ class IfNode(AstNode):  # Not leaf
     def __str__(self)->str:
         return 'if'
 
-    def semantic_analysis(self, context: Context)->dict:
-        message = self.condition.semantic_analysis(context)  # if condition
-        if 'error' in message.keys():
-            return message
+    def semantic_steps(self, context: Context):
+        if (yield self.condition.semantic_steps(context)) is FAILED:  # if condition
+            return FAILED
+        self.condition = context.intern(self.condition)
 
         if self.condition.data_type != dte.bool:
-            self.condition = CastNode(tc.BoolCaster(), self.condition)
+            self.condition = CastNode(tc.BOOL_CASTER, self.condition)
 
         local_context_then = Context(context)
-        message = self.then_body.semantic_analysis(context, local_context_then)  # if then
-        if 'error' in message.keys():
-            return message
+        result = yield self.then_body.semantic_steps(context, local_context_then)  # if then
+        local_context_then.close()
+        if result is FAILED:
+            return FAILED
 
         if self.else_body is not None:
             local_context_else = Context(context)
-            message = self.else_body.semantic_analysis(context, local_context_else)  # if else
-            if 'error' in message.keys():
-                return message
+            result = yield self.else_body.semantic_steps(context, local_context_else)  # if else
+            local_context_else.close()
+            return result
 
-        return {}
-
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         label_else = label_count[0]
         label_out = label_count[0] + 1
         label_count[0] += 2
 
-        self.condition.generate_code(code, label_count)
+        yield self.condition.code_steps(code, label_count)
         code.append('ifeq                  LABEL_%s' % label_else)
-        self.then_body.generate_code(code, label_count)
+        yield self.then_body.code_steps(code, label_count)
         if code[len(code) - 1][1:] != 'return':
             code.append('goto                  LABEL_%s' % label_out)
 
         code.append('LABEL_%s:' % label_else)
         if self.else_body is not None:
-            self.else_body.generate_code(code, label_count)
+            yield self.else_body.code_steps(code, label_count)
 
         if code[len(code) - 1][1:] != 'return':
             code.append('LABEL_%s:' % label_out)
 
 
-class ForNode(AstNode):
+class ForNode(StatementNode):
+    __slots__ = ('var', 'start_value', 'end_value', 'loop_body')
     def __init__(self, var: IdentNode, start_value: ValueNode, end_value: ValueNode, loop_body: StateListNode):
         super().__init__()
         self.var = var
@@ -767,53 +1012,54 @@ class ForNode(AstNode):
     def __str__(self) -> str:
         return 'for'
 
-    def semantic_analysis(self, context: Context)->dict:
-        message = self.var.semantic_analysis(context)  # for var
-        if 'error' in message.keys():
-            return message
+    def semantic_steps(self, context: Context):
+        if (yield self.var.semantic_steps(context)) is FAILED:  # for var
+            return FAILED
+        if self.var.var_type == VarType.CONST:
+            return context.error(self.var, 'const-assign', 'Can not assign to constant %s', self.var.name)
+        self.var = context.intern(self.var)
         if self.var.data_type != dte.int:
-            return {'error': 'Only int type'}
+            return context.error(self.var, 'for-var', 'Only int type')
 
-        message = self.start_value.semantic_analysis(context)  # for start
-        if 'error' in message.keys():
-            return message
+        if (yield self.start_value.semantic_steps(context)) is FAILED:  # for start
+            return FAILED
+        self.start_value = context.intern(self.start_value)
         if self.start_value.data_type != dte.int:
-            self.start_value = CastNode(tc.IntCaster(), self.start_value)
+            self.start_value = CastNode(tc.INT_CASTER, self.start_value)
 
-        message = self.end_value.semantic_analysis(context)  # for end
-        if 'error' in message.keys():
-            return message
+        if (yield self.end_value.semantic_steps(context)) is FAILED:  # for end
+            return FAILED
+        self.end_value = context.intern(self.end_value)
         if self.end_value.data_type != dte.int:
-            self.end_value = CastNode(tc.IntCaster(), self.end_value)
+            self.end_value = CastNode(tc.INT_CASTER, self.end_value)
 
         local_context = Context(context)
-        message = self.loop_body.semantic_analysis(context, local_context)  # for body
-        if 'error' in message.keys():
-            return message
-
-        return {}
+        result = yield self.loop_body.semantic_steps(context, local_context)  # for body
+        local_context.close()
+        return result
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         start_label = label_count[0]
         end_label = label_count[0] + 1
         label_count[0] += 2
 
-        self.start_value.generate_code(code, label_count)
-        self.var.generate_code(code, label_count, False)
+        yield self.start_value.code_steps(code, label_count)
+        yield self.var.code_steps(code, label_count, False)
         code.append('LABEL_%s:' % start_label)
-        self.var.generate_code(code, label_count)
-        self.end_value.generate_code(code, label_count)
+        yield self.var.code_steps(code, label_count)
+        yield self.end_value.code_steps(code, label_count)
         code.append('if_icmpgt             LABEL_%s' % end_label)
-        self.loop_body.generate_code(code, label_count)
-        self.var.generate_code(code, label_count)
+        yield self.loop_body.code_steps(code, label_count)
+        yield self.var.code_steps(code, label_count)
         code.append('iconst_1')
         code.append('iadd')
-        self.var.generate_code(code, label_count, False)
+        yield self.var.code_steps(code, label_count, False)
         code.append('goto                  LABEL_%s' % start_label)
         code.append('LABEL_%s:' % end_label)
 
 
-class WhileNode(AstNode):
+class WhileNode(StatementNode):
+    __slots__ = ('condition', 'loop_body')
     def __init__(self, condition: ValueNode, loop_body: StateListNode):
         super().__init__()
         self.condition = condition
@@ -826,33 +1072,41 @@ class WhileNode(AstNode):
     def __str__(self) -> str:
         return 'while'
 
-    def semantic_analysis(self, context: Context):
-        message = self.condition.semantic_analysis(context)  # while condition
-        if 'error' in message.keys():
-            return message
+    def semantic_steps(self, context: Context):
+        if (yield self.condition.semantic_steps(context)) is FAILED:  # while condition
+            return FAILED
+        self.condition = context.intern(self.condition)
 
-        self.condition = CastNode(tc.BoolCaster(), self.condition)
+        self.condition = CastNode(tc.BOOL_CASTER, self.condition)
 
         local_context = Context(context)
-        message = self.loop_body.semantic_analysis(context, local_context)  # while body
-        if 'error' in message.keys():
-            return message
-
-        return {}
+        result = yield self.loop_body.semantic_steps(context, local_context)  # while body
+        local_context.close()
+        return result
+
+    def code_steps(self, code: List[str], label_count: List[int]):
+        if self.condition.const_val:
+            # условие всегда истинно (проход fold): без проверки и метки выхода
+            start_label = label_count[0]
+            label_count[0] += 1
+            code.append('LABEL_%s:' % start_label)
+            yield self.loop_body.code_steps(code, label_count)
+            code.append('goto                  LABEL_%s' % start_label)
+            return
 
-    def generate_code(self, code: List[str], label_count: List[int]):
         start_label = label_count[0]
         end_label = label_count[0] + 1
         label_count[0] += 2
         code.append('LABEL_%s:' % start_label)
-        self.condition.generate_code(code, label_count)
+        yield self.condition.code_steps(code, label_count)
         code.append('ifeq                  LABEL_%s' % end_label)
-        self.loop_body.generate_code(code, label_count)
+        yield self.loop_body.code_steps(code, label_count)
         code.append('goto                  LABEL_%s' % start_label)
         code.append('LABEL_%s:' % end_label)
 
 
 class Param(object):
+    __slots__ = ('name', 'data_type', 'var_type')
     def __init__(self, name: str, data_type: Union[str, DataType]):
         super().__init__()
         if type(data_type) is str:
@@ -866,12 +1120,14 @@ class Param(object):
 
 
 class ParamArray(Param):
+    __slots__ = ()
     def __init__(self, name: str, data_type: str, first_idx: int, last_idx: int):
         self.data_type = ArrayDataType(data_type, first_idx, last_idx)
         super().__init__(name, self.data_type)
 
 
-class VarCounterNode(AstNode):
+class VarCounterNode(StatementNode):
+    __slots__ = ('body', 'return_type', 'var_list')
     def __init__(self, body: StateListNode, return_type: DataType=None):
         super().__init__()
         self.body = body
@@ -879,17 +1135,18 @@ class VarCounterNode(AstNode):
         self.var_list = []
 
     @abstractmethod
-    def semantic_analysis(self, context: Context):
+    def semantic_steps(self, context: Context):
         pass
 
     def add_var_dis(self, var_dis: VarDescription):
         self.var_list.append(var_dis)
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         pass
 
 
 class ProgramNode(VarCounterNode):
+    __slots__ = ('name',)
     def __init__(self, body: StateListNode, name: str = 'prog'):
         super().__init__(body, None)
         self.name = name
@@ -901,18 +1158,32 @@ class ProgramNode(VarCounterNode):
     def __str__(self) -> str:
         return 'program ' + self.name
 
-    def semantic_analysis(self, context: Context):
+    def semantic_analysis(self, context: Context, share: bool = False, diagnostics: Diagnostics = None)->Diagnostics:
+        if diagnostics is None:
+            diagnostics = Diagnostics() if context is None else context.diagnostics
+        run_steps(self.semantic_steps(context, share, diagnostics))
+        return diagnostics
+
+    def semantic_steps(self, context: Context, share: bool = False, diagnostics: Diagnostics = None):
+        # share - сводить равные выражения к общим узлам (Context.intern)
         global_context = GeneralContext(self, context)
         global_context.prog_name = self.name
         global_context.is_global = True
+        global_context.node_table.enabled = share
+        if diagnostics is not None:
+            global_context.diagnostics = diagnostics
 
-        message = self.body.semantic_analysis(global_context)  # program
-        if 'error' in message.keys():
-            return message
+        return (yield self.body.semantic_steps(global_context))  # program
 
-        return {}
+    def code_steps(self, code: List[str], label_count: List[int]):
+        # метки нумеруются в каждом методе заново (generate_state), label_count не нужен
+        self.generate_header(code)
+        clinit = self.generate_clinit_header()
+        for node in self.body:
+            self.generate_state(node, code, clinit)
+        code.extend(self.generate_clinit_footer(clinit))
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def generate_header(self, code: List[str]):
         code.append('.source                  %s.java' % self.name)
         code.append('.class                   public %s' % self.name)
         code.append('.super                   java/lang/Object')
@@ -935,8 +1206,9 @@ class ProgramNode(VarCounterNode):
         # special functions for convert int, float, str to bool
         JBCI.to_bool_func(code)
 
+    def generate_clinit_header(self) -> List[str]:
         # init global variables
-        clinit = [
+        return [
             '.method                  static <clinit>()V',
             '.limit stack          10',
             '.limit locals         0',
@@ -946,44 +1218,46 @@ class ProgramNode(VarCounterNode):
             'invokespecial         java/util/Scanner/<init>(Ljava/io/InputStream;)V',
             'putstatic             %s/SCANER Ljava/util/Scanner;' % self.name]
 
-        local_var_count = 1
-        for var in self.var_list:
-            local_var_count += 1 if var.var_type == VarType.LOCAL else 0
-
-        label_count = [7]
-        for node in self.body:
-            if type(node) is AssignNode:   # def and init global vars
-                node.generate_code(clinit, [])
-            elif type(node) is FuncDefNode:  # function
-                node.generate_code(code, label_count)
-            elif type(node) is StateListNode:  # main body
-                code.append('.method                  public static main([Ljava/lang/String;)V')
-                code.append('.limit stack          10')
-                code.append('.limit locals         %s' % local_var_count)
-                node.generate_code(code, label_count)
-            else:  # def global
-                if type(node) is ArrayDefNode:  # global array
-                    clinit.append('ldc                   %s' % node.data_type.length)
-                    clinit.append('newarray              %s' % JBCI.get_type_full(node.data_type))
-                    clinit.append('putstatic             %s/%s %s'
-                                  % (self.name, node.name, JBCI.get_type(node.data_type)))
-
+    def generate_state(self, node: AstNode, code: List[str], clinit: List[str]):
+        # оператор верхнего уровня: функции и основной блок пишутся в code, глобальные переменные в clinit.
+        # Метки у каждого метода свои, поэтому методы можно генерировать независимо и в любом порядке
+        if type(node) is AssignNode:   # def and init global vars
+            node.generate_code(clinit, [])
+        elif type(node) is FuncDefNode:  # function
+            node.generate_code(code, [FIRST_LABEL])
+        elif type(node) is StateListNode:  # main body
+            local_var_count = 1
+            for var in self.var_list:
+                local_var_count += 1 if var.var_type == VarType.LOCAL else 0
+
+            code.append('.method                  public static main([Ljava/lang/String;)V')
+            code.append('.limit stack          10')
+            code.append('.limit locals         %s' % local_var_count)
+            node.generate_code(code, [FIRST_LABEL])
+
+            # end of program
+            code.append('getstatic             %s/SCANER Ljava/util/Scanner;' % self.name)
+            code.append('invokevirtual         java/util/Scanner/close()V')
+            code.append('return')
+            code.append('.end method')
+            code.append('')
+        else:  # def global
+            if type(node) is ArrayDefNode:  # global array
+                clinit.append('ldc                   %s' % node.data_type.length)
+                clinit.append('newarray              %s' % JBCI.get_type_full(node.data_type))
+                clinit.append('putstatic             %s/%s %s'
+                              % (self.name, node.name, JBCI.get_type(node.data_type)))
+
+    def generate_clinit_footer(self, clinit: List[str]) -> List[str]:
         # end of init global vars
         clinit.append('return')
         clinit.append('.end method\n')
         clinit.append('')
-
-        # end of program
-        code.append('getstatic             %s/SCANER Ljava/util/Scanner;' % self.name)
-        code.append('invokevirtual         java/util/Scanner/close()V')
-        code.append('return')
-        code.append('.end method')
-
-        code.append('')
-        code.extend(clinit)
+        return clinit
 
 
 class FuncDefNode(VarCounterNode):
+    __slots__ = ('name', 'arguments')
     def __init__(self, name: str, arguments: List[Param], return_type: Tuple, body: StateListNode):
         if len(return_type) > 1:
             super().__init__(body, ArrayDataType(return_type[0], return_type[1], return_type[2]))
@@ -1003,24 +1277,25 @@ class FuncDefNode(VarCounterNode):
         s = s[:-2] + ' ): ' + str(self.return_type)
         return s
 
-    def semantic_analysis(self, context: Context):
-        local_context = GeneralContext(self, context, True)
-        params = []
-        if self.arguments is not None:
-            for arg in self.arguments:
-                arg.var_type = VarType.PARAM
-                local_context.add_var(arg.name, arg.data_type, arg.var_type)
-                params.append(arg.data_type)
+    def signature(self) -> tuple:
+        # имя, тип результата и типы параметров - все, что о функции видят вызовы
+        return self.name, self.return_type, [arg.data_type for arg in self.arguments]
 
-        context.add_func(self.name, self.return_type, params, local_context)
+    def declare(self, context: Context):
+        # первая фаза: только сигнатура, тело анализируется на своем месте или отдельно (pipeline)
+        context.add_func(*self.signature())
 
-        message = self.body.semantic_analysis(local_context)
-        if 'error' in message.keys():
-            return message
+    def semantic_steps(self, context: Context):
+        if self.name not in context.functions:
+            self.declare(context)  # функция не из списка операторов
+        local_context = GeneralContext(self, context, True)
+        for arg in self.arguments:
+            arg.var_type = VarType.PARAM
+            local_context.add_var(arg.name, arg.data_type, arg.var_type)
 
-        return {}
+        return (yield self.body.semantic_steps(local_context))
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         signature_str = ''
         for param in self.arguments:
             signature_str += JBCI.get_type(param.data_type)
@@ -1030,7 +1305,7 @@ class FuncDefNode(VarCounterNode):
         code.append('.limit stack          10')
         code.append('.limit locals         %s' % len(self.var_list))
 
-        self.body.generate_code(code, label_count)
+        yield self.body.code_steps(code, label_count)
 
         if self.return_type == dte.none and code[len(code) - 1] != 'return':
             code.append('return')
@@ -1039,7 +1314,8 @@ class FuncDefNode(VarCounterNode):
         code.append('')
 
 
-class ReturnNode(AstNode):
+class ReturnNode(StatementNode):
+    __slots__ = ('expr', 'data_type')
     def __init__(self, expr: ValueNode):
         super().__init__()
         self.expr = expr
@@ -1052,33 +1328,33 @@ class ReturnNode(AstNode):
     def __str__(self) -> str:
         return 'return ' + str(self.data_type)
 
-    def semantic_analysis(self, context: Context):
+    def semantic_steps(self, context: Context):
         self.data_type = context.general_context.node.return_type
 
         if self.data_type == dte.none:
-            return {}
+            return
 
-        message = self.expr.semantic_analysis(context)
-        if 'error' in message.keys():
-            return message
+        if (yield self.expr.semantic_steps(context)) is FAILED:
+            return FAILED
+        self.expr = context.intern(self.expr)
 
         if self.data_type != self.expr.data_type and self.expr.data_type.can_casted_to(self.data_type):
             self.expr = CastNode(tc.get_caster(self.data_type), self.expr)
 
-        return {}
-
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if self.data_type != dte.none:
-            self.expr.generate_code(code, label_count)
+            yield self.expr.code_steps(code, label_count)
         code.append('%sreturn' % JBCI.get_type_lower(self.data_type))
 
 
 class FuncCallNode(ValueNode):
+    __slots__ = ('name', 'params', 'prog_name', 'pos')
     def __init__(self, name: str, params: List[ValueNode]):
         super().__init__(None)
         self.name = name
         self.params = params
         self.prog_name = 'prog'
+        self.pos = None  # смещение имени функции в исходнике
         if self.params is None:
             self.params = []
 
@@ -1089,46 +1365,54 @@ class FuncCallNode(ValueNode):
     def __str__(self) -> str:
         return self.name + ' ' + str(self.data_type)
 
-    def semantic_analysis(self, context: Context):
+    def intern_key(self):
+        return None  # вызов не сводится: у функции могут быть побочные эффекты
+
+    def semantic_steps(self, context: Context):
         func_dis = context.get_func(self.name)
         if func_dis is None:
-            return {'error': 'function ' + self.name + 'is not defined'}
+            return context.error(self, 'undefined-func', 'function %s is not defined', self.name)
 
         self.data_type = func_dis.data_type
 
         if len(self.params) != func_dis.params_count:
-            return {'error': str(self.name) + '() takes ' + str(func_dis.params_count)
-                    + ' arguments but ' + str(len(self.params)) + 'were given'}
+            return context.error(self, 'arg-count', '%s() takes %s arguments but %s were given',
+                                 self.name, func_dis.params_count, len(self.params))
 
         for i, arg in enumerate(self.params):
-            message = self.params[i].semantic_analysis(context)  # func call
-            if 'error' in message.keys():
-                return message
+            if (yield self.params[i].semantic_steps(context)) is FAILED:  # func call
+                return FAILED
+            self.params[i] = context.intern(self.params[i])
 
             if func_dis[i] != self.params[i].data_type:
                 if func_dis[i].can_casted_to(arg.data_type):
                     self.params[i] = CastNode(tc.get_caster(func_dis[i]), self.params[i])
                 else:
-                    return {'error': 'cant cast argument ' + str(self.params[i].data_type) + 'to ' + func_dis[i]}
+                    return context.error(self, 'cast', 'cant cast argument %s to %s', self.params[i].data_type, func_dis[i])
 
         self.prog_name = context.get_prog_name()
-        return {}
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         signature_str = ''
         for param in self.params:
-            param.generate_code(code, label_count)
+            yield param.code_steps(code, label_count)
             signature_str += JBCI.get_type(param.data_type)
 
         code.append('invokestatic          %s/%s(%s)%s'
                     % (self.prog_name, self.name, signature_str, JBCI.get_type(self.data_type)))
 
 
-class ArrayDefNode(AstNode):
-    def __init__(self, name: str, first_idx: int, last_idx: int, data_type: str, values: List[ValueNode] = None):
+class ArrayDefNode(StatementNode):
+    __slots__ = ('name', 'data_type', 'elem_type', 'first_index', 'last_index', 'values', 'index', 'var_type')
+    def __init__(self, name: str, first_idx: Union[int, str], last_idx: Union[int, str], data_type: str,
+                 values: List[ValueNode] = None):
         super().__init__()
         self.name = name
-        self.data_type = ArrayDataType(data_type, first_idx, last_idx)
+        # граница - число или имя константы; с именами тип массива известен только после анализа
+        self.elem_type = DataType(data_type)
+        self.data_type = None
+        if type(first_idx) is int and type(last_idx) is int:
+            self.data_type = ArrayDataType(data_type, first_idx, last_idx)
         self.first_index = first_idx
         self.last_index = last_idx
         self.values = values
@@ -1142,25 +1426,38 @@ class ArrayDefNode(AstNode):
     def __str__(self) -> str:
         return self.name + ' ' + str(self.data_type)
 
-    def semantic_analysis(self, context: Context):
+    def resolve_bounds(self, context: Context):
+        bounds = []
+        for bound in (self.first_index, self.last_index):
+            if type(bound) is str:
+                var_dis = context.get_var(bound)
+                if var_dis is None or var_dis.var_type != VarType.CONST or var_dis.data_type != dte.int:
+                    return context.error(self, 'array-bound', 'Array bound %s is not an integer constant', bound)
+                bound = var_dis.value
+            bounds.append(bound)
+        self.first_index, self.last_index = bounds
+        self.data_type = ArrayDataType(self.elem_type.dte, *bounds)
+
+    def semantic_steps(self, context: Context):
+        if self.data_type is None and self.resolve_bounds(context) is FAILED:
+            return FAILED
         # если текущий контекст глобальный или его родитель, т.е. переменные в основном коде программы глобальные
         self.var_type = VarType.GLOBAL if context.is_global or context.parent.is_global else VarType.LOCAL
         if self.values is None:
             context.add_var(self.name, self.data_type, self.var_type)
             self.index = context.get_var(self.name).index
-            return {}
+            return
 
         values = []
         for i, val in enumerate(self.values):
-            message = val.semantic_analysis(context)  # array def
-            if 'error' in message.keys():
-                return message
+            if (yield val.semantic_steps(context)) is FAILED:  # array def
+                return FAILED
+            self.values[i] = val = context.intern(val)
             values.append(val.const_val)
 
         context.add_var(self.name, self.data_type, self.var_type, values)
-        return {}
 
-    def generate_code(self, code: List[str], label_count: List[int]):
+    def code_steps(self, code: List[str], label_count: List[int]):
         if self.var_type == VarType.GLOBAL:
             return
 
@@ -1175,6 +1472,7 @@ class ArrayDefNode(AstNode):
 
 
 class ArrayCallNode(ValueNode):
+    __slots__ = ('arr', 'name', 'arr_index')
     def __init__(self, arr: IdentNode, arr_index: ValueNode):
         super().__init__(None)
         self.arr = arr
@@ -1188,37 +1486,44 @@ class ArrayCallNode(ValueNode):
     def __str__(self) -> str:
         return str(self.arr)
 
-    def semantic_analysis(self, context: Context):
-        message = self.arr.semantic_analysis(context)  # array call arr
-        if 'error' in message.keys():
-            return message
-        message = self.arr_index.semantic_analysis(context)  # array call index
-        if 'error' in message.keys():
-            return message
+    def semantic_steps(self, context: Context):
+        if (yield self.arr.semantic_steps(context)) is FAILED:  # array call arr
+            return FAILED
+        if (yield self.arr_index.semantic_steps(context)) is FAILED:  # array call index
+            return FAILED
+        self.arr = context.intern(self.arr)
+        self.arr_index = context.intern(self.arr_index)
+        shared = context.lookup(self)
+        if shared is not None:
+            self.adopt(shared)
+            return
 
         arr_dis = context.get_var(self.name)
         if type(arr_dis.data_type) != ArrayDataType:
-            return {'error': '%s is not array' % arr_dis.name}
+            return context.error(self, 'not-array', '%s is not array', arr_dis.name)
 
         self.data_type = DataType(arr_dis.data_type.dte)
 
         if self.arr_index.data_type != dte.int:
-            self.arr_index = CastNode(tc.IntCaster(), self.arr_index)
+            self.arr_index = CastNode(tc.INT_CASTER, self.arr_index)
 
-        return {}
+    def intern_key(self):
+        return ArrayCallNode, shared_id(self.arr), shared_id(self.arr_index)
 
-    def optimize(self, arr_dis: VarDescription):
-            first_idx = arr_dis.data_type.first_index
-            last_idx = arr_dis.data_type.last_index
-            if self.arr_index.const_val < first_idx or self.arr_index.const_val > last_idx:
-                return {'error': 'Index %s out of range [%s..%s]' % (self.arr_index.const_val, first_idx, last_idx)}
+    def optimize(self, values: tuple):
+        # значения элементов массива известны (проход propagate), None - элемент неизвестен;
+        # индекс вне границ остается до выполнения
+        idx = self.arr_index.const_val - self.arr.data_type.first_index
+        if 0 <= idx < len(values):
+            self.const_val = values[idx]
 
-            idx = self.arr_index.const_val - first_idx
-            self.const_val = arr_dis.value[idx]
+    def code_steps(self, code: List[str], label_count: List[int], get:bool=True):
+        if get and self.const_val is not None:
+            code.append(const_command(self.data_type, self.const_val))
+            return
 
-    def generate_code(self, code: List[str], label_count: List[int], get:bool=True):
-        self.arr.generate_code(code, label_count)
-        self.arr_index.generate_code(code, label_count)
+        yield self.arr.code_steps(code, label_count)
+        yield self.arr_index.code_steps(code, label_count)
 
         if self.arr.data_type.first_index != 0:
             code.append('ldc                   %s' % self.arr.data_type.first_index)
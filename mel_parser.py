@@ -1,8 +1,18 @@
 import ply.lex as lex
 import ply.yacc as yacc
 import mel_ast as ast
+import ast_file
 import os
-from tester import ProgTester
+import sys
+import threading
+import types
+from typing import List
+from tester import ProgTester, tests
+from token_stream import TokenStream
+from source_file import SourceFile, LineIndex
+from rd_parser import RDParser
+from diagnostics import SyntaxErrorInfo, Diagnostics
+from passes import PassManager
 
 tokens = [
 
@@ -36,9 +46,6 @@ tokens = [
 
     'ASSIGNMENT',
 
-    'OPEN_COMMENT',
-    'CLOSE_COMMENT',
-
     'END_LINE',
     'COMMA',
     'COLON',
@@ -51,6 +58,7 @@ tokens = [
     'CLOSE_SQUARE_BKT',
 
     'VAR_DEF',
+    'CONST_DEF',
     'FUNC_DEF',
     'RETURN',
 
@@ -71,12 +79,43 @@ tokens = [
 
 ]
 
-ident = r'[a-zA-Z_][a-zA-z_1-9]*'
-
-t_ignore = r' '
+reserved = {
+    'program': 'PROGBEGIN',
+    'writeln': 'WRITELN',
+    'readln': 'READLN',
+    'begin': 'BLOCK_OPEN',
+    'end': 'BLOCK_CLOSE',
+    'function': 'FUNC_DEF',
+    'return': 'RETURN',
+    'real': 'FLOAT_TYPE',
+    'integer': 'INT_TYPE',
+    'string': 'STRING_TYPE',
+    'boolean': 'BOOL_TYPE',
+    'none': 'NONE_TYPE',
+    'var': 'VAR_DEF',
+    'const': 'CONST_DEF',
+    'and': 'AND',
+    'or': 'OR',
+    'if': 'IF',
+    'else': 'ELSE',
+    'then': 'THEN',
+    'while': 'WHILE',
+    'do': 'DO',
+    'for': 'FOR',
+    'to': 'TO',
+    'repeat': 'REPEAT',
+    'until': 'UNTIL',
+    'array': 'ARRAY',
+    'of': 'OF',
+    'length': 'LENGTH',
+    'true': 'BOOL',
+    'false': 'BOOL',
+}
+
+# пробелы, табы и \r пропускаются одним правилом, ключевые слова ищутся в reserved
+t_ignore = ' \t\r'
 
 t_ANYTHING = r'(\\.|\n)+'
-t_STRING = r'"(\\.|[^"])*"'
 
 t_PLUS = r'\+'
 t_MINUS = r'\-'
@@ -87,9 +126,6 @@ t_EQUALS = r'\='
 t_MORE = r'\>'
 t_LESS = r'\<'
 
-t_OPEN_COMMENT = r'\(\*(\\.|[^"])*\*\)'
-t_CLOSE_COMMENT = r'\(\*(\\.|[^"])*\*\)'
-
 t_COMMA = r','
 t_COLON = r':'
 t_DOT = r'\.'
@@ -100,160 +136,53 @@ t_OPEN_SQUARE_BKT = r'\['
 t_CLOSE_SQUARE_BKT = r'\]'
 
 
-def t_newline(t):
-    r'\n+'
-    t.lexer.lineno += t.value.count("\n")
-
-def t_error(t):
-    print("Illegal character '%s'" % t.value[0])
-    t.lexer.skip(1)
-
-def t_PROGBEGIN(t):
-    r'program'
-    t.type = 'PROGBEGIN'
-    return t
-
-def t_WRITELN(t):
-    r'writeln'
-    t.type = 'WRITELN'
-    return t
-
-def t_READLN(t):
-    r'readln'
-    t.type = 'READLN'
-    return t
-
-def t_BLOCK_OPEN(t):
-    r'begin'
-    t.type = 'BLOCK_OPEN'
-    return t
-
-def t_BLOCK_CLOSE(t):
-    r'end'
-    t.type = 'BLOCK_CLOSE'
-    return t
-
-def t_FUNC_DEF(t):
-    r'function'
-    t.type = 'FUNC_DEF'
-    return t
-
-def t_RETURN(t):
-    r'return'
-    t.type = 'RETURN'
-    return t
-
-def t_FLOAT_TYPE(t):
-    r'real'
-    t.type = 'FLOAT_TYPE'
-    return t
-
-def t_INT_TYPE(t):
-    r'integer'
-    t.type = 'INT_TYPE'
-    return t
-
-def t_STRING_TYPE(t):
-    r'string'
-    t.type = 'STRING_TYPE'
-    return t
-
-def t_BOOL_TYPE(t):
-    r'boolean'
-    t.type = 'BOOL_TYPE'
-    return t
-
-def t_NONE_TYPE(t):
-    r'none'
-    t.type = 'NONE_TYPE'
-    return t
-
-def t_VAR_DEF(t):
-    r'var'
-    t.type = 'VAR_DEF'
-    return t
-
-def t_AND(t):
-    r'and'
-    t.type = 'AND'
-    return t
-
-def t_OR(t):
-    r'or'
-    t.type = 'OR'
-    return t
-
-def t_IF(t):
-    r'if'
-    t.type = 'IF'
-    return t
-
-def t_ELSE(t):
-    r'else'
-    t.type = 'ELSE'
-    return t
-
-def t_THEN(t):
-    r'then'
-    t.type = 'THEN'
-    return t
-
-def t_WHILE(t):
-    r'while'
-    t.type = 'WHILE'
-    return t
-
-def t_DO(t):
-    r'do'
-    t.type = 'DO'
-    return t
-
-def t_FOR(t):
-    r'for'
-    t.type = 'FOR'
-    return t
-
-def t_TO(t):
-    r'to'
-    t.type = 'TO'
-    return t
-
-def t_REPEAT(t):
-    r'repeat'
-    t.type = 'REPEAT'
-    return t
-
-def t_UNTIL(t):
-    r'until'
-    t.type = 'UNTIL'
+def t_NAME(t):
+    r'[a-zA-Z_][a-zA-Z0-9_]*'
+    t.type = reserved.get(t.value, 'NAME')
+    if t.type == 'BOOL':
+        t.value = t.value == 'true'
     return t
 
-def t_ARRAY(t):
-    r'array'
-    t.type = 'ARRAY'
+def t_STRING(t):
+    r'"'
+    # строка дочитывается вручную до первой неэкранированной кавычки, без отката регулярки
+    data = t.lexer.lexdata
+    pos = t.lexpos + 1
+    while True:
+        end = data.find('"', pos)
+        if end < 0:
+            print("Unterminated string literal at line %s, column %s" % LineIndex(data).line_col(t.lexpos))
+            t.lexer.lexpos = len(data)
+            return None
+        slash = end
+        while data[slash - 1] == '\\':
+            slash -= 1
+        if (end - slash) % 2 == 0:
+            break
+        pos = end + 1
+
+    t.value = data[t.lexpos:end + 1]
+    t.lexer.lexpos = end + 1
     return t
 
-def t_OF(t):
-    r'of'
-    t.type = 'OF'
-    return t
+def t_COMMENT(t):
+    r'\(\*'
+    data = t.lexer.lexdata
+    end = data.find('*)', t.lexpos + 2)
+    if end < 0:
+        print("Unterminated comment at line %s, column %s" % LineIndex(data).line_col(t.lexpos))
+        t.lexer.lexpos = len(data)
+        return None
 
-def t_LENGTH(t):
-    r'length'
-    t.type = 'LENGTH'
-    return t
+    t.lexer.lexpos = end + 2
+    return None
 
-def t_BOOL(t):
-    r'true'
-    t.value = True
-    t.type = 'BOOL'
-    return t
+# строки не считаются, позиции пересчитываются через LineIndex по требованию
+t_ignore_NEWLINE = r'\n[ \t\r\n]*'
 
-def t_BOOL_f(t):
-    r'false'
-    t.value = False
-    t.type = 'BOOL'
-    return t
+def t_error(t):
+    print("Illegal character '%s'" % t.value[0])
+    t.lexer.skip(1)
 
 def t_FLOAT(t):
     r'\d+\.\d+'
@@ -265,18 +194,11 @@ def t_INT(t):
     t.value = int(t.value)
     return t
 
-def t_NAME(t):
-    r'[a-zA-Z_][a-zA-Z0-9_]*'
-    t.type = 'NAME'
-    return t
-
 def t_ASSIGNMENT(t):
     r'\:='
     t.type = 'ASSIGNMENT'
     return t
 
-lexer = lex.lex()
-
 precedence = (
     ('left', 'OR'),
     ('left', 'AND'),
@@ -301,25 +223,57 @@ def p_start(p):
 
     return p[0]
 
-def p_state_list_begin(p):
+def p_state_list(p):
     '''
-    state_list : BLOCK_OPEN state END_LINE state_list BLOCK_CLOSE
-               | BLOCK_OPEN state END_LINE BLOCK_CLOSE
+    state_list : state_seq
+               | state_seq state_block
+               | state_block
     '''
-    if len(p) == 6:
-        p[0] = [ast.StateListNode([p[2]] + p[4])]
-    elif len(p) == 5:
-        p[0] = [ast.StateListNode([p[2]])]
+    if len(p) == 3:
+        p[1].append(p[2])
+        p[0] = p[1]
+    elif type(p[1]) is list:
+        p[0] = p[1]
+    else:
+        p[0] = [p[1]]
 
-def p_state_list(p):
+def p_state_list_error(p):
+    '''
+    state_list : state_seq error
+               | error
     '''
-    state_list : state END_LINE state_list
-               | state END_LINE
+    # восстановление на BLOCK_CLOSE / DOT: испорченный последний оператор без ';'
+    p[0] = p[1] if len(p) == 3 else []
+
+def p_state_seq(p):
     '''
+    state_seq : state_seq state END_LINE
+              | state END_LINE
+    '''
+    # левая рекурсия: список дополняется на месте, стек парсера не растет
+    # испорченный оператор (state : error) в список не попадает
     if len(p) == 4:
-        p[0] = [p[1]] + p[3]
-    elif len(p) == 3:
-        p[0] = [p[1]]
+        if p[2] is not None:
+            p[1].append(p[2])
+        p[0] = p[1]
+    else:
+        p[0] = [p[1]] if p[1] is not None else []
+
+def p_state_block(p):
+    '''
+    state_block : BLOCK_OPEN state_seq BLOCK_CLOSE
+                | BLOCK_OPEN state_seq state_block BLOCK_CLOSE
+    '''
+    if len(p) == 5:
+        p[2].append(p[3])
+    p[0] = ast.StateListNode(p[2])
+
+def p_state_block_error(p):
+    '''
+    state_block : BLOCK_OPEN state_seq error BLOCK_CLOSE
+                | BLOCK_OPEN error BLOCK_CLOSE
+    '''
+    p[0] = ast.StateListNode(p[2] if len(p) == 5 else [])
 
 def p_state_body(p):
     '''
@@ -330,7 +284,14 @@ def p_state_body(p):
     if len(p) == 4:
         p[0] = p[2]
     else:
-        p[0] = [p[1]]
+        p[0] = [p[1]] if p[1] is not None else []
+
+def p_state_error(p):
+    '''
+    state : error
+    '''
+    # panic mode: yacc выбрасывает токены до ';', оператор пропускается
+    p[0] = None
 
 def p_state_if(p):
     '''
@@ -342,18 +303,22 @@ def p_state_if(p):
         p[0] = ast.IfNode(p[2], ast.StateListNode(p[4]))
     elif len(p) == 7:
         p[0] = ast.IfNode(p[2], ast.StateListNode(p[4]), ast.StateListNode(p[6]))
+    # позиция оператора для семантических ошибок - смещение ключевого слова (tracking не нужен)
+    p[0].pos = p.lexpos(1)
 
 def p_state_for(p):
     '''
     state : FOR NAME ASSIGNMENT expression TO expression DO state_body
     '''
     p[0] = ast.ForNode(ast.IdentNode(p[2]), p[4], p[6], ast.StateListNode(p[8]))
+    p[0].pos = p.lexpos(1)
 
 def p_state_while(p):
     '''
     state : WHILE expression DO state_body
     '''
     p[0] = ast.WhileNode(p[2], ast.StateListNode(p[4]))
+    p[0].pos = p.lexpos(1)
 
 def p_state_func_def(p):
     '''
@@ -365,23 +330,35 @@ def p_state_func_def(p):
         p[0] = ast.FuncDefNode(p[2], p[4], (p[7], ), ast.StateListNode(p[10]))
     else:
         p[0] = ast.FuncDefNode(p[2], p[4], (p[15], p[9], p[12]), ast.StateListNode(p[18]))
+    p[0].pos = p.lexpos(1)
 
 def p_argument_list(p):
     '''
-    argument_list : NAME COLON var_type COMMA argument_list
-                  | NAME COLON var_type
-                  | NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type COMMA argument_list
-                  | NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type
+    argument_list : argument_seq
                   | empty
     '''
+    p[0] = p[1]
+
+def p_argument_seq(p):
+    '''
+    argument_seq : argument_seq COMMA argument
+                 | argument
+    '''
     if len(p) == 4:
-        p[0] = [ast.Param(p[1], p[3])]
-    elif len(p) == 6:
-        p[0] = [ast.Param(p[1], p[3])] + p[5]
-    elif len(p) == 12:
-        p[0] = [ast.ParamArray(p[1], p[11], p[5], p[8])]
-    elif len(p) == 14:
-        p[0] = [ast.ParamArray(p[1], p[11], p[5], p[8])] + p[5]
+        p[1].append(p[3])
+        p[0] = p[1]
+    else:
+        p[0] = [p[1]]
+
+def p_argument(p):
+    '''
+    argument : NAME COLON var_type
+             | NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type
+    '''
+    if len(p) == 4:
+        p[0] = ast.Param(p[1], p[3])
+    else:
+        p[0] = ast.ParamArray(p[1], p[11], p[5], p[8])
 
 def p_state_return(p):
     '''
@@ -392,6 +369,7 @@ def p_state_return(p):
         p[0] = ast.ReturnNode(p[2])
     else:
         p[0] = ast.ReturnNode(ast.IntNode(0))
+    p[0].pos = p.lexpos(1)
 
 def p_state_var_def(p):
     '''
@@ -399,11 +377,27 @@ def p_state_var_def(p):
     state_var_def : VAR_DEF NAME COLON var_type
     '''
     p[0] = ast.VarDefNode(p[2], p[4])
+    p[0].pos = p.lexpos(1)
+
+def p_state_const_def(p):
+    '''
+    state : CONST_DEF NAME EQUALS expression
+    '''
+    p[0] = ast.ConstDefNode(p[2], p[4])
+    p[0].pos = p.lexpos(1)
+
+def p_array_bound(p):
+    '''
+    array_bound : INT
+                | NAME
+    '''
+    # имя - константа, ее значение подставит семантический анализ
+    p[0] = p[1]
 
 def p_state_array_def(p):
     '''
-    state : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type
-    state_array_def : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type
+    state : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT array_bound DOT DOT array_bound CLOSE_SQUARE_BKT OF var_type
+    state_array_def : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT array_bound DOT DOT array_bound CLOSE_SQUARE_BKT OF var_type
     '''
     #| VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT
 
@@ -411,12 +405,14 @@ def p_state_array_def(p):
         p[0] = ast.ArrayDefNode(p[2], p[6], p[9], p[12])
     else:
         p[0] = ast.ArrayDefNode(p[2], p[6], p[9], p[12], p[15])
+    p[0].pos = p.lexpos(1)
 
 def p_state_writeln(p):
     '''
     state : WRITELN OPEN_ROUND_BKT expression CLOSE_ROUND_BKT
     '''
     p[0] = ast.WritelnNode(p[3])
+    p[0].pos = p.lexpos(1)
 
 def p_state_readln(p):
     '''
@@ -424,6 +420,7 @@ def p_state_readln(p):
     '''
 
     p[0] = ast.ReadlnNode(ast.IdentNode(p[3]))
+    p[0].pos = p.lexpos(1)
 
 '''
 def p_state_readln(p):
@@ -440,6 +437,7 @@ def p_state_var_assign(p):
     '''
     if len(p) == 4:
         p[0] = ast.AssignNode(p[1], p[3])
+        p[0].pos = p.lexpos(2)
 
 def p_state_var_assign_def(p):
     '''
@@ -451,6 +449,7 @@ def p_state_var_assign_def(p):
         p[0] = ast.AssignNode(p[1], p[3])
     elif len(p) == 6:
         p[0] = ast.AssignNode(p[1], ast.ExprListNode(p[4]))
+    p[0].pos = p.lexpos(2)
 
 def p_state_expression(p):
     '''
@@ -460,13 +459,20 @@ def p_state_expression(p):
 
 def p_expr_list(p):
     '''
-    expr_list : expression COMMA expr_list
-              | expression
+    expr_list : expr_seq
     '''
-    if len(p) == 2:
+    p[0] = p[1]
+
+def p_expr_seq(p):
+    '''
+    expr_seq : expr_seq COMMA expression
+             | expression
+    '''
+    if len(p) == 4:
+        p[1].append(p[3])
+        p[0] = p[1]
+    else:
         p[0] = [p[1]]
-    elif len(p) == 4:
-        p[0] = [p[1]] + p[3]
 
 def p_expr_list_empty(p):
     '''
@@ -478,6 +484,7 @@ def p_expression_func_call(p):
     expression : NAME OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT
     '''
     p[0] = ast.FuncCallNode(p[1], p[3])
+    p[0].pos = p.lexpos(1)
 
 def p_expression_array_call(p):
     '''
@@ -562,14 +569,24 @@ def p_empty(p):
     p[0] = None
 
 def p_error(p):
-    if (p != None):
+    # конец файла отмечает parse(): yacc в этом случае сдается и возвращает None
+    if p is None:
+        return
+    errors = getattr(p.lexer, 'errors', None)
+    if errors is None:
         print("Syntax error ", p.value)
-        return "error", p
     else:
-        print("Syntax error")
-        return "error", None
+        errors.append(SyntaxErrorInfo(*p.line_index.line_col(p.lexpos), p.value))
+
+def tokenize(s: str) -> TokenStream:
+    return TokenStream.from_lexer(get_lexer(), s, tokens)
+
+def parse(s: str, engine: str = 'ply', errors: list = None):
+    # общие лексер и парсер модуля, для параллельной работы нужен свой Compiler
+    return shared_compiler(engine).parse(s, errors)
 
 def lexer_input(s):
+    lexer = get_lexer()
     lexer.input(s)
     while True:
         tok = lexer.token()  # читаем следующий токен
@@ -779,35 +796,213 @@ end.'''
     end.'''
 
 #lexer_input(s)
-parser = yacc.yacc()
+_lexer = None
+_parser = None
+
+
+_build_lock = threading.Lock()
+
+
+def get_lexer():
+    # правила уже проверены, optimize=1 пропускает разбор исходника модуля; lextab не пишется
+    global _lexer
+    if _lexer is None:
+        with _build_lock:
+            if _lexer is None:
+                _lexer = lex.lex(module=sys.modules[__name__], optimize=1, lextab='')
+    return _lexer
+
+
+def get_parser():
+    # таблицы берутся из parsetab.py, если сигнатура грамматики совпала;
+    # иначе пересобираются в памяти, без parser.out и без записи parsetab.py
+    global _parser
+    if _parser is None:
+        get_lexer()  # parser.parse(s) без lexer= использует последний собранный лексер
+        with _build_lock:
+            if _parser is None:
+                _parser = yacc.yacc(module=sys.modules[__name__], debug=False, write_tables=False)
+    return _parser
+
+
+def new_parser():
+    # отдельный LRParser на тех же таблицах: таблицы только читаются, стеки разбора у каждого свои
+    shared = get_parser()
+    tables = types.SimpleNamespace(lr_productions=shared.productions, lr_action=shared.action, lr_goto=shared.goto)
+    return yacc.LRParser(tables, shared.errorfunc)
+
+
+def build_tables():
+    # пересобирает parsetab.py и parser.out после правки грамматики
+    global _parser
+    get_lexer()
+    _parser = yacc.yacc(module=sys.modules[__name__], debug=True, write_tables=True,
+                         outputdir=os.path.dirname(os.path.abspath(__file__)))
+    return _parser
+
+
+class Compiler:
+    '''
+    Независимый экземпляр компилятора: свой лексер (клон общего) и свой LRParser
+    на общих таблицах (метки нумеруются внутри метода). Разные экземпляры можно использовать
+    из разных потоков одновременно, один экземпляр - только из одного потока.
+    opt_level - набор проходов (passes.PIPELINES), статистика последней компиляции в stats,
+    число узлов по проходам - только с collect_stats
+    '''
+    def __init__(self, engine: str = 'ply', lexer=None, parser=None, opt_level: int = 1, collect_stats: bool = False):
+        self.engine = engine
+        self.lexer = lexer if lexer is not None else get_lexer().clone()
+        self.parser = parser
+        self.opt_level = opt_level
+        self.collect_stats = collect_stats
+        self.stats = {}
+
+    def tokenize(self, s: str) -> TokenStream:
+        return TokenStream.from_lexer(self.lexer, s, tokens)
+
+    def parse(self, s: str, errors: list = None):
+        '''
+        engine: 'ply' - таблицы yacc, 'rd' - рекурсивный спуск из rd_parser.
+        Синтаксические ошибки (SyntaxErrorInfo) собираются в errors, без него печатаются.
+        Испорченные операторы пропускаются, дерево строится из остальных
+        '''
+        log = [] if errors is None else errors
+        stream = self.tokenize(s)
+        if self.engine == 'rd':
+            tree = RDParser(stream, log).parse()
+        else:
+            if self.parser is None:
+                self.parser = new_parser()
+            lexer = stream.lexer()
+            lexer.errors = log
+            tree = self.parser.parse(lexer=lexer)
+            if tree is None:
+                log.append(SyntaxErrorInfo(*stream.line_index.line_col(len(s))))
+
+        if errors is None:
+            for error in log:
+                print(error)
+        return tree
+
+    def compile(self, s: str, errors: list):
+        '''
+        Возвращает список строк кода или None при синтаксических ошибках.
+        В errors: синтаксические ошибки (SyntaxErrorInfo), затем семантические (SemanticErrorInfo),
+        семантический анализ идет и по частичному дереву
+        '''
+        manager = PassManager(self.opt_level, self.collect_stats)
+        a = self.analyse(s, errors, manager)
+        if a is None:
+            return None
+        #print(*a.tree1, sep=os.linesep)
+        return self.generate(a, manager)
+
+    def analyse(self, s: str, errors: list, manager: PassManager = None):
+        # дерево после анализа и проходов по дереву, None при синтаксических ошибках
+        if manager is None:
+            manager = PassManager(self.opt_level, self.collect_stats)
+        self.stats = manager.stats
+        a = self.parse(s, errors)
+        syntax_errors = len(errors)
+        if a is not None:
+            diagnostics = Diagnostics(LineIndex(s))
+            manager.analyse(a, None, manager.share, diagnostics)
+            errors.extend(diagnostics.errors)
+        return a if syntax_errors == 0 else None
+
+    def generate(self, tree, manager: PassManager = None) -> list:
+        # код по проанализированному дереву, в том числе загруженному через ast_file
+        if manager is None:
+            manager = PassManager(self.opt_level, self.collect_stats)
+            self.stats = manager.stats
+        code = []
+        return manager.generate(tree, code, tree.generate_code, code, [ast.FIRST_LABEL])
+
+    def code_generate(self, file_path, ast_cache: bool = False) -> list:
+        '''
+        .j пишется только без синтаксических ошибок, ошибки печатаются и возвращаются.
+        ast_cache: дерево после анализа берется из file_path.ast, если он записан для того же
+        исходника и уровня оптимизации, иначе программа компилируется и дерево туда сохраняется
+        '''
+        errors = []
+        source = SourceFile(file_path).text
+        tree = ast_file.load_cached(file_path + '.ast', source, self.opt_level) if ast_cache else None
+        if tree is not None:
+            code = self.generate(tree)
+        else:
+            manager = PassManager(self.opt_level, self.collect_stats)
+            tree = self.analyse(source, errors, manager)
+            code = None
+            if tree is not None:
+                if ast_cache and len(errors) == 0:
+                    # до генерации: она правит строковые константы
+                    ast_file.dump(tree, file_path + '.ast', source, self.opt_level)
+                code = self.generate(tree, manager)
+        for error in errors:
+            print(error)
+        if code is not None:
+            with open(file_path + '.j', "tw", encoding='utf-8') as file:
+                write_code(file, code)
+        return errors
+
+    def code_generate_pipeline(self, file_path, jobs: int = 1) -> list:
+        import pipeline
+        manager = PassManager(self.opt_level, self.collect_stats)
+        self.stats = manager.stats
+        return pipeline.code_generate_pipeline(file_path, self.lexer, manager, jobs)
+
+
+def shared_compiler(engine: str = 'ply', opt_level: int = 1, collect_stats: bool = False) -> Compiler:
+    # Compiler на общих лексере и парсере модуля, не потокобезопасен
+    return Compiler(engine, get_lexer(), get_parser() if engine == 'ply' else None, opt_level, collect_stats)
+
+
+def __getattr__(name):
+    # mel_parser.lexer и mel_parser.parser создаются при первом обращении
+    if name == 'lexer':
+        return get_lexer()
+    if name == 'parser':
+        return get_parser()
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 
 def run_test():
+    import incremental
+    import pipeline
     tester = ProgTester()
+    parser = get_parser()
     test_errors = tester.run_test(parser)  # тестики по заветам Андрея)
+    for errors in (tester.run_relex_test(tokenize, get_lexer()), tester.run_scaling_test(parser, tokenize),
+                   tester.run_engine_test(parse), tester.run_recovery_test(parse),
+                   tester.run_pipeline_test(code_generate, pipeline.code_generate_pipeline),
+                   tester.run_incremental_test(incremental.IncrementalCompiler, pipeline.code_generate_pipeline),
+                   tester.run_concurrency_test(Compiler, dict(tests, sort=s)), tester.run_deep_test(Compiler),
+                   tester.run_opt_test(Compiler), tester.run_diagnostics_test(Compiler), tester.run_const_test(Compiler),
+                   tester.run_propagate_test(Compiler), tester.run_dead_code_test(Compiler), tester.run_types_test(),
+                   tester.run_ast_file_test(Compiler, dict(tests, sort=s)),
+                   tester.run_tree_test(Compiler().parse)):
+        if errors is not None:
+            test_errors = (test_errors or []) + errors
     if test_errors is not None:
         for error in test_errors:
             print(error)
 
 
-def code_generate(file_path):
-    s = ''
-    with open(file_path, 'r', encoding='utf-8') as file:
-        s = file.read()
+NO_INDENT = ['.meth', '.fiel', '.clas', '.supe', '.end ', '.sour', 'LABEL']
+
+
+def write_code(file, code: List[str]):
+    for s in code:
+        if len(s) > 5 and s[0:5] in NO_INDENT:
+            file.write(s + '\n')
+        else:
+            file.write('   ' + s + '\n')
+
+
+def code_generate(file_path, engine: str = 'ply', opt_level: int = 1, ast_cache: bool = False) -> list:
+    return shared_compiler(engine, opt_level).code_generate(file_path, ast_cache)
+
 
-    a = parser.parse(s)
-    error = a.semantic_analysis(None)
-    #print(*a.tree1, sep=os.linesep)
-    #print('OK!', error)
-    code = []
-    a.generate_code(code, [])
-    no_indent = ['.meth', '.fiel', '.clas', '.supe', '.end ', '.sour', 'LABEL']
-    with open(file_path + '.j', "tw", encoding='utf-8') as file:
-        for s in code:
-            if len(s) > 5 and s[0:5] in no_indent:
-                file.write(s + '\n')
-            else:
-                file.write('   ' + s + '\n')
 def main():
     s = '''    
 program tmp   
@@ -846,7 +1041,7 @@ begin
         
 end.
     '''
-    a = parser.parse(s)
+    a = get_parser().parse(s)
     error = a.semantic_analysis(None)
     #print(*a.tree1, sep=os.linesep)
     #print('OK!', error)
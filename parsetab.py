@@ -6,9 +6,9 @@ _tabversion = '3.10'
 
 _lr_method = 'LALR'
 
-_lr_signature = 'leftORleftANDleftEQUALSMORELESSleftPLUSMINUSleftMULTIPLYDIVIDEAND ANYTHING ARRAY ASSIGNMENT BLOCK_CLOSE BLOCK_OPEN BOOL BOOL_TYPE CLOSE_COMMENT CLOSE_ROUND_BKT CLOSE_SQUARE_BKT COLON COMMA DIVIDE DO DOT ELSE END_LINE EQUALS FLOAT FLOAT_TYPE FOR FUNC_DEF IF INT INT_TYPE LENGTH LESS MINUS MORE MULTIPLY NAME NONE_TYPE OF OPEN_COMMENT OPEN_ROUND_BKT OPEN_SQUARE_BKT OR PLUS PROGBEGIN READLN REPEAT RETURN STRING STRING_TYPE THEN TO UNTIL VAR_DEF WHILE WRITELN\n    start : PROGBEGIN state_list DOT\n          | PROGBEGIN NAME state_list DOT\n    \n    state_list : BLOCK_OPEN state END_LINE state_list BLOCK_CLOSE\n               | BLOCK_OPEN state END_LINE BLOCK_CLOSE\n    \n    state_list : state END_LINE state_list\n               | state END_LINE\n    \n    state_body : BLOCK_OPEN state_list BLOCK_CLOSE\n               | state\n    \n    state : IF expression THEN state_body\n          | IF expression THEN state_body ELSE state_body\n    \n    state : FOR NAME ASSIGNMENT expression TO expression DO state_body\n    \n    state : WHILE expression DO state_body\n    \n    state : FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE\n          | FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON NONE_TYPE END_LINE BLOCK_OPEN state_list BLOCK_CLOSE\n          | FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE\n    \n    argument_list : NAME COLON var_type COMMA argument_list\n                  | NAME COLON var_type\n                  | NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type COMMA argument_list\n                  | NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type\n                  | empty\n    \n    state : RETURN expression\n    state : RETURN\n    \n    state : VAR_DEF NAME COLON var_type\n    state_var_def : VAR_DEF NAME COLON var_type\n    \n    state : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type\n    state_array_def : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type\n    \n    state : WRITELN OPEN_ROUND_BKT expression CLOSE_ROUND_BKT\n    \n    state : READLN OPEN_ROUND_BKT NAME CLOSE_ROUND_BKT\n    \n    state : expression_name ASSIGNMENT expression\n          | expression_array_call ASSIGNMENT expression\n    \n    state : state_var_def ASSIGNMENT expression\n          | state_array_def ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT\n          | expression_name ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT\n    \n    state : expression\n    \n    expr_list : expression COMMA expr_list\n              | expression\n    \n    expr_list : empty\n    \n    expression : NAME OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT\n    \n    expression : NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT\n    expression_array_call : NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT\n    \n    expression : expression MULTIPLY expression\n               | expression DIVIDE expression\n               | expression PLUS expression\n               | expression MINUS expression\n    \n    expression : expression EQUALS expression\n               | expression MORE expression\n               | expression LESS expression\n               | expression AND expression\n               | expression OR expression\n    \n    expression : INT\n    \n    expression : FLOAT\n    \n    expression : BOOL\n    \n    expression : expression_name DOT LENGTH\n    \n    expression : STRING\n    \n    expression : NAME\n    expression_name : NAME\n    \n    var_type : FLOAT_TYPE\n             | INT_TYPE\n             | STRING_TYPE\n             | BOOL_TYPE\n    \n    empty :\n    '
+_lr_signature = 'leftORleftANDleftEQUALSMORELESSleftPLUSMINUSleftMULTIPLYDIVIDEAND ANYTHING ARRAY ASSIGNMENT BLOCK_CLOSE BLOCK_OPEN BOOL BOOL_TYPE CLOSE_ROUND_BKT CLOSE_SQUARE_BKT COLON COMMA CONST_DEF DIVIDE DO DOT ELSE END_LINE EQUALS FLOAT FLOAT_TYPE FOR FUNC_DEF IF INT INT_TYPE LENGTH LESS MINUS MORE MULTIPLY NAME NONE_TYPE OF OPEN_ROUND_BKT OPEN_SQUARE_BKT OR PLUS PROGBEGIN READLN REPEAT RETURN STRING STRING_TYPE THEN TO UNTIL VAR_DEF WHILE WRITELN\n    start : PROGBEGIN state_list DOT\n          | PROGBEGIN NAME state_list DOT\n    \n    state_list : state_seq\n               | state_seq state_block\n               | state_block\n    \n    state_list : state_seq error\n               | error\n    \n    state_seq : state_seq state END_LINE\n              | state END_LINE\n    \n    state_block : BLOCK_OPEN state_seq BLOCK_CLOSE\n                | BLOCK_OPEN state_seq state_block BLOCK_CLOSE\n    \n    state_block : BLOCK_OPEN state_seq error BLOCK_CLOSE\n                | BLOCK_OPEN error BLOCK_CLOSE\n    \n    state_body : BLOCK_OPEN state_list BLOCK_CLOSE\n               | state\n    \n    state : error\n    \n    state : IF expression THEN state_body\n          | IF expression THEN state_body ELSE state_body\n    \n    state : FOR NAME ASSIGNMENT expression TO expression DO state_body\n    \n    state : WHILE expression DO state_body\n    \n    state : FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE\n          | FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON NONE_TYPE END_LINE BLOCK_OPEN state_list BLOCK_CLOSE\n          | FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE\n    \n    argument_list : argument_seq\n                  | empty\n    \n    argument_seq : argument_seq COMMA argument\n                 | argument\n    \n    argument : NAME COLON var_type\n             | NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type\n    \n    state : RETURN expression\n    state : RETURN\n    \n    state : VAR_DEF NAME COLON var_type\n    state_var_def : VAR_DEF NAME COLON var_type\n    \n    state : CONST_DEF NAME EQUALS expression\n    \n    array_bound : INT\n                | NAME\n    \n    state : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT array_bound DOT DOT array_bound CLOSE_SQUARE_BKT OF var_type\n    state_array_def : VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT array_bound DOT DOT array_bound CLOSE_SQUARE_BKT OF var_type\n    \n    state : WRITELN OPEN_ROUND_BKT expression CLOSE_ROUND_BKT\n    \n    state : READLN OPEN_ROUND_BKT NAME CLOSE_ROUND_BKT\n    \n    state : expression_name ASSIGNMENT expression\n          | expression_array_call ASSIGNMENT expression\n    \n    state : state_var_def ASSIGNMENT expression\n          | state_array_def ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT\n          | expression_name ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT\n    \n    state : expression\n    \n    expr_list : expr_seq\n    \n    expr_seq : expr_seq COMMA expression\n             | expression\n    \n    expr_list : empty\n    \n    expression : NAME OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT\n    \n    expression : NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT\n    expression_array_call : NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT\n    \n    expression : expression MULTIPLY expression\n               | expression DIVIDE expression\n               | expression PLUS expression\n               | expression MINUS expression\n    \n    expression : expression EQUALS expression\n               | expression MORE expression\n               | expression LESS expression\n               | expression AND expression\n               | expression OR expression\n    \n    expression : INT\n    \n    expression : FLOAT\n    \n    expression : BOOL\n    \n    expression : expression_name DOT LENGTH\n    \n    expression : STRING\n    \n    expression : NAME\n    expression_name : NAME\n    \n    var_type : FLOAT_TYPE\n             | INT_TYPE\n             | STRING_TYPE\n             | BOOL_TYPE\n    \n    empty :\n    '
     
-_lr_action_items = {'PROGBEGIN':([0,],[2,]),'$end':([1,24,55,],[0,-1,-2,]),'NAME':([2,4,5,7,9,10,11,13,14,27,28,30,34,35,36,37,38,39,40,41,42,48,49,50,52,53,60,62,63,73,74,75,80,84,87,91,111,114,127,128,142,143,163,167,],[4,25,25,32,43,32,45,32,47,32,32,25,32,32,32,32,32,32,32,32,32,32,78,32,32,32,25,25,32,32,25,96,32,32,32,25,25,32,25,96,25,25,96,25,]),'BLOCK_OPEN':([2,4,30,60,62,74,91,111,127,137,138,142,143,166,167,],[5,5,5,5,91,91,5,91,91,142,143,5,5,167,5,]),'IF':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[7,7,7,7,7,7,7,7,7,7,7,7,7,]),'FOR':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[9,9,9,9,9,9,9,9,9,9,9,9,9,]),'WHILE':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[10,10,10,10,10,10,10,10,10,10,10,10,10,]),'FUNC_DEF':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[11,11,11,11,11,11,11,11,11,11,11,11,11,]),'RETURN':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[13,13,13,13,13,13,13,13,13,13,13,13,13,]),'VAR_DEF':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[14,14,14,14,14,14,14,14,14,14,14,14,14,]),'WRITELN':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[15,15,15,15,15,15,15,15,15,15,15,15,15,]),'READLN':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[16,16,16,16,16,16,16,16,16,16,16,16,16,]),'INT':([2,4,5,7,10,13,27,28,30,34,35,36,37,38,39,40,41,42,48,50,52,53,60,62,63,73,74,80,84,87,91,111,114,117,127,129,139,140,142,143,146,154,167,],[12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,12,126,12,136,144,145,12,12,151,157,12,]),'FLOAT':([2,4,5,7,10,13,27,28,30,34,35,36,37,38,39,40,41,42,48,50,52,53,60,62,63,73,74,80,84,87,91,111,114,127,142,143,167,],[21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,21,]),'BOOL':([2,4,5,7,10,13,27,28,30,34,35,36,37,38,39,40,41,42,48,50,52,53,60,62,63,73,74,80,84,87,91,111,114,127,142,143,167,],[22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,22,]),'STRING':([2,4,5,7,10,13,27,28,30,34,35,36,37,38,39,40,41,42,48,50,52,53,60,62,63,73,74,80,84,87,91,111,114,127,142,143,167,],[23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,23,]),'DOT':([3,4,17,25,26,30,32,33,61,89,110,126,133,136,141,144,149,],[24,-56,51,-56,55,-6,-56,51,-5,-4,-3,133,140,141,146,149,154,]),'ASSIGNMENT':([4,17,18,19,20,25,43,85,99,101,102,103,104,158,],[-56,50,52,53,54,-56,73,-40,-24,-57,-58,-59,-60,-26,]),'OPEN_SQUARE_BKT':([4,25,32,100,124,132,],[27,27,63,117,129,139,]),'OPEN_ROUND_BKT':([4,15,16,25,32,45,50,54,],[28,48,49,28,28,75,80,84,]),'MULTIPLY':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,34,-50,-51,-52,-54,-55,34,-55,34,34,34,34,-41,-42,34,34,34,34,34,34,34,34,34,-53,34,34,-39,-38,34,34,-39,34,]),'DIVIDE':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,35,-50,-51,-52,-54,-55,35,-55,35,35,35,35,-41,-42,35,35,35,35,35,35,35,35,35,-53,35,35,-39,-38,35,35,-39,35,]),'PLUS':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,36,-50,-51,-52,-54,-55,36,-55,36,36,36,36,-41,-42,-43,-44,36,36,36,36,36,36,36,-53,36,36,-39,-38,36,36,-39,36,]),'MINUS':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,37,-50,-51,-52,-54,-55,37,-55,37,37,37,37,-41,-42,-43,-44,37,37,37,37,37,37,37,-53,37,37,-39,-38,37,37,-39,37,]),'EQUALS':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,38,-50,-51,-52,-54,-55,38,-55,38,38,38,38,-41,-42,-43,-44,-45,-46,-47,38,38,38,38,-53,38,38,-39,-38,38,38,-39,38,]),'MORE':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,39,-50,-51,-52,-54,-55,39,-55,39,39,39,39,-41,-42,-43,-44,-45,-46,-47,39,39,39,39,-53,39,39,-39,-38,39,39,-39,39,]),'LESS':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,40,-50,-51,-52,-54,-55,40,-55,40,40,40,40,-41,-42,-43,-44,-45,-46,-47,40,40,40,40,-53,40,40,-39,-38,40,40,-39,40,]),'AND':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,41,-50,-51,-52,-54,-55,41,-55,41,41,41,41,-41,-42,-43,-44,-45,-46,-47,-48,41,41,41,-53,41,41,-39,-38,41,41,-39,41,]),'OR':([4,8,12,21,22,23,25,31,32,44,46,56,58,64,65,66,67,68,69,70,71,72,77,79,81,82,83,85,86,93,94,113,122,],[-55,42,-50,-51,-52,-54,-55,42,-55,42,42,42,42,-41,-42,-43,-44,-45,-46,-47,-48,-49,42,42,-53,42,42,-39,-38,42,42,-39,42,]),'END_LINE':([4,6,8,12,13,21,22,23,25,29,32,46,64,65,66,67,68,69,70,71,72,79,81,82,83,85,86,90,92,95,99,101,102,103,104,105,106,113,118,119,120,121,130,131,134,152,153,158,164,169,],[-55,30,-34,-50,-22,-51,-52,-54,-55,60,-55,-21,-41,-42,-43,-44,-45,-46,-47,-48,-49,-29,-53,-30,-31,-39,-38,-9,-8,-12,-23,-57,-58,-59,-60,-27,-28,-39,-33,-32,-10,-7,137,138,-11,-13,-14,-25,166,-15,]),'ELSE':([8,12,13,21,22,23,25,32,46,64,65,66,67,68,69,70,71,72,79,81,82,83,85,86,90,92,95,99,101,102,103,104,105,106,113,118,119,120,121,134,152,153,158,169,],[-34,-50,-22,-51,-52,-54,-55,-55,-21,-41,-42,-43,-44,-45,-46,-47,-48,-49,-29,-53,-30,-31,-39,-38,111,-8,-12,-23,-57,-58,-59,-60,-27,-28,-39,-33,-32,-10,-7,-11,-13,-14,-25,-15,]),'THEN':([12,21,22,23,31,32,64,65,66,67,68,69,70,71,72,81,86,113,],[-50,-51,-52,-54,62,-55,-41,-42,-43,-44,-45,-46,-47,-48,-49,-53,-38,-39,]),'DO':([12,21,22,23,32,44,64,65,66,67,68,69,70,71,72,81,86,113,122,],[-50,-51,-52,-54,-55,74,-41,-42,-43,-44,-45,-46,-47,-48,-49,-53,-38,-39,127,]),'CLOSE_SQUARE_BKT':([12,21,22,23,32,56,64,65,66,67,68,69,70,71,72,81,86,93,113,145,151,157,],[-50,-51,-52,-54,-55,85,-41,-42,-43,-44,-45,-46,-47,-48,-49,-53,-38,113,-39,150,156,160,]),'COMMA':([12,21,22,23,32,58,64,65,66,67,68,69,70,71,72,81,86,101,102,103,104,113,123,161,],[-50,-51,-52,-54,-55,87,-41,-42,-43,-44,-45,-46,-47,-48,-49,-53,-38,-57,-58,-59,-60,-39,128,163,]),'CLOSE_ROUND_BKT':([12,21,22,23,28,32,57,58,59,64,65,66,67,68,69,70,71,72,75,77,78,80,81,84,86,87,97,98,101,102,103,104,107,108,109,113,123,128,135,161,163,165,],[-50,-51,-52,-54,-61,-55,86,-36,-37,-41,-42,-43,-44,-45,-46,-47,-48,-49,-61,105,106,-61,-53,-61,-38,-61,116,-20,-57,-58,-59,-60,118,119,-35,-39,-17,-61,-16,-19,-61,-18,]),'TO':([12,21,22,23,32,64,65,66,67,68,69,70,71,72,81,86,94,113,],[-50,-51,-52,-54,-55,-41,-42,-43,-44,-45,-46,-47,-48,-49,-53,-38,114,-39,]),'BLOCK_CLOSE':([30,60,61,88,89,110,112,147,148,168,],[-6,89,-5,110,-4,-3,121,152,153,169,]),'COLON':([47,96,116,],[76,115,125,]),'LENGTH':([51,],[81,]),'ARRAY':([76,115,125,],[100,124,132,]),'FLOAT_TYPE':([76,115,125,155,159,162,],[101,101,101,101,101,101,]),'INT_TYPE':([76,115,125,155,159,162,],[102,102,102,102,102,102,]),'STRING_TYPE':([76,115,125,155,159,162,],[103,103,103,103,103,103,]),'BOOL_TYPE':([76,115,125,155,159,162,],[104,104,104,104,104,104,]),'NONE_TYPE':([125,],[131,]),'OF':([150,156,160,],[155,159,162,]),}
+_lr_action_items = {'PROGBEGIN':([0,],[2,]),'$end':([1,28,64,],[0,-1,-2,]),'NAME':([2,4,5,9,10,12,13,14,16,17,18,31,32,36,37,42,43,44,45,46,47,48,49,50,57,58,59,61,62,70,75,76,86,87,88,90,94,98,101,105,128,131,134,135,148,159,161,162,184,],[4,29,29,29,40,51,40,53,40,55,56,40,40,-9,29,40,40,40,40,40,40,40,40,40,40,92,40,40,40,-8,29,40,40,29,111,40,40,40,40,29,29,40,111,145,29,145,29,29,29,]),'error':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[7,7,34,38,-9,73,-8,107,107,7,107,107,7,7,7,]),'BLOCK_OPEN':([2,4,5,36,37,70,75,87,105,128,148,156,157,161,162,183,184,],[9,9,9,-9,9,-8,105,105,9,105,105,161,162,9,9,184,9,]),'IF':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[10,10,10,10,-9,10,-8,10,10,10,10,10,10,10,10,]),'FOR':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[12,12,12,12,-9,12,-8,12,12,12,12,12,12,12,12,]),'WHILE':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[13,13,13,13,-9,13,-8,13,13,13,13,13,13,13,13,]),'FUNC_DEF':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[14,14,14,14,-9,14,-8,14,14,14,14,14,14,14,14,]),'RETURN':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[16,16,16,16,-9,16,-8,16,16,16,16,16,16,16,16,]),'VAR_DEF':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[17,17,17,17,-9,17,-8,17,17,17,17,17,17,17,17,]),'CONST_DEF':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[18,18,18,18,-9,18,-8,18,18,18,18,18,18,18,18,]),'WRITELN':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[19,19,19,19,-9,19,-8,19,19,19,19,19,19,19,19,]),'READLN':([2,4,5,9,36,37,70,75,87,105,128,148,161,162,184,],[20,20,20,20,-9,20,-8,20,20,20,20,20,20,20,20,]),'INT':([2,4,5,9,10,13,16,31,32,36,37,42,43,44,45,46,47,48,49,50,57,59,61,62,70,75,76,86,87,90,94,98,101,105,128,131,135,148,149,158,159,161,162,165,173,184,],[15,15,15,15,15,15,15,15,15,-9,15,15,15,15,15,15,15,15,15,15,15,15,15,15,-8,15,15,15,15,15,15,15,15,15,15,15,147,15,155,163,147,15,15,170,176,15,]),'FLOAT':([2,4,5,9,10,13,16,31,32,36,37,42,43,44,45,46,47,48,49,50,57,59,61,62,70,75,76,86,87,90,94,98,101,105,128,131,148,161,162,184,],[25,25,25,25,25,25,25,25,25,-9,25,25,25,25,25,25,25,25,25,25,25,25,25,25,-8,25,25,25,25,25,25,25,25,25,25,25,25,25,25,25,]),'BOOL':([2,4,5,9,10,13,16,31,32,36,37,42,43,44,45,46,47,48,49,50,57,59,61,62,70,75,76,86,87,90,94,98,101,105,128,131,148,161,162,184,],[26,26,26,26,26,26,26,26,26,-9,26,26,26,26,26,26,26,26,26,26,26,26,26,26,-8,26,26,26,26,26,26,26,26,26,26,26,26,26,26,26,]),'STRING':([2,4,5,9,10,13,16,31,32,36,37,42,43,44,45,46,47,48,49,50,57,59,61,62,70,75,76,86,87,90,94,98,101,105,128,131,148,161,162,184,],[27,27,27,27,27,27,27,27,27,-9,27,27,27,27,27,27,27,27,27,27,27,27,27,27,-8,27,27,27,27,27,27,27,27,27,27,27,27,27,27,27,]),'DOT':([3,4,5,6,7,21,29,30,33,34,36,40,41,70,71,74,102,103,145,146,147,153,155,160,163,168,],[28,-69,-3,-5,-7,60,-69,64,-4,-6,-9,-69,60,-8,-10,-13,-11,-12,-36,153,-35,159,160,165,168,173,]),'ASSIGNMENT':([4,21,22,23,24,29,51,99,116,118,119,120,121,177,],[-69,59,61,62,63,-69,86,-53,-33,-70,-71,-72,-73,-38,]),'OPEN_SQUARE_BKT':([4,29,40,117,142,152,],[31,31,76,135,149,158,]),'OPEN_ROUND_BKT':([4,19,20,29,40,53,59,63,],[32,57,58,32,32,88,94,98,]),'MULTIPLY':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,42,-63,-64,-65,-67,-68,42,-68,42,42,42,42,-54,-55,42,42,42,42,42,42,42,42,42,-66,42,42,-52,-51,42,42,42,42,-52,42,]),'DIVIDE':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,43,-63,-64,-65,-67,-68,43,-68,43,43,43,43,-54,-55,43,43,43,43,43,43,43,43,43,-66,43,43,-52,-51,43,43,43,43,-52,43,]),'PLUS':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,44,-63,-64,-65,-67,-68,44,-68,44,44,44,44,-54,-55,-56,-57,44,44,44,44,44,44,44,-66,44,44,-52,-51,44,44,44,44,-52,44,]),'MINUS':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,45,-63,-64,-65,-67,-68,45,-68,45,45,45,45,-54,-55,-56,-57,45,45,45,45,45,45,45,-66,45,45,-52,-51,45,45,45,45,-52,45,]),'EQUALS':([4,11,15,25,26,27,29,39,40,52,54,56,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,46,-63,-64,-65,-67,-68,46,-68,46,46,90,46,46,-54,-55,-56,-57,-58,-59,-60,46,46,46,46,-66,46,46,-52,-51,46,46,46,46,-52,46,]),'MORE':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,47,-63,-64,-65,-67,-68,47,-68,47,47,47,47,-54,-55,-56,-57,-58,-59,-60,47,47,47,47,-66,47,47,-52,-51,47,47,47,47,-52,47,]),'LESS':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,48,-63,-64,-65,-67,-68,48,-68,48,48,48,48,-54,-55,-56,-57,-58,-59,-60,48,48,48,48,-66,48,48,-52,-51,48,48,48,48,-52,48,]),'AND':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,49,-63,-64,-65,-67,-68,49,-68,49,49,49,49,-54,-55,-56,-57,-58,-59,-60,-61,49,49,49,-66,49,49,-52,-51,49,49,49,49,-52,49,]),'OR':([4,11,15,25,26,27,29,39,40,52,54,65,69,77,78,79,80,81,82,83,84,85,91,93,95,96,97,99,100,108,109,122,127,130,140,],[-68,50,-63,-64,-65,-67,-68,50,-68,50,50,50,50,-54,-55,-56,-57,-58,-59,-60,-61,-62,50,50,-66,50,50,-52,-51,50,50,50,50,-52,50,]),'END_LINE':([4,7,8,11,15,16,25,26,27,29,34,35,38,40,54,73,77,78,79,80,81,82,83,84,85,93,95,96,97,99,100,104,106,107,110,116,118,119,120,121,122,123,124,130,136,137,138,139,150,151,154,171,172,177,182,186,],[-68,-16,36,-46,-63,-31,-64,-65,-67,-68,-16,70,-16,-68,-30,-16,-54,-55,-56,-57,-58,-59,-60,-61,-62,-41,-66,-42,-43,-52,-51,-17,-15,-16,-20,-32,-70,-71,-72,-73,-34,-39,-40,-52,-45,-44,-18,-14,156,157,-19,-21,-22,-37,183,-23,]),'BLOCK_CLOSE':([5,6,7,33,34,36,37,38,70,71,72,73,74,102,103,129,166,167,185,],[-3,-5,-7,-4,-6,-9,71,74,-8,-10,102,103,-13,-11,-12,139,171,172,186,]),'ELSE':([11,15,16,25,26,27,29,40,54,77,78,79,80,81,82,83,84,85,93,95,96,97,99,100,104,106,107,110,116,118,119,120,121,122,123,124,130,136,137,138,139,154,171,172,177,186,],[-46,-63,-31,-64,-65,-67,-68,-68,-30,-54,-55,-56,-57,-58,-59,-60,-61,-62,-41,-66,-42,-43,-52,-51,128,-15,-16,-20,-32,-70,-71,-72,-73,-34,-39,-40,-52,-45,-44,-18,-14,-19,-21,-22,-37,-23,]),'THEN':([15,25,26,27,39,40,77,78,79,80,81,82,83,84,85,95,100,130,],[-63,-64,-65,-67,75,-68,-54,-55,-56,-57,-58,-59,-60,-61,-62,-66,-51,-52,]),'DO':([15,25,26,27,40,52,77,78,79,80,81,82,83,84,85,95,100,130,140,],[-63,-64,-65,-67,-68,87,-54,-55,-56,-57,-58,-59,-60,-61,-62,-66,-51,-52,148,]),'CLOSE_SQUARE_BKT':([15,25,26,27,40,65,77,78,79,80,81,82,83,84,85,95,100,108,130,145,147,164,170,176,],[-63,-64,-65,-67,-68,99,-54,-55,-56,-57,-58,-59,-60,-61,-62,-66,-51,130,-52,-36,-35,169,175,179,]),'COMMA':([15,25,26,27,40,67,69,77,78,79,80,81,82,83,84,85,95,100,113,115,118,119,120,121,127,130,141,144,180,],[-63,-64,-65,-67,-68,101,-49,-54,-55,-56,-57,-58,-59,-60,-61,-62,-66,-51,134,-27,-70,-71,-72,-73,-48,-52,-28,-26,-29,]),'CLOSE_ROUND_BKT':([15,25,26,27,32,40,66,67,68,69,77,78,79,80,81,82,83,84,85,88,91,92,94,95,98,100,112,113,114,115,118,119,120,121,125,126,127,130,141,144,180,],[-63,-64,-65,-67,-74,-68,100,-47,-50,-49,-54,-55,-56,-57,-58,-59,-60,-61,-62,-74,123,124,-74,-66,-74,-51,133,-24,-25,-27,-70,-71,-72,-73,136,137,-48,-52,-28,-26,-29,]),'TO':([15,25,26,27,40,77,78,79,80,81,82,83,84,85,95,100,109,130,],[-63,-64,-65,-67,-68,-54,-55,-56,-57,-58,-59,-60,-61,-62,-66,-51,131,-52,]),'COLON':([55,111,133,],[89,132,143,]),'LENGTH':([60,],[95,]),'ARRAY':([89,132,143,],[117,142,152,]),'FLOAT_TYPE':([89,132,143,174,178,181,],[118,118,118,118,118,118,]),'INT_TYPE':([89,132,143,174,178,181,],[119,119,119,119,119,119,]),'STRING_TYPE':([89,132,143,174,178,181,],[120,120,120,120,120,120,]),'BOOL_TYPE':([89,132,143,174,178,181,],[121,121,121,121,121,121,]),'NONE_TYPE':([143,],[151,]),'OF':([169,175,179,],[174,178,181,]),}
 
 _lr_action = {}
 for _k, _v in _lr_action_items.items():
@@ -17,7 +17,7 @@ for _k, _v in _lr_action_items.items():
       _lr_action[_x][_k] = _y
 del _lr_action_items
 
-_lr_goto_items = {'start':([0,],[1,]),'state_list':([2,4,30,60,91,142,143,167,],[3,26,61,88,112,147,148,168,]),'state':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[6,6,29,6,6,92,92,6,92,92,6,6,6,]),'expression':([2,4,5,7,10,13,27,28,30,34,35,36,37,38,39,40,41,42,48,50,52,53,60,62,63,73,74,80,84,87,91,111,114,127,142,143,167,],[8,8,8,31,44,46,56,58,8,64,65,66,67,68,69,70,71,72,77,79,82,83,8,8,93,94,8,58,58,58,8,8,122,8,8,8,8,]),'expression_name':([2,4,5,7,10,13,27,28,30,34,35,36,37,38,39,40,41,42,48,50,52,53,60,62,63,73,74,80,84,87,91,111,114,127,142,143,167,],[17,17,17,33,33,33,33,33,17,33,33,33,33,33,33,33,33,33,33,33,33,33,17,17,33,33,17,33,33,33,17,17,33,17,17,17,17,]),'expression_array_call':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[18,18,18,18,18,18,18,18,18,18,18,18,18,]),'state_var_def':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[19,19,19,19,19,19,19,19,19,19,19,19,19,]),'state_array_def':([2,4,5,30,60,62,74,91,111,127,142,143,167,],[20,20,20,20,20,20,20,20,20,20,20,20,20,]),'expr_list':([28,80,84,87,],[57,107,108,109,]),'empty':([28,75,80,84,87,128,163,],[59,98,59,59,59,98,98,]),'state_body':([62,74,111,127,],[90,95,120,134,]),'argument_list':([75,128,163,],[97,135,165,]),'var_type':([76,115,125,155,159,162,],[99,123,130,158,161,164,]),}
+_lr_goto_items = {'start':([0,],[1,]),'state_list':([2,4,105,161,162,184,],[3,30,129,166,167,185,]),'state_seq':([2,4,9,105,161,162,184,],[5,5,37,5,5,5,5,]),'state_block':([2,4,5,37,105,161,162,184,],[6,6,33,72,6,6,6,6,]),'state':([2,4,5,9,37,75,87,105,128,148,161,162,184,],[8,8,35,8,35,106,106,8,106,106,8,8,8,]),'expression':([2,4,5,9,10,13,16,31,32,37,42,43,44,45,46,47,48,49,50,57,59,61,62,75,76,86,87,90,94,98,101,105,128,131,148,161,162,184,],[11,11,11,11,39,52,54,65,69,11,77,78,79,80,81,82,83,84,85,91,93,96,97,11,108,109,11,122,69,69,127,11,11,140,11,11,11,11,]),'expression_name':([2,4,5,9,10,13,16,31,32,37,42,43,44,45,46,47,48,49,50,57,59,61,62,75,76,86,87,90,94,98,101,105,128,131,148,161,162,184,],[21,21,21,21,41,41,41,41,41,21,41,41,41,41,41,41,41,41,41,41,41,41,41,21,41,41,21,41,41,41,41,21,21,41,21,21,21,21,]),'expression_array_call':([2,4,5,9,37,75,87,105,128,148,161,162,184,],[22,22,22,22,22,22,22,22,22,22,22,22,22,]),'state_var_def':([2,4,5,9,37,75,87,105,128,148,161,162,184,],[23,23,23,23,23,23,23,23,23,23,23,23,23,]),'state_array_def':([2,4,5,9,37,75,87,105,128,148,161,162,184,],[24,24,24,24,24,24,24,24,24,24,24,24,24,]),'expr_list':([32,94,98,],[66,125,126,]),'expr_seq':([32,94,98,],[67,67,67,]),'empty':([32,88,94,98,],[68,114,68,68,]),'state_body':([75,87,128,148,],[104,110,138,154,]),'argument_list':([88,],[112,]),'argument_seq':([88,],[113,]),'argument':([88,134,],[115,144,]),'var_type':([89,132,143,174,178,181,],[116,141,150,177,180,182,]),'array_bound':([135,159,],[146,164,]),}
 
 _lr_goto = {}
 for _k, _v in _lr_goto_items.items():
@@ -27,65 +27,78 @@ for _k, _v in _lr_goto_items.items():
 del _lr_goto_items
 _lr_productions = [
   ("S' -> start","S'",1,None,None,None),
-  ('start -> PROGBEGIN state_list DOT','start',3,'p_start','mel_parser.py',291),
-  ('start -> PROGBEGIN NAME state_list DOT','start',4,'p_start','mel_parser.py',292),
-  ('state_list -> BLOCK_OPEN state END_LINE state_list BLOCK_CLOSE','state_list',5,'p_state_list_begin','mel_parser.py',306),
-  ('state_list -> BLOCK_OPEN state END_LINE BLOCK_CLOSE','state_list',4,'p_state_list_begin','mel_parser.py',307),
-  ('state_list -> state END_LINE state_list','state_list',3,'p_state_list','mel_parser.py',316),
-  ('state_list -> state END_LINE','state_list',2,'p_state_list','mel_parser.py',317),
-  ('state_body -> BLOCK_OPEN state_list BLOCK_CLOSE','state_body',3,'p_state_body','mel_parser.py',326),
-  ('state_body -> state','state_body',1,'p_state_body','mel_parser.py',327),
-  ('state -> IF expression THEN state_body','state',4,'p_state_if','mel_parser.py',337),
-  ('state -> IF expression THEN state_body ELSE state_body','state',6,'p_state_if','mel_parser.py',338),
-  ('state -> FOR NAME ASSIGNMENT expression TO expression DO state_body','state',8,'p_state_for','mel_parser.py',348),
-  ('state -> WHILE expression DO state_body','state',4,'p_state_while','mel_parser.py',354),
-  ('state -> FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE','state',11,'p_state_func_def','mel_parser.py',360),
-  ('state -> FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON NONE_TYPE END_LINE BLOCK_OPEN state_list BLOCK_CLOSE','state',11,'p_state_func_def','mel_parser.py',361),
-  ('state -> FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE','state',19,'p_state_func_def','mel_parser.py',362),
-  ('argument_list -> NAME COLON var_type COMMA argument_list','argument_list',5,'p_argument_list','mel_parser.py',371),
-  ('argument_list -> NAME COLON var_type','argument_list',3,'p_argument_list','mel_parser.py',372),
-  ('argument_list -> NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type COMMA argument_list','argument_list',13,'p_argument_list','mel_parser.py',373),
-  ('argument_list -> NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type','argument_list',11,'p_argument_list','mel_parser.py',374),
-  ('argument_list -> empty','argument_list',1,'p_argument_list','mel_parser.py',375),
-  ('state -> RETURN expression','state',2,'p_state_return','mel_parser.py',388),
-  ('state -> RETURN','state',1,'p_state_return','mel_parser.py',389),
-  ('state -> VAR_DEF NAME COLON var_type','state',4,'p_state_var_def','mel_parser.py',398),
-  ('state_var_def -> VAR_DEF NAME COLON var_type','state_var_def',4,'p_state_var_def','mel_parser.py',399),
-  ('state -> VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type','state',12,'p_state_array_def','mel_parser.py',405),
-  ('state_array_def -> VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type','state_array_def',12,'p_state_array_def','mel_parser.py',406),
-  ('state -> WRITELN OPEN_ROUND_BKT expression CLOSE_ROUND_BKT','state',4,'p_state_writeln','mel_parser.py',417),
-  ('state -> READLN OPEN_ROUND_BKT NAME CLOSE_ROUND_BKT','state',4,'p_state_readln','mel_parser.py',423),
-  ('state -> expression_name ASSIGNMENT expression','state',3,'p_state_var_assign','mel_parser.py',429),
-  ('state -> expression_array_call ASSIGNMENT expression','state',3,'p_state_var_assign','mel_parser.py',430),
-  ('state -> state_var_def ASSIGNMENT expression','state',3,'p_state_var_assign_def','mel_parser.py',437),
-  ('state -> state_array_def ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT','state',5,'p_state_var_assign_def','mel_parser.py',438),
-  ('state -> expression_name ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT','state',5,'p_state_var_assign_def','mel_parser.py',439),
-  ('state -> expression','state',1,'p_state_expression','mel_parser.py',448),
-  ('expr_list -> expression COMMA expr_list','expr_list',3,'p_expr_list','mel_parser.py',454),
-  ('expr_list -> expression','expr_list',1,'p_expr_list','mel_parser.py',455),
-  ('expr_list -> empty','expr_list',1,'p_expr_list_empty','mel_parser.py',464),
-  ('expression -> NAME OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT','expression',4,'p_expression_func_call','mel_parser.py',469),
-  ('expression -> NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT','expression',4,'p_expression_array_call','mel_parser.py',475),
-  ('expression_array_call -> NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT','expression_array_call',4,'p_expression_array_call','mel_parser.py',476),
-  ('expression -> expression MULTIPLY expression','expression',3,'p_expression_math','mel_parser.py',482),
-  ('expression -> expression DIVIDE expression','expression',3,'p_expression_math','mel_parser.py',483),
-  ('expression -> expression PLUS expression','expression',3,'p_expression_math','mel_parser.py',484),
-  ('expression -> expression MINUS expression','expression',3,'p_expression_math','mel_parser.py',485),
-  ('expression -> expression EQUALS expression','expression',3,'p_expression_logic','mel_parser.py',491),
-  ('expression -> expression MORE expression','expression',3,'p_expression_logic','mel_parser.py',492),
-  ('expression -> expression LESS expression','expression',3,'p_expression_logic','mel_parser.py',493),
-  ('expression -> expression AND expression','expression',3,'p_expression_logic','mel_parser.py',494),
-  ('expression -> expression OR expression','expression',3,'p_expression_logic','mel_parser.py',495),
-  ('expression -> INT','expression',1,'p_expression_int','mel_parser.py',501),
-  ('expression -> FLOAT','expression',1,'p_expression_float','mel_parser.py',507),
-  ('expression -> BOOL','expression',1,'p_expression_bool','mel_parser.py',513),
-  ('expression -> expression_name DOT LENGTH','expression',3,'p_expression_length','mel_parser.py',519),
-  ('expression -> STRING','expression',1,'p_expression_string','mel_parser.py',525),
-  ('expression -> NAME','expression',1,'p_expression_name','mel_parser.py',531),
-  ('expression_name -> NAME','expression_name',1,'p_expression_name','mel_parser.py',532),
-  ('var_type -> FLOAT_TYPE','var_type',1,'p_var_type','mel_parser.py',539),
-  ('var_type -> INT_TYPE','var_type',1,'p_var_type','mel_parser.py',540),
-  ('var_type -> STRING_TYPE','var_type',1,'p_var_type','mel_parser.py',541),
-  ('var_type -> BOOL_TYPE','var_type',1,'p_var_type','mel_parser.py',542),
-  ('empty -> <empty>','empty',0,'p_empty','mel_parser.py',551),
+  ('start -> PROGBEGIN state_list DOT','start',3,'p_start','mel_parser.py',213),
+  ('start -> PROGBEGIN NAME state_list DOT','start',4,'p_start','mel_parser.py',214),
+  ('state_list -> state_seq','state_list',1,'p_state_list','mel_parser.py',228),
+  ('state_list -> state_seq state_block','state_list',2,'p_state_list','mel_parser.py',229),
+  ('state_list -> state_block','state_list',1,'p_state_list','mel_parser.py',230),
+  ('state_list -> state_seq error','state_list',2,'p_state_list_error','mel_parser.py',242),
+  ('state_list -> error','state_list',1,'p_state_list_error','mel_parser.py',243),
+  ('state_seq -> state_seq state END_LINE','state_seq',3,'p_state_seq','mel_parser.py',250),
+  ('state_seq -> state END_LINE','state_seq',2,'p_state_seq','mel_parser.py',251),
+  ('state_block -> BLOCK_OPEN state_seq BLOCK_CLOSE','state_block',3,'p_state_block','mel_parser.py',264),
+  ('state_block -> BLOCK_OPEN state_seq state_block BLOCK_CLOSE','state_block',4,'p_state_block','mel_parser.py',265),
+  ('state_block -> BLOCK_OPEN state_seq error BLOCK_CLOSE','state_block',4,'p_state_block_error','mel_parser.py',273),
+  ('state_block -> BLOCK_OPEN error BLOCK_CLOSE','state_block',3,'p_state_block_error','mel_parser.py',274),
+  ('state_body -> BLOCK_OPEN state_list BLOCK_CLOSE','state_body',3,'p_state_body','mel_parser.py',280),
+  ('state_body -> state','state_body',1,'p_state_body','mel_parser.py',281),
+  ('state -> error','state',1,'p_state_error','mel_parser.py',291),
+  ('state -> IF expression THEN state_body','state',4,'p_state_if','mel_parser.py',298),
+  ('state -> IF expression THEN state_body ELSE state_body','state',6,'p_state_if','mel_parser.py',299),
+  ('state -> FOR NAME ASSIGNMENT expression TO expression DO state_body','state',8,'p_state_for','mel_parser.py',311),
+  ('state -> WHILE expression DO state_body','state',4,'p_state_while','mel_parser.py',318),
+  ('state -> FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE','state',11,'p_state_func_def','mel_parser.py',325),
+  ('state -> FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON NONE_TYPE END_LINE BLOCK_OPEN state_list BLOCK_CLOSE','state',11,'p_state_func_def','mel_parser.py',326),
+  ('state -> FUNC_DEF NAME OPEN_ROUND_BKT argument_list CLOSE_ROUND_BKT COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type END_LINE BLOCK_OPEN state_list BLOCK_CLOSE','state',19,'p_state_func_def','mel_parser.py',327),
+  ('argument_list -> argument_seq','argument_list',1,'p_argument_list','mel_parser.py',337),
+  ('argument_list -> empty','argument_list',1,'p_argument_list','mel_parser.py',338),
+  ('argument_seq -> argument_seq COMMA argument','argument_seq',3,'p_argument_seq','mel_parser.py',344),
+  ('argument_seq -> argument','argument_seq',1,'p_argument_seq','mel_parser.py',345),
+  ('argument -> NAME COLON var_type','argument',3,'p_argument','mel_parser.py',355),
+  ('argument -> NAME COLON ARRAY OPEN_SQUARE_BKT INT DOT DOT INT CLOSE_SQUARE_BKT OF var_type','argument',11,'p_argument','mel_parser.py',356),
+  ('state -> RETURN expression','state',2,'p_state_return','mel_parser.py',365),
+  ('state -> RETURN','state',1,'p_state_return','mel_parser.py',366),
+  ('state -> VAR_DEF NAME COLON var_type','state',4,'p_state_var_def','mel_parser.py',376),
+  ('state_var_def -> VAR_DEF NAME COLON var_type','state_var_def',4,'p_state_var_def','mel_parser.py',377),
+  ('state -> CONST_DEF NAME EQUALS expression','state',4,'p_state_const_def','mel_parser.py',384),
+  ('array_bound -> INT','array_bound',1,'p_array_bound','mel_parser.py',391),
+  ('array_bound -> NAME','array_bound',1,'p_array_bound','mel_parser.py',392),
+  ('state -> VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT array_bound DOT DOT array_bound CLOSE_SQUARE_BKT OF var_type','state',12,'p_state_array_def','mel_parser.py',399),
+  ('state_array_def -> VAR_DEF NAME COLON ARRAY OPEN_SQUARE_BKT array_bound DOT DOT array_bound CLOSE_SQUARE_BKT OF var_type','state_array_def',12,'p_state_array_def','mel_parser.py',400),
+  ('state -> WRITELN OPEN_ROUND_BKT expression CLOSE_ROUND_BKT','state',4,'p_state_writeln','mel_parser.py',412),
+  ('state -> READLN OPEN_ROUND_BKT NAME CLOSE_ROUND_BKT','state',4,'p_state_readln','mel_parser.py',419),
+  ('state -> expression_name ASSIGNMENT expression','state',3,'p_state_var_assign','mel_parser.py',435),
+  ('state -> expression_array_call ASSIGNMENT expression','state',3,'p_state_var_assign','mel_parser.py',436),
+  ('state -> state_var_def ASSIGNMENT expression','state',3,'p_state_var_assign_def','mel_parser.py',444),
+  ('state -> state_array_def ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT','state',5,'p_state_var_assign_def','mel_parser.py',445),
+  ('state -> expression_name ASSIGNMENT OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT','state',5,'p_state_var_assign_def','mel_parser.py',446),
+  ('state -> expression','state',1,'p_state_expression','mel_parser.py',456),
+  ('expr_list -> expr_seq','expr_list',1,'p_expr_list','mel_parser.py',462),
+  ('expr_seq -> expr_seq COMMA expression','expr_seq',3,'p_expr_seq','mel_parser.py',468),
+  ('expr_seq -> expression','expr_seq',1,'p_expr_seq','mel_parser.py',469),
+  ('expr_list -> empty','expr_list',1,'p_expr_list_empty','mel_parser.py',479),
+  ('expression -> NAME OPEN_ROUND_BKT expr_list CLOSE_ROUND_BKT','expression',4,'p_expression_func_call','mel_parser.py',484),
+  ('expression -> NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT','expression',4,'p_expression_array_call','mel_parser.py',491),
+  ('expression_array_call -> NAME OPEN_SQUARE_BKT expression CLOSE_SQUARE_BKT','expression_array_call',4,'p_expression_array_call','mel_parser.py',492),
+  ('expression -> expression MULTIPLY expression','expression',3,'p_expression_math','mel_parser.py',498),
+  ('expression -> expression DIVIDE expression','expression',3,'p_expression_math','mel_parser.py',499),
+  ('expression -> expression PLUS expression','expression',3,'p_expression_math','mel_parser.py',500),
+  ('expression -> expression MINUS expression','expression',3,'p_expression_math','mel_parser.py',501),
+  ('expression -> expression EQUALS expression','expression',3,'p_expression_logic','mel_parser.py',507),
+  ('expression -> expression MORE expression','expression',3,'p_expression_logic','mel_parser.py',508),
+  ('expression -> expression LESS expression','expression',3,'p_expression_logic','mel_parser.py',509),
+  ('expression -> expression AND expression','expression',3,'p_expression_logic','mel_parser.py',510),
+  ('expression -> expression OR expression','expression',3,'p_expression_logic','mel_parser.py',511),
+  ('expression -> INT','expression',1,'p_expression_int','mel_parser.py',517),
+  ('expression -> FLOAT','expression',1,'p_expression_float','mel_parser.py',523),
+  ('expression -> BOOL','expression',1,'p_expression_bool','mel_parser.py',529),
+  ('expression -> expression_name DOT LENGTH','expression',3,'p_expression_length','mel_parser.py',535),
+  ('expression -> STRING','expression',1,'p_expression_string','mel_parser.py',541),
+  ('expression -> NAME','expression',1,'p_expression_name','mel_parser.py',547),
+  ('expression_name -> NAME','expression_name',1,'p_expression_name','mel_parser.py',548),
+  ('var_type -> FLOAT_TYPE','var_type',1,'p_var_type','mel_parser.py',555),
+  ('var_type -> INT_TYPE','var_type',1,'p_var_type','mel_parser.py',556),
+  ('var_type -> STRING_TYPE','var_type',1,'p_var_type','mel_parser.py',557),
+  ('var_type -> BOOL_TYPE','var_type',1,'p_var_type','mel_parser.py',558),
+  ('empty -> <empty>','empty',0,'p_empty','mel_parser.py',567),
 ]
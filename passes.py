@@ -0,0 +1,488 @@
+import time
+from typing import List
+import mel_ast as ast
+from vartypes import ArrayDataType, VarType
+
+
+def count_nodes(tree) -> int:
+    count = 0
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, (list, tuple)):
+            stack.extend(node)
+        elif isinstance(node, ast.AstNode):
+            count += 1
+            stack.extend(node.children)
+    return count
+
+
+def walk_post_order(tree):
+    # дети раньше родителя, списки среди детей раскрываются на месте; без рекурсии.
+    # Общий узел (Context.intern) выдается один раз
+    seen = set()
+    stack = [(tree, False)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            yield node
+        elif isinstance(node, (list, tuple)):
+            stack.extend((child, False) for child in reversed(node))
+        elif isinstance(node, ast.AstNode) and id(node) not in seen:
+            seen.add(id(node))
+            stack.append((node, True))
+            stack.extend((child, False) for child in reversed(node.children))
+
+
+def fold_constants(tree):
+    # свертка константных выражений по уже проверенному и приведенному дереву
+    for node in walk_post_order(tree):
+        node.fold()
+
+
+def var_key(node):
+    # переменная, значение которой можно отслеживать: вид и индекс, у глобальной - имя
+    if type(node) is not ast.IdentNode:
+        return None
+    if node.var_type == VarType.GLOBAL:
+        return VarType.GLOBAL.value, node.name
+    if node.var_type == VarType.LOCAL or node.var_type == VarType.PARAM:
+        return node.var_type.value, node.index
+    return None
+
+
+def loop_effects(tree) -> dict:
+    # id цикла -> (переменные, которым в нем что-то присваивается (у массива - элементы), есть ли вызовы).
+    # Один обход снизу вверх: у узла - объединение того, что у детей
+    effects = {}
+    loops = {}
+    for node in walk_post_order(tree):
+        t = type(node)
+        keys = set()
+        calls = t is ast.FuncCallNode
+        if t is ast.AssignNode or t is ast.ReadlnNode or t is ast.ForNode:
+            keys.add(var_key(node.var.arr if type(node.var) is ast.ArrayCallNode else node.var))
+        children = list(node.children)
+        while children:
+            child = children.pop()
+            if type(child) is list or type(child) is tuple:
+                children.extend(child)
+                continue
+            effect = effects.get(id(child))
+            if effect is not None:
+                keys |= effect[0]
+                calls = calls or effect[1]
+        if keys or calls:
+            effects[id(node)] = (keys, calls)
+        if t is ast.WhileNode or t is ast.ForNode:
+            loops[id(node)] = (keys, calls)
+    return loops
+
+
+def escaped_arrays(tree) -> set:
+    # массивы, которые встречаются целиком (аргумент, присваивание, readln, writeln): у них могут быть
+    # другие имена, через которые меняются элементы. Общий узел обходится один раз: длина и цель
+    # присваивания списка до своей переменной не доходят, так что пройденная переменная - всегда целиком
+    keys = set()
+    seen = set()
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        t = type(node)
+        if t is list or t is tuple:
+            stack.extend(node)
+        elif id(node) in seen:
+            continue
+        elif t is ast.LengthNode:
+            continue  # длина от содержимого не зависит
+        elif t is ast.AssignNode and type(node.expr) is ast.ExprListNode:
+            stack.append(node.expr)  # новый массив из списка значений
+        elif isinstance(node, ast.AstNode):
+            seen.add(id(node))
+            if t is ast.IdentNode and type(node.data_type) is ArrayDataType:
+                keys.add(var_key(node))
+            stack.extend(node.children)
+    return keys
+
+
+class ConstPropagation:
+    '''
+    Распространение констант по телу функции (или основного блока) в порядке выполнения.
+    env: переменная (var_key) -> известное значение, у массива - кортеж значений элементов (None - неизвестно).
+    Значение держится до следующего присваивания; после if остаются значения, общие для ветвей,
+    перед циклом забываются переменные, которые цикл меняет. Вызов функции забывает глобальные
+    переменные, массивы из escaped_arrays не отслеживаются.
+    Узлы выражений бывают общими (share), поэтому не правятся на месте: известная переменная,
+    элемент массива и их родители заменяются копиями (AstNode.copy) и сворачиваются заново.
+    block / statement возвращают env после оператора, None - дальше управление не идет (return)
+    '''
+    def __init__(self, body: ast.StateListNode):
+        self.body = body
+        self.escaped = escaped_arrays(body)
+        self.loops = loop_effects(body)
+
+    def run(self):
+        ast.run_steps(self.block(self.body.states, {}))
+
+    # block / statement / expression - шаги для run_steps: глубина дерева не ограничена стеком Python
+    def block(self, states: list, env: dict):
+        for i, state in enumerate(states):
+            if isinstance(state, ast.ValueNode):  # выражение-оператор (вызов функции)
+                states[i] = yield self.expression(state, env)
+            else:
+                env = yield self.statement(state, env)
+                if env is None:
+                    return None  # остаток блока недостижим
+        return env
+
+    def statement(self, node, env: dict):
+        t = type(node)
+        if t is ast.AssignNode:
+            if type(node.var) is ast.ArrayCallNode:
+                node.var = yield self.target(node.var, env)
+                node.expr = yield self.expression(node.expr, env)
+                self.store_element(node.var, node.expr.const_val, env)
+            else:
+                node.expr = yield self.expression(node.expr, env)
+                self.store(node.var, node.expr, env)
+        elif t is ast.ReadlnNode:
+            if type(node.var) is ast.ArrayCallNode:
+                node.var = yield self.target(node.var, env)
+                self.store_element(node.var, None, env)
+            else:
+                env.pop(var_key(node.var), None)
+        elif t is ast.WritelnNode:
+            node.expr = yield self.expression(node.expr, env)
+        elif t is ast.ReturnNode:
+            if node.expr is not None:
+                node.expr = yield self.expression(node.expr, env)
+            return None
+        elif t is ast.IfNode:
+            node.condition = yield self.expression(node.condition, env)
+            if node.condition.const_val is not None:
+                # выполняется одна ветвь
+                if node.condition.const_val:
+                    return (yield self.block(node.then_body.states, env))
+                return env if node.else_body is None else (yield self.block(node.else_body.states, env))
+            then_env = yield self.block(node.then_body.states, dict(env))
+            else_env = env if node.else_body is None else (yield self.block(node.else_body.states, dict(env)))
+            return self.merge(then_env, else_env)
+        elif t is ast.WhileNode:
+            self.forget(node, env)
+            node.condition = yield self.expression(node.condition, env)
+            if node.condition.const_val is None or node.condition.const_val:
+                yield self.block(node.loop_body.states, dict(env))
+        elif t is ast.ForNode:
+            node.start_value = yield self.expression(node.start_value, env)
+            self.forget(node, env)
+            node.end_value = yield self.expression(node.end_value, env)  # считается на каждом шаге
+            yield self.block(node.loop_body.states, dict(env))
+        elif t is ast.StateListNode:
+            return (yield self.block(node.states, env))
+        elif t is ast.FuncDefNode:
+            ConstPropagation(node.body).run()
+        elif t is ast.ArrayDefNode:
+            env.pop((node.var_type.value, node.name if node.var_type == VarType.GLOBAL else node.index), None)
+        return env
+
+    def expression(self, node, env: dict):
+        # узел с подставленными значениями: тот же, если подставлять нечего, иначе копия
+        t = type(node)
+        if t is ast.IdentNode:
+            value = env.get(var_key(node)) if type(node.data_type) is not ArrayDataType else None
+            if value is None:
+                return node
+            node = node.copy()
+            node.const_val = value
+            return node
+        if t is ast.ArrayCallNode:
+            index = yield self.expression(node.arr_index, env)
+            values = self.elements(node.arr, env)
+            if index is node.arr_index and (values is None or index.const_val is None):
+                return node
+            node = node.copy()
+            node.arr_index = index
+            node.const_val = None
+            if values is not None and index.const_val is not None:
+                node.optimize(values)
+            return node
+        if t is ast.FuncCallNode:
+            params = []
+            for param in node.params:
+                params.append((yield self.expression(param, env)))
+            self.forget_globals(env)  # функция могла их поменять
+            if any(new is not old for new, old in zip(params, node.params)):
+                node = node.copy()
+                node.params = params
+            return node
+        if t is ast.ExprListNode:
+            values = []
+            for value in node.value:
+                values.append((yield self.expression(value, env)))
+            if any(new is not old for new, old in zip(values, node.value)):
+                node = node.copy()
+                node.value = values
+            return node
+        if t is ast.CastNode:
+            child = yield self.expression(node.node, env)
+            if child is node.node:
+                return node
+            node = node.copy()
+            node.node = child
+        elif t is ast.MathBinOpNode or t is ast.LogicBinOpNode:
+            arg1 = yield self.expression(node.arg1, env)
+            arg2 = yield self.expression(node.arg2, env)
+            if arg1 is node.arg1 and arg2 is node.arg2:
+                return node
+            node = node.copy()
+            node.arg1 = arg1
+            node.arg2 = arg2
+        else:
+            return node  # литерал, длина (свернута проходом fold)
+        node.const_val = None
+        node.fold()
+        return node
+
+    def target(self, var: ast.ArrayCallNode, env: dict):
+        # элемент, в который пишут: подставляется только индекс
+        index = yield self.expression(var.arr_index, env)
+        if index is not var.arr_index:
+            var = var.copy()
+            var.arr_index = index
+            var.const_val = None
+        return var
+
+    def store(self, var, expr, env: dict):
+        key = var_key(var)
+        if key is None:
+            return
+        if type(var.data_type) is ArrayDataType:
+            if type(expr) is ast.ExprListNode and key not in self.escaped:
+                env[key] = tuple(value.const_val for value in expr.value)
+            else:
+                env.pop(key, None)
+        elif expr.const_val is not None:
+            env[key] = expr.const_val
+        else:
+            env.pop(key, None)
+
+    @staticmethod
+    def elements(arr, env: dict):
+        # известные элементы массива; индексированная переменная без типа массива (ошибка анализа) - None
+        if type(arr.data_type) is not ArrayDataType:
+            return None
+        return env.get(var_key(arr))
+
+    def store_element(self, var: ast.ArrayCallNode, value, env: dict):
+        key = var_key(var.arr)
+        values = self.elements(var.arr, env)
+        if values is None:
+            return
+        index = var.arr_index.const_val
+        if index is None or not 0 <= index - var.arr.data_type.first_index < len(values):
+            del env[key]
+            return
+        index -= var.arr.data_type.first_index
+        env[key] = values[:index] + (value,) + values[index + 1:]
+
+    def forget(self, loop, env: dict):
+        # перед циклом: значения, которые меняются в нем, на входе в очередной шаг неизвестны
+        keys, calls = self.loops[id(loop)]
+        for key in keys:
+            env.pop(key, None)
+        if calls:
+            self.forget_globals(env)
+
+    @staticmethod
+    def forget_globals(env: dict):
+        for key in [key for key in env if key[0] == VarType.GLOBAL.value]:
+            del env[key]
+
+    @staticmethod
+    def merge(env1: dict, env2: dict):
+        if env1 is None:
+            return env2
+        if env2 is None:
+            return env1
+        return {key: value for key, value in env1.items() if key in env2 and env2[key] == value}
+
+
+def propagate_constants(tree):
+    # по каждой функции и основному блоку отдельно: на входе значения переменных неизвестны,
+    # поэтому программа целиком и по кускам (pipeline) дает одно и то же
+    states = tree.body.states if type(tree) is ast.ProgramNode else [tree]
+    for state in states:
+        if type(state) is ast.FuncDefNode:
+            ConstPropagation(state.body).run()
+        elif type(state) is ast.StateListNode:
+            ConstPropagation(state).run()
+
+
+def prune_block(states: list, stops: set) -> bool:
+    # на месте: ветви с известным условием заменяются живой ветвью (или убираются), циклы, которые
+    # не выполняются, убираются, операторы после return - тоже (кроме функций: их методы нужны).
+    # stops - id блоков, из которых управление не выходит дальше (return, бесконечный цикл);
+    # результат - не выходит ли дальше этот блок
+    result = []
+    stop = False
+    for state in states:
+        t = type(state)
+        if stop:
+            if t is ast.FuncDefNode:
+                result.append(state)
+            continue
+        if t is ast.IfNode and state.condition.const_val is not None:
+            state = state.then_body if state.condition.const_val else state.else_body
+            if state is None:
+                continue
+            t = ast.StateListNode
+        elif t is ast.WhileNode and state.condition.const_val is not None:
+            if not state.condition.const_val:
+                continue
+            stop = True  # break нет: из бесконечного цикла выходят только через return
+        elif t is ast.ForNode and state.start_value.const_val is not None and state.end_value.const_val is not None \
+                and state.start_value.const_val > state.end_value.const_val:
+            state = ast.AssignNode(state.var, state.start_value)  # тело не выполняется, переменная задается
+            t = ast.AssignNode
+        result.append(state)
+        if t is ast.ReturnNode or t is ast.StateListNode and id(state) in stops \
+                or t is ast.IfNode and state.else_body is not None \
+                and id(state.then_body) in stops and id(state.else_body) in stops:
+            stop = True
+    states[:] = result
+    return stop
+
+
+def remove_dead_code(tree):
+    # по уже свернутым условиям (fold, propagate); вложенные блоки - раньше внешних
+    stops = set()
+    for node in walk_post_order(tree):
+        if type(node) is ast.StateListNode:
+            block = node
+        elif type(node) is ast.FuncDefNode:
+            block = node.body  # тело функции обходится через ее детей, без самого StateListNode
+        else:
+            continue
+        if prune_block(block.states, stops):
+            stops.add(id(block))
+
+
+def remove_jumps_to_next(code: List[str]) -> List[str]:
+    # goto на метку, которая стоит сразу за ним (между ними только метки)
+    result = []
+    for i, line in enumerate(code):
+        if line.startswith('goto'):
+            target = line.split()[1] + ':'
+            j = i + 1
+            while j < len(code) and code[j].startswith('LABEL') and code[j] != target:
+                j += 1
+            if j < len(code) and code[j] == target:
+                continue
+        result.append(line)
+    return result
+
+
+# проходы по дереву между семантическим анализом и генерацией кода
+AST_PASSES = {
+    'fold': fold_constants,
+    'propagate': propagate_constants,
+    'dead': remove_dead_code,
+}
+
+# проходы по готовому коду
+CODE_PASSES = {
+    'jumps': remove_jumps_to_next,
+}
+
+# share - не отдельный обход: общие узлы выражений (Context.intern) заводятся во время семантического анализа
+PIPELINES = {
+    0: (),
+    1: ('fold', 'propagate', 'dead'),
+    2: ('share', 'fold', 'propagate', 'dead', 'jumps'),
+}
+
+
+class PassStats:
+    __slots__ = ('name', 'seconds', 'nodes', 'instructions')
+    def __init__(self, name: str):
+        self.name = name
+        self.seconds = 0.0
+        self.nodes = None  # только с collect_stats
+        self.instructions = None
+
+    def __str__(self):
+        return '%-10s %9.3f ms %9s nodes %9s instructions' \
+               % (self.name, self.seconds * 1000, '-' if self.nodes is None else self.nodes,
+                  '-' if self.instructions is None else self.instructions)
+
+
+class PassManager:
+    '''
+    Семантический анализ, проходы уровня оптимизации opt_level и генерация кода.
+    -O0: без оптимизаций, -O1: свертка и распространение констант, удаление недостижимого кода,
+    -O2: еще общие узлы для равных выражений и чистка переходов в коде.
+    По каждому проходу копятся время и число строк кода у проходов по коду; число узлов дерева
+    после прохода (обход всего дерева) - только с collect_stats. При компиляции по кускам (pipeline)
+    значения суммируются
+    '''
+    def __init__(self, opt_level: int = 1, collect_stats: bool = False):
+        if opt_level not in PIPELINES:
+            raise ValueError('unknown optimization level %r' % (opt_level,))
+        self.opt_level = opt_level
+        self.passes = PIPELINES[opt_level]
+        self.share = 'share' in self.passes
+        self.collect_stats = collect_stats
+        self.stats = {}
+
+    def timed(self, name: str, tree, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = PassStats(name)
+        stats.seconds += elapsed
+        if self.collect_stats:
+            stats.nodes = (stats.nodes or 0) + count_nodes(tree)
+        return result
+
+    def merge(self, stats: dict):
+        # статистика другого PassManager (функции, скомпилированной в процессе пула)
+        for name, other in stats.items():
+            own = self.stats.get(name)
+            if own is None:
+                own = self.stats[name] = PassStats(name)
+            own.seconds += other.seconds
+            if other.nodes is not None:
+                own.nodes = (own.nodes or 0) + other.nodes
+            if other.instructions is not None:
+                own.instructions = (own.instructions or 0) + other.instructions
+
+    def count_code(self, name: str, code: List[str]):
+        stats = self.stats[name]
+        stats.instructions = (stats.instructions or 0) + len(code)
+
+    def analyse(self, tree, context, *args):
+        # свертка идет и после семантических ошибок, как раньше внутри анализа; результат - Diagnostics
+        diagnostics = self.timed('semantic', tree, tree.semantic_analysis, context, *args)
+        for name in self.passes:
+            if name in AST_PASSES:
+                self.timed(name, tree, AST_PASSES[name], tree)
+        return diagnostics
+
+    def generate(self, tree, code: List[str], generate, *args) -> List[str]:
+        # generate(*args) дописывает код tree в code, проходы по коду правят code на месте
+        self.timed('codegen', tree, generate, *args)
+        self.count_code('codegen', code)
+        self.optimize_code(tree, code)
+        return code
+
+    def optimize_code(self, tree, code: List[str]):
+        for name in self.passes:
+            if name in CODE_PASSES:
+                code[:] = self.timed(name, tree, CODE_PASSES[name], code)
+                self.count_code(name, code)
+
+    def report(self) -> List[str]:
+        return [str(stats) for stats in self.stats.values()]
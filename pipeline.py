@@ -0,0 +1,300 @@
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator
+import mel_ast as ast
+import mel_parser
+from context import Context, GeneralContext
+from diagnostics import Diagnostics
+from passes import PassManager, walk_post_order
+from rd_parser import RDParser, ParseError
+from source_file import SourceFile, LineIndex
+from token_stream import TokenStream
+from vartypes import VarType
+
+
+def header_end(stream: TokenStream) -> int:
+    # конец заголовка program [NAME]
+    if len(stream) == 0 or stream.type(0) != 'PROGBEGIN':
+        return 0
+    return 2 if len(stream) > 1 and stream.type(1) == 'NAME' else 1
+
+
+def top_level_ends(stream: TokenStream, start: int) -> Iterator[int]:
+    '''
+    Концы операторов верхнего уровня, начиная с оператора, который начинается в start:
+    оператор идет до ';' вне блоков (у функции ';' после заголовка пропускается),
+    основной блок - до 'end.'. Деление зависит только от токенов самого оператора
+    '''
+    kinds = stream.kinds
+    type_ids = stream.type_ids
+    func_def, end_line, dot = type_ids['FUNC_DEF'], type_ids['END_LINE'], type_ids['DOT']
+    block_open, block_close = type_ids['BLOCK_OPEN'], type_ids['BLOCK_CLOSE']
+    depth = 0
+    is_func = False
+    body_seen = False
+    prev = None
+    chunk_start = start
+    for i in range(start, len(kinds)):
+        kind = kinds[i]
+        if i == chunk_start:
+            is_func = kind == func_def
+            body_seen = False
+
+        if kind == block_open:
+            depth += 1
+            body_seen = True
+        elif kind == block_close:
+            depth -= 1
+        elif depth == 0 and (kind == end_line and (body_seen or not is_func)
+                             or kind == dot and prev == block_close):
+            yield i + 1
+            chunk_start = i + 1
+        prev = kind
+
+    if chunk_start < len(kinds):
+        yield len(kinds)
+
+
+def iter_top_level(text: str, lexer=None) -> Iterator[TokenStream]:
+    '''
+    Делит программу на куски: заголовок program [NAME], затем операторы верхнего уровня
+    (top_level_ends). Куски - срезы одного потока токенов с общей таблицей строк
+    '''
+    if lexer is None:
+        lexer = mel_parser.get_lexer()
+    stream = TokenStream.from_lexer(lexer, text, mel_parser.tokens)
+    start = header_end(stream)
+    yield stream.sub(0, start)
+    for end in top_level_ends(stream, start):
+        yield stream.sub(start, end)
+        start = end
+
+
+def parse_header(chunk: TokenStream, errors: list) -> ast.ProgramNode:
+    # программа с пустым телом по заголовку; ошибки заголовка - в errors
+    header = RDParser(chunk, errors)
+    try:
+        header.expect('PROGBEGIN')
+        name = header.expect_name() if header.peek() == 'NAME' else None
+    except ParseError as e:
+        header.report(e)
+        name = None
+    return ast.ProgramNode(ast.StateListNode([])) if name is None else ast.ProgramNode(ast.StateListNode([]), name)
+
+
+def references(tree) -> set:
+    # глобальные переменные (и константы, в том числе локальные - их не отличить) и функции,
+    # на которые ссылается дерево после анализа: ('var', имя), ('func', имя)
+    refs = set()
+    for node in walk_post_order(tree):
+        if type(node) is ast.ArrayCallNode:
+            node = node.arr  # массив не среди детей
+        if type(node) is ast.IdentNode and node.var_type in (VarType.GLOBAL, VarType.CONST):
+            refs.add(('var', node.name))
+        elif type(node) is ast.FuncCallNode:
+            refs.add(('func', node.name))
+    return refs
+
+
+def program_context(program: ast.ProgramNode, share: bool, line_index) -> Context:
+    # контекст основного блока, как у StateListNode программы, со своим сборщиком ошибок
+    global_context = GeneralContext(program, None)
+    global_context.prog_name = program.name
+    global_context.is_global = True
+    global_context.node_table.enabled = share
+    global_context.diagnostics = Diagnostics(line_index)
+    return Context(global_context)
+
+
+class FunctionJob:
+    '''
+    Разбор, анализ и генерация одной функции верхнего уровня по токенам ее куска.
+    Функция видит сигнатуры всех функций и первые count глобальных переменных - объявленные до нее.
+    Результат не зависит от других функций: метки у метода свои, ошибки и код возвращаются,
+    а не пишутся в общие списки. Живет в процессе пула (init_worker) или в основном при jobs=1.
+    С track к результату добавляются ссылки функции на глобальные символы (references), иначе None;
+    collect_stats - как у PassManager
+    '''
+    def __init__(self, text: str, program_name: str, variables: list, functions: list, opt_level: int,
+                 track: bool = False, collect_stats: bool = False):
+        self.text = text
+        self.program = ast.ProgramNode(ast.StateListNode([]), program_name)
+        self.variables = variables
+        self.functions = functions
+        self.opt_level = opt_level
+        self.track = track
+        self.collect_stats = collect_stats
+        self.line_index = LineIndex(text)
+        self.context = None
+        self.bound = 0  # сколько глобальных переменных видно в context
+
+    def scope(self, count: int) -> Context:
+        # задачи идут в порядке исходника, поэтому глобальные переменные обычно только добавляются
+        if self.context is None or count < self.bound:
+            self.context = program_context(self.program, PassManager(self.opt_level).share, self.line_index)
+            for func_dis in self.functions:
+                self.context.bind_func(func_dis)
+            self.bound = 0
+        for var_dis in self.variables[self.bound:count]:
+            self.context.bind_var(var_dis)
+        self.bound = count
+        return self.context
+
+    def run(self, task: tuple) -> tuple:
+        kinds, starts, lengths, count = task
+        stream = TokenStream(self.text, mel_parser.tokens)
+        stream.kinds, stream.starts, stream.lengths = kinds, starts, lengths
+        stream.line_index = self.line_index
+        syntax_errors = []
+        states = RDParser(stream, syntax_errors).parse_part()
+
+        manager = PassManager(self.opt_level, self.collect_stats)
+        context = self.scope(count)
+        diagnostics = context.diagnostics
+        diagnostics.errors = []
+        code = []
+        for state in states:
+            diagnostics.statement = state
+            manager.analyse(state, context)
+            # после семантической ошибки в дереве остаются узлы без типа, генерировать их нельзя
+            if len(syntax_errors) == 0 and len(diagnostics.errors) == 0:
+                manager.generate(state, code, self.program.generate_state, state, code, [])
+        refs = references(states) if self.track else None
+        return syntax_errors, diagnostics.errors, code, manager.stats, refs
+
+
+_job = None  # FunctionJob процесса пула
+
+
+def init_worker(*args):
+    global _job
+    _job = FunctionJob(*args)
+
+
+def run_worker(task: tuple) -> tuple:
+    return _job.run(task)
+
+
+class Part:
+    # оператор верхнего уровня (или кусок функции) в порядке исходника: его ошибки и код метода
+    __slots__ = ('states', 'task', 'syntax_errors', 'semantic_errors', 'code')
+    def __init__(self, task: tuple = None):
+        self.states = None
+        self.task = task
+        self.syntax_errors = []
+        self.semantic_errors = []
+        self.code = []
+
+
+def analyse_part(part: Part, program: ast.ProgramNode, context: Context, manager: PassManager,
+                 clinit: list, generate: bool):
+    # операторы вне функций: анализ в общем контексте программы, код - в part.code и clinit
+    diagnostics = context.diagnostics
+    mark = len(diagnostics.errors)
+    for state in part.states:
+        diagnostics.statement = state  # как в StateListNode.semantic_steps
+        manager.analyse(state, context)
+        # после синтаксической или семантической ошибки анализ продолжается, но код уже не нужен
+        if generate and len(diagnostics.errors) == 0:
+            manager.generate(state, part.code, program.generate_state, state, part.code, clinit)
+    part.semantic_errors = diagnostics.errors[mark:]
+    part.states = None
+
+
+def function_results(job_args: tuple, tasks: list, jobs: int = 1) -> Iterator[tuple]:
+    # результаты FunctionJob(*job_args).run по задачам в их порядке: в пуле из jobs процессов или по очереди
+    if jobs > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(jobs, initializer=init_worker, initargs=job_args) as pool:
+            yield from pool.map(run_worker, tasks, chunksize=max(1, len(tasks) // (jobs * 4)))
+    else:
+        yield from map(FunctionJob(*job_args).run, tasks)
+
+
+def code_generate_pipeline(file_path, lexer=None, manager: PassManager = None, jobs: int = 1) -> list:
+    '''
+    Компиляция по одной функции в две фазы. Первая: программа делится на куски (iter_top_level),
+    у функций разбирается только заголовок и сигнатура сразу объявляется - вызов может стоять раньше
+    определения; остальные операторы (глобальные переменные, основной блок) разбираются целиком.
+    Вторая: эти операторы анализируются и генерируются здесь, а каждая функция независимо
+    в FunctionJob - в пуле из jobs процессов или по очереди при jobs=1. Между фазами в памяти
+    сигнатуры, глобальные операторы и токены кусков функций (не деревья): тело функции разбирается
+    во второй фазе, дерево отпускается после генерации.
+    Куски методов собираются в порядке исходника, поэтому .j и ошибки те же, что
+    у mel_parser.code_generate при любом jobs; проходы - из manager (по умолчанию -O1),
+    статистика по кускам суммируется
+    '''
+    if manager is None:
+        manager = PassManager()
+    source = SourceFile(file_path)
+    text = source.text
+    errors = []
+    chunks = iter_top_level(text, lexer)
+
+    header = next(chunks)
+    line_index = header.line_index
+    program = parse_header(header, errors)
+    context = program_context(program, manager.share, line_index)
+
+    # первая фаза
+    parts = []
+    for chunk in chunks:
+        if chunk.type(0) == 'FUNC_DEF':
+            try:
+                # ошибки заголовка сообщит разбор всего куска во второй фазе
+                RDParser(chunk, []).func_header().declare(context)
+            except ParseError:
+                pass
+            parts.append(Part(task=(chunk.kinds, chunk.starts, chunk.lengths)))
+        else:
+            part = Part()
+            part.states = RDParser(chunk, part.syntax_errors).parse_part()
+            parts.append(part)
+    generate = len(errors) == 0 and all(len(part.syntax_errors) == 0 for part in parts)
+
+    # вторая фаза: операторы вне функций; функция видит глобальные переменные, объявленные до нее
+    clinit = program.generate_clinit_header()
+    for part in parts:
+        if part.task is not None:
+            part.task += (len(context.variables),)
+        else:
+            analyse_part(part, program, context, manager, clinit, generate)
+
+    tasks = [part.task for part in parts if part.task is not None]
+    job_args = (text, program.name, list(context.variables.values()), list(context.functions.values()),
+                manager.opt_level, False, manager.collect_stats)
+    with tempfile.TemporaryFile('w+t', encoding='utf-8') as spool:
+        results = function_results(job_args, tasks, jobs)
+        try:
+            for part in parts:
+                if part.task is not None:
+                    part.syntax_errors, part.semantic_errors, part.code, stats, _ = next(results)
+                    for error in part.semantic_errors:
+                        error.line_index = line_index
+                    manager.merge(stats)
+                mel_parser.write_code(spool, part.code)
+                part.code = None
+        finally:
+            results.close()  # пул закрывается и при ошибке
+
+        for part in parts:
+            errors.extend(part.syntax_errors)
+        for part in parts:
+            errors.extend(part.semantic_errors)
+        for error in errors:
+            print(error)
+        if len(errors) != 0:
+            # как и при синтаксических ошибках, .j не пишется: код функций с ошибками не сгенерирован
+            return errors
+
+        with open(file_path + '.j', "tw", encoding='utf-8') as file:
+            code = []
+            program.generate_header(code)
+            mel_parser.write_code(file, code)
+            spool.seek(0)
+            shutil.copyfileobj(spool, file)
+            clinit = program.generate_clinit_footer(clinit)
+            manager.optimize_code(program, clinit)
+            mel_parser.write_code(file, clinit)
+
+    return errors
@@ -0,0 +1,436 @@
+import mel_ast as ast
+from token_stream import TokenStream
+from diagnostics import SyntaxErrorInfo
+
+
+# приоритеты бинарных операций, как в precedence из mel_parser (все левоассоциативные)
+BINARY_PRECEDENCE = {
+    'OR': 1,
+    'AND': 2,
+    'EQUALS': 3, 'MORE': 3, 'LESS': 3,
+    'PLUS': 4, 'MINUS': 4,
+    'MULTIPLY': 5, 'DIVIDE': 5,
+}
+LOGIC_OPERATIONS = {'EQUALS', 'MORE', 'LESS', 'AND', 'OR'}
+VAR_TYPES = {'FLOAT_TYPE', 'INT_TYPE', 'STRING_TYPE', 'BOOL_TYPE'}
+EXPRESSION_START = {'NAME', 'INT', 'FLOAT', 'BOOL', 'STRING'}
+
+
+class ParseError(Exception):
+    def __init__(self, pos: int, value):
+        super().__init__(value)
+        self.pos = pos
+        self.value = value
+
+
+class RDParser:
+    '''
+    Рекурсивный спуск по операторам и подъем по приоритетам для выражений.
+    Строит те же узлы mel_ast, что и yacc-парсер из mel_parser, читая TokenStream напрямую
+    '''
+    def __init__(self, stream: TokenStream, errors: list = None):
+        self.stream = stream
+        self.errors = errors
+        self.text = stream.text
+        self.starts = stream.starts
+        self.lengths = stream.lengths
+        self.count = len(stream.kinds)
+        # типы токенов по позициям, два None в конце вместо проверок на выход за границу
+        self.tokens = list(map(stream.token_types.__getitem__, stream.kinds)) + [None, None]
+        self.pos = 0
+
+    def parse(self):
+        try:
+            return self.start()
+        except ParseError as e:
+            self.report(e)
+            return None
+
+    def parse_part(self) -> list:
+        '''
+        Разбор куска программы для pipeline: операторы верхнего уровня
+        или основной блок с завершающей точкой
+        '''
+        try:
+            if self.peek() == 'BLOCK_OPEN':
+                states = [self.state_block()]
+                self.expect('DOT')
+            else:
+                states = self.state_seq()
+            if self.pos != self.count:
+                self.error()
+            return states
+        except ParseError as e:
+            self.report(e)
+            return []
+
+    def report(self, e: ParseError):
+        if self.errors is None:
+            if e.value is not None:
+                print("Syntax error ", e.value)
+            else:
+                print("Syntax error")
+            return
+        offset = self.starts[e.pos] if e.pos < self.count else len(self.text)
+        self.errors.append(SyntaxErrorInfo(*self.stream.line_index.line_col(offset), e.value))
+
+    def synchronize(self):
+        # panic mode: пропуск до ';' включительно или до end / конца программы
+        tokens = self.tokens
+        while True:
+            token_type = tokens[self.pos]
+            if token_type == 'END_LINE':
+                self.pos += 1
+                return
+            if token_type in ('BLOCK_CLOSE', 'DOT', None):
+                return
+            self.pos += 1
+
+    # работа с токенами
+
+    def peek(self, offset: int = 0) -> str:
+        return self.tokens[self.pos + offset]
+
+    def error(self):
+        if self.pos < self.count:
+            raise ParseError(self.pos, self.stream.value(self.pos))
+        raise ParseError(self.pos, None)
+
+    def expect(self, token_type: str):
+        if self.tokens[self.pos] != token_type:
+            self.error()
+        self.pos += 1
+
+    def expect_value(self, token_type: str):
+        if self.tokens[self.pos] != token_type:
+            self.error()
+        self.pos += 1
+        return self.stream.value(self.pos - 1)
+
+    def expect_name(self) -> str:
+        pos = self.pos
+        if self.tokens[pos] != 'NAME':
+            self.error()
+        self.pos = pos + 1
+        start = self.starts[pos]
+        return self.text[start:start + self.lengths[pos]]
+
+    def at(self, node, pos: int):
+        # позиция оператора для семантических ошибок - смещение токена pos, как p.lexpos у yacc
+        node.pos = self.starts[pos]
+        return node
+
+    def accept(self, token_type: str) -> bool:
+        if self.tokens[self.pos] == token_type:
+            self.pos += 1
+            return True
+        return False
+
+    # программа и списки операторов
+
+    def start(self):
+        self.expect('PROGBEGIN')
+        name = None
+        if self.peek() == 'NAME':
+            name = self.expect_name()
+        states = self.state_list()
+        self.expect('DOT')
+        if self.pos != self.count:
+            self.error()
+
+        if name is None:
+            return ast.ProgramNode(ast.StateListNode(states))
+        return ast.ProgramNode(ast.StateListNode(states), name)
+
+    def state_list(self):
+        if self.peek() == 'BLOCK_OPEN':
+            return [self.state_block()]
+
+        states = self.state_seq()
+        if self.peek() == 'BLOCK_OPEN':
+            states.append(self.state_block())
+        return states
+
+    def state_seq(self):
+        states = []
+        while True:
+            try:
+                state = self.state()
+                self.expect('END_LINE')
+                states.append(state)
+            except ParseError as e:
+                # испорченный оператор пропускается, разбор идет дальше
+                self.report(e)
+                self.synchronize()
+            token_type = self.peek()
+            if token_type in ('BLOCK_OPEN', 'BLOCK_CLOSE', 'DOT', None):
+                return states
+
+    def state_block(self):
+        self.expect('BLOCK_OPEN')
+        states = self.state_seq()
+        if self.peek() == 'BLOCK_OPEN':
+            states.append(self.state_block())
+        self.expect('BLOCK_CLOSE')
+        return ast.StateListNode(states)
+
+    def state_body(self):
+        if self.accept('BLOCK_OPEN'):
+            states = self.state_list()
+            self.expect('BLOCK_CLOSE')
+            return states
+        return [self.state()]
+
+    # операторы
+
+    def state(self):
+        token_type = self.peek()
+        if token_type == 'NAME':
+            return self.state_name()
+        if token_type == 'IF':
+            return self.state_if()
+        if token_type == 'FOR':
+            return self.state_for()
+        if token_type == 'WHILE':
+            return self.state_while()
+        if token_type == 'FUNC_DEF':
+            return self.state_func_def()
+        if token_type == 'RETURN':
+            pos = self.pos
+            self.pos += 1
+            if self.peek() in EXPRESSION_START:
+                return self.at(ast.ReturnNode(self.expression()), pos)
+            return self.at(ast.ReturnNode(ast.IntNode(0)), pos)
+        if token_type == 'VAR_DEF':
+            return self.state_var_def()
+        if token_type == 'CONST_DEF':
+            pos = self.pos
+            self.pos += 1
+            name = self.expect_name()
+            self.expect('EQUALS')
+            return self.at(ast.ConstDefNode(name, self.expression()), pos)
+        if token_type == 'WRITELN':
+            pos = self.pos
+            self.pos += 1
+            self.expect('OPEN_ROUND_BKT')
+            expr = self.expression()
+            self.expect('CLOSE_ROUND_BKT')
+            return self.at(ast.WritelnNode(expr), pos)
+        if token_type == 'READLN':
+            pos = self.pos
+            self.pos += 1
+            self.expect('OPEN_ROUND_BKT')
+            name = self.expect_name()
+            self.expect('CLOSE_ROUND_BKT')
+            return self.at(ast.ReadlnNode(ast.IdentNode(name)), pos)
+        if token_type in EXPRESSION_START:
+            return self.expression()
+        self.error()
+
+    def state_name(self):
+        # присваивание переменной или элементу массива, иначе выражение
+        next_type = self.peek(1)
+        if next_type == 'ASSIGNMENT':
+            var = ast.IdentNode(self.expect_name())
+            pos = self.pos
+            self.pos += 1
+            if self.accept('OPEN_ROUND_BKT'):
+                values = self.expr_list()
+                self.expect('CLOSE_ROUND_BKT')
+                return self.at(ast.AssignNode(var, ast.ExprListNode(values)), pos)
+            return self.at(ast.AssignNode(var, self.expression()), pos)
+
+        if next_type == 'OPEN_SQUARE_BKT':
+            array_call = self.array_call()
+            pos = self.pos
+            if self.accept('ASSIGNMENT'):
+                return self.at(ast.AssignNode(array_call, self.expression()), pos)
+            return self.expression(1, array_call)
+
+        return self.expression()
+
+    def state_if(self):
+        pos = self.pos
+        self.pos += 1
+        condition = self.expression()
+        self.expect('THEN')
+        then_body = self.state_body()
+        if self.accept('ELSE'):
+            return self.at(ast.IfNode(condition, ast.StateListNode(then_body), ast.StateListNode(self.state_body())), pos)
+        return self.at(ast.IfNode(condition, ast.StateListNode(then_body)), pos)
+
+    def state_for(self):
+        pos = self.pos
+        self.pos += 1
+        var = ast.IdentNode(self.expect_name())
+        self.expect('ASSIGNMENT')
+        start_value = self.expression()
+        self.expect('TO')
+        end_value = self.expression()
+        self.expect('DO')
+        return self.at(ast.ForNode(var, start_value, end_value, ast.StateListNode(self.state_body())), pos)
+
+    def state_while(self):
+        pos = self.pos
+        self.pos += 1
+        condition = self.expression()
+        self.expect('DO')
+        return self.at(ast.WhileNode(condition, ast.StateListNode(self.state_body())), pos)
+
+    def state_func_def(self):
+        func = self.func_header()
+        self.expect('BLOCK_OPEN')
+        func.body.states = self.state_list()
+        self.expect('BLOCK_CLOSE')
+        return func
+
+    def func_header(self):
+        # заголовок функции до begin, тело пустое: по заголовкам pipeline собирает сигнатуры
+        pos = self.pos
+        self.pos += 1
+        name = self.expect_name()
+        self.expect('OPEN_ROUND_BKT')
+        arguments = self.argument_list()
+        self.expect('CLOSE_ROUND_BKT')
+        self.expect('COLON')
+
+        if self.peek() == 'ARRAY':
+            first_idx, last_idx, data_type = self.array_type()
+            return_type = (data_type, first_idx, last_idx)
+        elif self.peek() == 'NONE_TYPE':
+            return_type = (self.expect_value('NONE_TYPE'), )
+        else:
+            return_type = (self.var_type(), )
+
+        self.expect('END_LINE')
+        return self.at(ast.FuncDefNode(name, arguments, return_type, ast.StateListNode([])), pos)
+
+    def argument_list(self):
+        if self.peek() != 'NAME':
+            return None
+
+        arguments = [self.argument()]
+        while self.accept('COMMA'):
+            arguments.append(self.argument())
+        return arguments
+
+    def argument(self):
+        name = self.expect_name()
+        self.expect('COLON')
+        if self.peek() == 'ARRAY':
+            first_idx, last_idx, data_type = self.array_type()
+            return ast.ParamArray(name, data_type, first_idx, last_idx)
+        return ast.Param(name, self.var_type())
+
+    def state_var_def(self):
+        pos = self.pos
+        self.pos += 1
+        name = self.expect_name()
+        self.expect('COLON')
+
+        if self.peek() == 'ARRAY':
+            first_idx, last_idx, data_type = self.array_type(True)
+            array_def = self.at(ast.ArrayDefNode(name, first_idx, last_idx, data_type), pos)
+            assign_pos = self.pos
+            if not self.accept('ASSIGNMENT'):
+                return array_def
+            self.expect('OPEN_ROUND_BKT')
+            values = self.expr_list()
+            self.expect('CLOSE_ROUND_BKT')
+            return self.at(ast.AssignNode(array_def, ast.ExprListNode(values)), assign_pos)
+
+        var_def = self.at(ast.VarDefNode(name, self.var_type()), pos)
+        assign_pos = self.pos
+        if self.accept('ASSIGNMENT'):
+            return self.at(ast.AssignNode(var_def, self.expression()), assign_pos)
+        return var_def
+
+    def array_type(self, const_bounds: bool = False):
+        # const_bounds - границы могут быть именами констант (у переменных, не в сигнатурах функций)
+        self.expect('ARRAY')
+        self.expect('OPEN_SQUARE_BKT')
+        first_idx = self.array_bound(const_bounds)
+        self.expect('DOT')
+        self.expect('DOT')
+        last_idx = self.array_bound(const_bounds)
+        self.expect('CLOSE_SQUARE_BKT')
+        self.expect('OF')
+        return first_idx, last_idx, self.var_type()
+
+    def array_bound(self, const_bounds: bool):
+        if const_bounds and self.peek() == 'NAME':
+            return self.expect_name()
+        return self.expect_value('INT')
+
+    def var_type(self):
+        if self.tokens[self.pos] not in VAR_TYPES:
+            self.error()
+        self.pos += 1
+        return self.stream.text_of(self.pos - 1)
+
+    # выражения
+
+    def expr_list(self):
+        if self.peek() not in EXPRESSION_START:
+            return None
+
+        values = [self.expression()]
+        while self.accept('COMMA'):
+            values.append(self.expression())
+        return values
+
+    def expression(self, min_precedence: int = 1, left=None):
+        if left is None:
+            left = self.primary()
+
+        tokens = self.tokens
+        while True:
+            token_type = tokens[self.pos]
+            precedence = BINARY_PRECEDENCE.get(token_type)
+            if precedence is None or precedence < min_precedence:
+                break
+
+            op = self.stream.text_of(self.pos)
+            self.pos += 1
+            right = self.expression(precedence + 1)
+            if token_type in LOGIC_OPERATIONS:
+                left = ast.LogicBinOpNode(op, left, right)
+            else:
+                left = ast.MathBinOpNode(op, left, right)
+        return left
+
+    def primary(self):
+        token_type = self.peek()
+        if token_type == 'NAME':
+            next_type = self.peek(1)
+            if next_type == 'OPEN_SQUARE_BKT':
+                return self.array_call()
+            pos = self.pos
+            name = self.expect_name()
+            if next_type == 'OPEN_ROUND_BKT':
+                self.pos += 1
+                params = self.expr_list()
+                self.expect('CLOSE_ROUND_BKT')
+                return self.at(ast.FuncCallNode(name, params), pos)
+            if next_type == 'DOT':
+                self.pos += 1
+                self.expect('LENGTH')
+                return ast.LengthNode(ast.IdentNode(name))
+            return ast.IdentNode(name)
+
+        if token_type == 'INT':
+            return ast.IntNode(self.expect_value('INT'))
+        if token_type == 'FLOAT':
+            return ast.FloatNode(self.expect_value('FLOAT'))
+        if token_type == 'BOOL':
+            return ast.BoolNode(self.expect_value('BOOL'))
+        if token_type == 'STRING':
+            return ast.StringNode(self.expect_value('STRING'))
+        self.error()
+
+    def array_call(self):
+        name = self.expect_name()
+        self.expect('OPEN_SQUARE_BKT')
+        index = self.expression()
+        self.expect('CLOSE_SQUARE_BKT')
+        return ast.ArrayCallNode(ast.IdentNode(name), index)
@@ -0,0 +1,130 @@
+import mmap
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Tuple
+
+
+class GapOffsets:
+    '''
+    Возрастающие смещения в тексте, который правят: до gap - от начала текста, с gap - от конца.
+    Правка сдвигает все смещения за собой, но смещения от конца у них остаются прежними,
+    поэтому хвост не переписывается: переводятся только значения между старым и новым местом gap,
+    работа пропорциональна правке и расстоянию от прошлой правки, а не длине текста
+    '''
+    __slots__ = ('values', 'gap', 'length')
+    def __init__(self, values: array, length: int):
+        self.values = values
+        self.gap = len(values)
+        self.length = length  # длина текста
+
+    def __len__(self):
+        return len(self.values)
+
+    def __getitem__(self, i: int) -> int:
+        value = self.values[i]
+        return value if i < self.gap else value + self.length
+
+    def move_gap(self, i: int):
+        values, gap = self.values, self.gap
+        if i < gap:
+            values[i:gap] = array('i', map((-self.length).__add__, values[i:gap]))
+        elif i > gap:
+            values[gap:i] = array('i', map(self.length.__add__, values[gap:i]))
+        self.gap = i
+
+    def absolute(self) -> array:
+        # все смещения от начала: gap уходит в конец (до следующей правки)
+        self.move_gap(len(self.values))
+        return self.values
+
+    def slice(self, first: int, stop: int) -> array:
+        values, gap = self.values, self.gap
+        if stop <= gap:
+            return values[first:stop]
+        tail = array('i', map(self.length.__add__, values[max(first, gap):stop]))
+        return values[first:gap] + tail if first < gap else tail
+
+    def bisect_left(self, offset: int) -> int:
+        values, gap = self.values, self.gap
+        if gap < len(values) and offset > values[gap] + self.length:
+            return bisect_left(values, offset - self.length, gap)
+        return bisect_left(values, offset, 0, gap)
+
+    def bisect_right(self, offset: int) -> int:
+        values, gap = self.values, self.gap
+        if gap < len(values) and offset >= values[gap] + self.length:
+            return bisect_right(values, offset - self.length, gap)
+        return bisect_right(values, offset, 0, gap)
+
+    def replace(self, first: int, stop: int, new_values: array, length: int):
+        # значения [first:stop] заменяются new_values (смещения в новом тексте длины length)
+        self.move_gap(stop)
+        self.values[first:stop] = new_values
+        self.gap = first + len(new_values)
+        self.length = length
+
+
+class LineIndex:
+    '''
+    Таблица смещений начала строк, строится при первом обращении.
+    Лексер строки не считает, номер строки и столбца ищется бинарным поиском
+    только когда он нужен (ошибки, отладочный вывод). После правки (relex) таблица
+    не строится заново: меняются только строки в правке (GapOffsets)
+    '''
+    def __init__(self, text: str):
+        self.text = text
+        self.line_starts = None
+
+    def build(self):
+        text = self.text
+        line_starts = array('i', [0])
+        find = text.find
+        pos = find('\n')
+        while pos >= 0:
+            line_starts.append(pos + 1)
+            pos = find('\n', pos + 1)
+        self.line_starts = GapOffsets(line_starts, len(text))
+
+    def relex(self, text: str, edit_start: int, old_end: int, new_end: int):
+        # text[edit_start:new_end] заменил старый фрагмент [edit_start:old_end]
+        self.text = text
+        if self.line_starts is None:
+            return
+        line_starts = self.line_starts
+        new_starts = array('i')
+        find = text.find
+        pos = find('\n', edit_start, new_end)
+        while pos >= 0:
+            new_starts.append(pos + 1)
+            pos = find('\n', pos + 1, new_end)
+        # начала строк за переводами строк из старого фрагмента
+        line_starts.replace(line_starts.bisect_right(edit_start), line_starts.bisect_right(old_end),
+                            new_starts, len(text))
+
+    def line_col(self, offset: int) -> Tuple[int, int]:
+        if self.line_starts is None:
+            self.build()
+        line = self.line_starts.bisect_right(offset)
+        return line, offset - self.line_starts[line - 1] + 1
+
+    def line(self, offset: int) -> int:
+        return self.line_col(offset)[0]
+
+
+class SourceFile:
+    '''
+    Исходник, отображенный в память. Лексер PLY работает только со str,
+    поэтому отображение декодируется один раз, без промежуточного буфера read()
+    '''
+    def __init__(self, path: str, encoding: str = 'utf-8'):
+        self.path = path
+        with open(path, 'rb') as file:
+            try:
+                with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self.text = str(data, encoding)
+            except ValueError:  # пустой файл нельзя отобразить
+                self.text = ''
+        self.line_index = LineIndex(self.text)
+
+    def line_col(self, offset: int) -> Tuple[int, int]:
+        return self.line_index.line_col(offset)
@@ -1,6 +1,14 @@
+import io
+import os
+import time
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
 from typing import List
 import mel_ast as ast
 import vartypes as vt
+from passes import fold_constants, PassManager
 
 
 tests = {
@@ -195,6 +203,25 @@ tests = {
     end.
     ''',
 
+    'test_func_3':
+    '''
+    program
+
+    function is_even(n: integer): boolean;
+    begin
+        if n = 0 then return true;
+        return is_odd(n - 1);
+    end;
+    function is_odd(n: integer): boolean;
+    begin
+        if n = 0 then return false;
+        return is_even(n - 1);
+    end;
+    begin
+        writeln(is_even(4));
+    end.
+    ''',
+
     'test_array_1':
     '''
     program
@@ -239,6 +266,55 @@ tests = {
             var c: array [1..2] of integer := (3, 4);
             print_array(c);
         end.
+    ''',
+
+    'test_lexer_1':
+    '''program
+    begin
+	var done: integer;
+	var order: integer;
+	done := 1;
+	order := done;
+    end.
+    ''',
+
+    'test_comment_1':
+    '''program
+    (* глобальные "переменные"
+       *)
+    var a: string := "(* not a comment *)";
+    begin
+        (* a := "x"; *)
+        writeln(a);
+    end.
+    ''',
+
+    'test_scope_1':
+    '''program
+    begin
+        var a: integer;
+        a := 1;
+        if a > 0 then
+        begin
+            var a: real;
+            a := 2.5;
+        end;
+        a := 3;
+    end.
+    ''',
+
+    'test_const_1':
+    '''program
+    const N = 3;
+    const STEP = N / 2 + 0.5;
+    var a: array [1..N] of integer;
+    begin
+        const M = N * 2;
+        var i: integer;
+        for i := 1 to N do
+            a[i] := i * M;
+        writeln(STEP);
+    end.
     '''
 
 }
@@ -256,8 +332,9 @@ def sem_check_test_writeln_1(p: ast.ProgramNode)->List[int]:
 
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
+    fold_constants(p)  # приведение константы сворачивает проход fold
 
     state_list = p.body[1]
     if type(state_list[1].expr) is not ast.CastNode:
@@ -288,7 +365,7 @@ def sem_check_test_for_1(p: ast.ProgramNode)->List[int]:
 
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
 
     state_list = p.body[0]
@@ -329,7 +406,7 @@ def sem_check_test_for_2(p: ast.ProgramNode)->List[int]:
     end.'''
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
 
     return result if len(result) != 0 else None
@@ -345,14 +422,14 @@ def sem_check_test_while_1(p: ast.ProgramNode)->List[int]:
 
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
 def sem_check_test_while_2(p: ast.ProgramNode)->List[int]:
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
@@ -369,42 +446,42 @@ def sem_check_test_if_1(p: ast.ProgramNode)->List[int]:
     end.'''
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
 def sem_check_test_if_2(p: ast.ProgramNode)->List[int]:
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
 def sem_check_test_if_else_1(p: ast.ProgramNode)->List[int]:
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
 def sem_check_test_if_else_2(p: ast.ProgramNode)->List[int]:
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
 def sem_check_test_if_else_3(p: ast.ProgramNode)->List[int]:
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
 def sem_check_test_if_else_4(p: ast.ProgramNode)->List[int]:
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
@@ -427,7 +504,7 @@ def sem_check_test_func_1(p: ast.ProgramNode)->List[int]:
 
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
@@ -443,8 +520,35 @@ def sem_check_test_func_2(p: ast.ProgramNode)->List[int]:
     end.'''
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
+        result.append(1)
+    return result if len(result) != 0 else None
+
+def sem_check_test_func_3(p: ast.ProgramNode)->List[int]:
+    '''program
+
+    function is_even(n: integer): boolean;
+    begin
+        if n = 0 then return true;
+        return is_odd(n - 1);
+    end;
+    function is_odd(n: integer): boolean;
+    begin
+        if n = 0 then return false;
+        return is_even(n - 1);
+    end;
+    begin
+        writeln(is_even(4));
+    end.'''
+    result = []
+    message = p.semantic_analysis(None)
+    if message.errors:
         result.append(1)
+
+    # вызов функции, объявленной ниже: сигнатуры собираются до анализа тел
+    forward_call = p.body[0].body[1].expr
+    if type(forward_call) is not ast.FuncCallNode or forward_call.data_type != vt.DataTypeEnum.bool:
+        result.append(2)
     return result if len(result) != 0 else None
 
 def sem_check_test_array_1(p: ast.ProgramNode)->List[int]:
@@ -457,7 +561,7 @@ def sem_check_test_array_1(p: ast.ProgramNode)->List[int]:
     '''
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
@@ -469,7 +573,7 @@ def sem_check_test_array_2(p: ast.ProgramNode)->List[int]:
     end.'''
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
@@ -483,7 +587,7 @@ def sem_check_test_array_3(p: ast.ProgramNode)->List[int]:
     end.'''
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
     return result if len(result) != 0 else None
 
@@ -502,7 +606,7 @@ def sem_check_test_func_array_1(p: ast.ProgramNode)->List[int]:
     end.'''
     result = []
     message = p.semantic_analysis(None)
-    if 'error' in message:
+    if message.errors:
         result.append(1)
 
     func_body = p.body[1].body
@@ -529,6 +633,133 @@ def sem_check_test_func_array_1(p: ast.ProgramNode)->List[int]:
 
     return result if len(result) != 0 else None
 
+def sem_check_test_lexer_1(p: ast.ProgramNode)->List[int]:
+    '''program
+    begin
+        var done: integer;
+        var order: integer;
+        done := 1;
+        order := done;
+    end.'''
+    result = []
+    message = p.semantic_analysis(None)
+    if message.errors:
+        result.append(1)
+
+    state_list = p.body[0]
+    if state_list[0].name != 'done':
+        result.append(2)
+    if state_list[1].name != 'order':
+        result.append(3)
+    if state_list[3].var.name != 'order' or state_list[3].expr.name != 'done':
+        result.append(4)
+
+    return result if len(result) != 0 else None
+
+def sem_check_test_comment_1(p: ast.ProgramNode)->List[int]:
+    '''program
+    (* глобальные "переменные"
+       *)
+    var a: string := "(* not a comment *)";
+    begin
+        (* a := "x"; *)
+        writeln(a);
+    end.'''
+    result = []
+    message = p.semantic_analysis(None)
+    if message.errors:
+        result.append(1)
+
+    if len(p.body.states) != 2:
+        result.append(2)
+    if p.body[0].expr.value != '"(* not a comment *)"':
+        result.append(3)
+    if len(p.body[1].states) != 1 or type(p.body[1][0]) is not ast.WritelnNode:
+        result.append(4)
+
+    return result if len(result) != 0 else None
+
+def sem_check_test_scope_1(p: ast.ProgramNode)->List[int]:
+    '''program
+    begin
+        var a: integer;
+        a := 1;
+        if a > 0 then
+        begin
+            var a: real;
+            a := 2.5;
+        end;
+        a := 3;
+    end.'''
+    result = []
+    message = p.semantic_analysis(None)
+    if message.errors:
+        result.append(1)
+
+    main = p.body[0]
+    outer, inner = main[1].var, main[2].then_body[1].var
+    if inner.data_type != vt.DataTypeEnum.float or inner.index == outer.index:
+        result.append(2)  # объявление во вложенном блоке перекрывает внешнее
+    after = main[3].var
+    if after.data_type != vt.DataTypeEnum.int or after.index != outer.index:
+        result.append(3)  # после блока снова видна внешняя переменная
+
+    return result if len(result) != 0 else None
+
+
+def sem_check_test_const_1(p: ast.ProgramNode)->List[int]:
+    '''program
+    const N = 3;
+    const STEP = N / 2 + 0.5;
+    var a: array [1..N] of integer;
+    begin
+        const M = N * 2;
+        var i: integer;
+        for i := 1 to N do
+            a[i] := i * M;
+        writeln(STEP);
+    end.'''
+    result = []
+    message = p.semantic_analysis(None)
+    if message.errors:
+        result.append(1)
+
+    if p.body[1].expr.const_val != 1.5 or p.body[1].data_type != vt.DataTypeEnum.float:
+        result.append(2)  # значение считается при анализе, деление целых - целое
+    if p.body[2].data_type.last_index != 3:
+        result.append(3)  # граница массива - константа
+    if [var.name for var in p.var_list] != ['a', 'i']:
+        result.append(4)  # у констант нет полей класса
+    loop = p.body[3][2]
+    if loop.end_value.var_type != vt.VarType.CONST or loop.end_value.const_val != 3:
+        result.append(5)
+    if loop.loop_body[0].expr.arg2.const_val != 6:
+        result.append(6)
+
+    return result if len(result) != 0 else None
+
+
+def same_tree(a, b) -> bool:
+    if type(a) != type(b):
+        return False
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(same_tree(x, y) for x, y in zip(a, b))
+    if isinstance(a, (ast.AstNode, ast.Param)):
+        return all(same_tree(getattr(a, k, None), getattr(b, k, None)) for k in ast.slot_names(type(a)))
+    return a == b
+
+
+class StackDepthProbe:
+    # обертка над лексером, запоминает максимальную глубину стека состояний yacc
+    def __init__(self, lexer, parser):
+        self.lexer = lexer
+        self.parser = parser
+        self.max_depth = 0
+
+    def token(self):
+        self.max_depth = max(self.max_depth, len(self.parser.statestack))
+        return self.lexer.token()
+
 
 class ProgTester:
     def __init__(self):
@@ -546,7 +777,7 @@ class ProgTester:
                     l = self.func_dict[key](p)
                     if l is not None:
                         errors_log.append("semantic error in test " + key + ' in tests: ' + str(l))
-                except all:
+                except Exception:
                     errors_log.append("semantic except error in test " + key)
 
         if len(errors_log) == 0:
@@ -554,6 +785,704 @@ class ProgTester:
         else:
             return errors_log
 
+    def run_relex_test(self, tokenize, lexer):
+        # текст до и после правки; результат relex сверяется с полным перелексированием
+        edits = [
+            ('var a: integer;', 'var ab: integer;'),
+            ('a := 1.;', 'a := 1.5;'),
+            ('a : 1;', 'a := 1;'),
+            ('do ne;', 'done;'),
+            ('(* a *) b *) c;', '(* a b *) c;'),
+            ('writeln("a");', 'writeln("a\\"");'),
+        ]
+        errors_log = []
+        for old_text, new_text in edits:
+            start = 0
+            while start < min(len(old_text), len(new_text)) and old_text[start] == new_text[start]:
+                start += 1
+            tail = 0
+            while tail < min(len(old_text), len(new_text)) - start and old_text[-1 - tail] == new_text[-1 - tail]:
+                tail += 1
+
+            prefix = 'program begin var x: integer; '
+            suffix = ' x := 2; writeln(x); end.'
+            stream = tokenize(prefix + old_text + suffix)
+            stream.relex(lexer, prefix + new_text + suffix, len(prefix) + start,
+                         len(prefix) + len(old_text) - tail, len(prefix) + len(new_text) - tail)
+            expected = tokenize(prefix + new_text + suffix)
+            if (stream.kinds, stream.starts, stream.lengths) != (expected.kinds, expected.starts, expected.lengths):
+                errors_log.append('relex error: %r -> %r' % (old_text, new_text))
+
+        # цепочка правок в разных местах (хвост не переводится между правками) и номера строк после них
+        text = 'program begin var x: integer;\n' + 'x := x + 1;\n' * 20 + 'end.'
+        stream = tokenize(text)
+        stream.line_index.line_col(0)
+        for pos, removed, inserted in ((200, 0, 'x := 2;\n'), (40, 3, ''), (250, 12, '\n\nx := 3;'), (31, 0, '\n'),
+                                       (len(text) - 20, 0, 'writeln(x);')):
+            new_text = text[:pos] + inserted + text[pos + removed:]
+            stream.relex(lexer, new_text, pos, pos + removed, pos + len(inserted))
+            text = new_text
+            expected = tokenize(text)
+            if [stream.start(i) for i in range(len(expected))] != list(expected.starts) \
+                    or any(stream.line_index.line_col(i) != expected.line_index.line_col(i) for i in range(len(text))):
+                errors_log.append('relex error: edit at %s' % pos)
+                break
+
+        # правка у начала стоит одинаково в маленьком и в большом файле
+        timings = []
+        for n in (5000, 50000):
+            text = 'program begin var a: integer;\n' + 'a := a + 1;\n' * n + 'end.'
+            stream = tokenize(text)
+            stream.line_index.line_col(len(text))
+            best = None
+            for i in range(10):
+                if i % 2 == 0:
+                    text, edit = text[:40] + '1' + text[40:], (40, 40, 41)
+                else:
+                    text, edit = text[:40] + text[41:], (40, 41, 40)
+                start = time.perf_counter()
+                stream.relex(lexer, text, *edit)
+                stream.line_index.line_col(len(text))
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings.append(best)
+        if timings[1] > timings[0] * 4 + 0.0005:
+            errors_log.append('relex scaling: %.3f ms -> %.3f ms for 10x file' % (timings[0] * 1000, timings[1] * 1000))
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_scaling_test(self, parser, tokenize):
+        # глубина стека парсера не должна зависеть от длины списков операторов и значений
+        programs = [
+            lambda n: 'program begin var a: integer; ' + 'a := a + 1; ' * n + 'end.',
+            lambda n: 'program var a: array[1..%s] of integer := (%s); begin a[1] := 2; end.'
+                      % (n, ', '.join(['1'] * n)),
+            lambda n: 'program function f(%s): none; begin return; end; begin f(%s); end.'
+                      % (', '.join('a%s: integer' % i for i in range(n)), ', '.join(['1'] * n)),
+        ]
+        errors_log = []
+        for i, program in enumerate(programs):
+            depths = []
+            for n in (1000, 4000):
+                probe = StackDepthProbe(tokenize(program(n)).lexer(), parser)
+                if parser.parse(lexer=probe) is None:
+                    errors_log.append('scaling test %s: parse error' % i)
+                depths.append(probe.max_depth)
+            if depths[0] != depths[1]:
+                errors_log.append('scaling test %s: parser stack depth grows %s' % (i, depths))
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_engine_test(self, parse):
+        # рекурсивный спуск должен строить то же дерево, что и yacc
+        errors_log = []
+        for key in tests.keys():
+            if not same_tree(parse(tests[key], 'ply'), parse(tests[key], 'rd')):
+                errors_log.append('engine error in test ' + key)
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_recovery_test(self, parse):
+        # все синтаксические ошибки за один проход, дерево из уцелевших операторов
+        prog = '''program p
+        begin
+            var a: integer := 1;
+            a := 2 +;
+            var b: integer := 3;
+            if a > 1 then
+            begin
+                b := (;
+                writeln(b);
+            end;
+            writeln(a)
+            c := 5;
+            while a do
+            begin
+                a := a +
+            end;
+            writeln(a);
+        end.'''
+        errors_log = []
+        for engine in ('ply', 'rd'):
+            errors = []
+            p = parse(prog, engine, errors)
+            if [(e.line, e.col, e.value) for e in errors] != [(4, 21, ';'), (8, 23, ';'), (12, 13, 'c'), (16, 13, 'end')]:
+                errors_log.append('recovery test %s: errors %s' % (engine, errors))
+            elif p is None or p.semantic_analysis(None).errors:
+                errors_log.append('recovery test %s: no tree' % engine)
+            else:
+                states = p.body.states[0].states
+                if [type(state) for state in states] != [ast.AssignNode, ast.AssignNode, ast.IfNode, ast.WhileNode,
+                                                         ast.WritelnNode]:
+                    errors_log.append('recovery test %s: states %s' % (engine, states))
+                elif len(states[2].then_body.states) != 1 or len(states[3].loop_body.states) != 0:
+                    errors_log.append('recovery test %s: block states' % engine)
+
+            errors = []
+            if parse('program begin a := 1;', engine, errors) is not None or len(errors) != 1 \
+                    or errors[0].value is not None:
+                errors_log.append('recovery test %s: end of input %s' % (engine, errors))
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_pipeline_test(self, code_generate, code_generate_pipeline):
+        # компиляция по одной функции (и в пуле процессов) дает тот же .j и те же ошибки, что и компиляция целиком
+        programs = dict(tests)
+        programs['syntax_errors'] = 'program p function f(): none; begin a := ; end; begin f(; end.'
+        errors_log = []
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for key, prog in programs.items():
+                results = []
+                generators = (code_generate, code_generate_pipeline, lambda path: code_generate_pipeline(path, jobs=2))
+                for i, generate in enumerate(generators):
+                    file_path = os.path.join(tmp_dir, '%s_%s' % (key, i))
+                    with open(file_path, 'w', encoding='utf-8') as file:
+                        file.write(prog)
+                    with redirect_stdout(io.StringIO()):  # ошибки сравниваются, а не печатаются
+                        errors = [str(e) for e in generate(file_path)]
+                    code = None
+                    if os.path.exists(file_path + '.j'):
+                        with open(file_path + '.j', encoding='utf-8') as file:
+                            code = file.read()
+                    results.append((errors, code))
+                if results[0] != results[1] or results[0] != results[2]:
+                    errors_log.append('pipeline error in test ' + key)
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_incremental_test(self, compiler_class, code_generate_pipeline):
+        # после каждой правки .j и ошибки как у компиляции по кускам, пересобраны только затронутые функции
+        prog = '''program inc
+        var g: integer := 1;
+        function a(n: integer): integer;
+        begin
+            return n + 1;
+        end;
+        function b(n: integer): integer;
+        begin
+            return a(n) * 2;
+        end;
+        function c(n: integer): integer;
+        begin
+            writeln(g);
+            return n - 1;
+        end;
+        begin
+            writeln(b(c(3)));
+        end.'''
+        # правки идут одна за другой: (что, старый текст, новый текст, сколько функций пересобрать)
+        edits = [
+            ('first', '', '', 3),
+            ('same', '', '', 0),
+            ('body', 'n + 1', 'n + 2', 1),  # a
+            ('signature', 'a(n: integer): integer', 'a(n: real): integer', 2),  # a, вызов в b
+            ('global value', 'g: integer := 1', 'g: integer := 2', 0),
+            ('global type', 'g: integer := 2', 'g: real := 2', 1),  # c
+            ('new function', 'begin\n            writeln(b(',
+             'function d(): none;\n        begin\n            writeln(c(1));\n        end;\n'
+             '        begin\n            writeln(b(', 1),  # d
+            ('syntax error', 'a(n) * 2', 'a(n) *', 1),  # b
+            ('fix', 'a(n) *', 'a(n) * 2', 1),  # b
+            ('undefined name', 'return n - 1', 'return zz', 1),  # c, код не генерируется
+            ('fix undefined name', 'return zz', 'return n - 1', 1),  # c
+            ('header', 'program inc', 'program inc2', 4),
+        ]
+        errors_log = []
+        compiler = compiler_class()
+        with tempfile.TemporaryDirectory() as tmp_dir, redirect_stdout(io.StringIO()):
+            file_path = os.path.join(tmp_dir, 'inc')
+            text = prog
+            for name, old, new, compiled in edits:
+                text = text.replace(old, new)
+                results = []
+                for generate in (compiler.code_generate, code_generate_pipeline):
+                    with open(file_path, 'w', encoding='utf-8') as file:
+                        file.write(text)
+                    if os.path.exists(file_path + '.j'):
+                        os.remove(file_path + '.j')
+                    errors = [str(e) for e in generate(file_path)]
+                    code = None
+                    if os.path.exists(file_path + '.j'):
+                        with open(file_path + '.j', encoding='utf-8') as file:
+                            code = file.read()
+                    results.append((errors, code))
+                if results[0] != results[1]:
+                    errors_log.append('incremental error in edit ' + name)
+                elif compiler.compiled != compiled:
+                    errors_log.append('incremental edit %s: %s functions compiled, expected %s'
+                                      % (name, compiler.compiled, compiled))
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_concurrency_test(self, compiler_class, programs: dict, jobs: int = 64):
+        # jobs одновременных компиляций, у каждого потока свой Compiler; .j как при последовательном запуске.
+        # Потоков столько же, сколько компиляций, и все стартуют вместе с барьера
+        names = list(programs.keys())
+        tasks = [(names[i % len(names)], ('ply', 'rd')[i % 2], i) for i in range(jobs)]
+        errors_log = []
+        barrier = threading.Barrier(jobs)
+        with tempfile.TemporaryDirectory() as tmp_dir, redirect_stdout(io.StringIO()):
+            def compile_task(task, tag):
+                name, engine, i = task
+                file_path = os.path.join(tmp_dir, '%s_%s_%s' % (name, i, tag))
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.write(programs[name])
+                try:
+                    if tag == 'thread':
+                        barrier.wait(timeout=60)
+                    compiler_class(engine).code_generate(file_path)
+                except Exception as e:
+                    return repr(e)
+                if not os.path.exists(file_path + '.j'):
+                    return None
+                with open(file_path + '.j', 'rb') as file:
+                    return file.read()
+
+            expected = [compile_task(task, 'serial') for task in tasks]
+            with ThreadPoolExecutor(max_workers=jobs) as pool:
+                results = list(pool.map(compile_task, tasks, ['thread'] * jobs))
+
+        for task, result, serial in zip(tasks, results, expected):
+            if result != serial or type(result) is not bytes:
+                errors_log.append('concurrency error in program %s (%s, job %s)' % task)
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_deep_test(self, compiler_class, budget: float = 20.0):
+        # длинные выражения и глубокая вложенность: без RecursionError и за ограниченное время;
+        # a читается, чтобы распространение констант не свернуло выражения
+        n, depth = 100000, 5000
+        programs = [
+            ('expression', 'program begin var a: integer; readln(a); a := %s; writeln(a); end.' % ' + '.join(['a'] * n),
+             lambda code: sum(1 for line in code if line == 'iadd') == n - 1),
+            ('nesting', 'program begin var a: integer; readln(a); %s a := a + 1; %s end.'
+             % ('if a > 0 then begin while a < 0 do begin ' * depth, 'end; end; ' * depth),
+             lambda code: sum(1 for line in code if line.startswith('LABEL_')) == 8 * depth),
+        ]
+        errors_log = []
+        for name, prog, check in programs:
+            start = time.perf_counter()
+            errors = []
+            try:
+                code = compiler_class().compile(prog, errors)
+            except RecursionError:
+                errors_log.append('deep test %s: RecursionError' % name)
+                continue
+            elapsed = time.perf_counter() - start
+            if code is None or len(errors) != 0 or not check(code):
+                errors_log.append('deep test %s: wrong code %s' % (name, errors))
+            elif elapsed > budget:
+                errors_log.append('deep test %s: %.1f s, budget %.1f s' % (name, elapsed, budget))
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_opt_test(self, compiler_class):
+        # -O0 без свертки, -O1 сворачивает и распространяет константы, -O2 еще убирает goto на следующую метку;
+        # на каждом уровне компиляция по одной функции дает тот же .j, что и целиком
+        prog = '''program begin var a: integer := 2 * 3 + 1; var b: real := 1; writeln(a);
+            readln(a); if a > 0 then writeln(a); writeln(b); end.'''
+        expected_passes = {
+            0: ['semantic', 'codegen'],
+            1: ['semantic', 'fold', 'propagate', 'dead', 'codegen'],
+            2: ['semantic', 'fold', 'propagate', 'dead', 'codegen', 'jumps'],
+        }
+        errors_log = []
+        codes = {}
+        for level, names in expected_passes.items():
+            compiler = compiler_class(opt_level=level, collect_stats=True)
+            errors = []
+            codes[level] = compiler.compile(prog, errors)
+            if codes[level] is None or len(errors) != 0:
+                errors_log.append('opt test -O%s: errors %s' % (level, errors))
+                return errors_log
+            if list(compiler.stats.keys()) != names or any(s.nodes <= 0 for s in compiler.stats.values()):
+                errors_log.append('opt test -O%s: wrong stats %s' % (level, list(compiler.stats.keys())))
+
+            # без collect_stats дерево после проходов не обходится, время есть
+            compiler = compiler_class(opt_level=level)
+            if compiler.compile(prog, []) != codes[level] or list(compiler.stats.keys()) != names \
+                    or any(s.nodes is not None for s in compiler.stats.values()):
+                errors_log.append('opt test -O%s: nodes counted without collect_stats' % level)
+
+        if 'imul' not in codes[0] or 'i2f' not in codes[0]:
+            errors_log.append('opt test -O0: constants are folded')
+        if 'imul' in codes[1] or 'i2f' in codes[1] or 'ldc                   7' not in codes[1]:
+            errors_log.append('opt test -O1: constants are not folded')
+        jumps = [i for i, line in enumerate(codes[2]) if line.startswith('goto')
+                 and codes[2][i + 1] == line.split()[1] + ':']
+        if len(codes[2]) >= len(codes[1]) or jumps:
+            errors_log.append('opt test -O2: jumps to next label are left')
+
+        # -O2: равные выражения после анализа - один объект
+        prog = 'program begin var a: integer := 1; var b: integer; b := a + 1; writeln(a + 1); end.'
+        for share in (False, True):
+            tree = compiler_class().parse(prog)
+            tree.semantic_analysis(None, share)
+            main = tree.body[0]
+            if (main[2].expr is main[3].expr) != share or (main[2].expr.arg1 is main[0].var) != share:
+                errors_log.append('opt test: shared nodes %s, expected %s' % (not share, share))
+
+        # повторное выражение-оператор родитель не сводит к общему: узел должен быть проанализирован сам
+        prog = '''program begin var x: integer; var a: array [1..2] of integer; readln(x);
+            var y: integer := x + 1; x + 1; y := a[1]; a[1]; writeln(y < x); y < x; end.'''
+        for level in (1, 2):
+            errors = []
+            try:
+                code = compiler_class(opt_level=level).compile(prog, errors)
+            except AttributeError as e:
+                code, errors = None, [e]
+            if code is None or len(errors) != 0:
+                errors_log.append('opt test -O%s: repeated expression statement: %s' % (level, errors))
+
+        try:
+            PassManager(3)
+            errors_log.append('opt test: unknown level accepted')
+        except ValueError:
+            pass
+
+        with tempfile.TemporaryDirectory() as tmp_dir, redirect_stdout(io.StringIO()):
+            for key, prog in tests.items():
+                for level in (0, 2):
+                    compiler = compiler_class('rd', opt_level=level)
+                    results = []
+                    for i, generate in enumerate((compiler.code_generate, compiler.code_generate_pipeline)):
+                        file_path = os.path.join(tmp_dir, '%s_%s_%s' % (key, level, i))
+                        with open(file_path, 'w', encoding='utf-8') as file:
+                            file.write(prog)
+                        generate(file_path)
+                        with open(file_path + '.j', encoding='utf-8') as file:
+                            results.append(file.read())
+                    if results[0] != results[1]:
+                        errors_log.append('opt test -O%s: pipeline differs in test %s' % (level, key))
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_tree_test(self, parse, budget: float = 10.0):
+        # печать дерева: списки детей раскрываются, ограничение глубины, глубокое дерево без рекурсии
+        errors_log = []
+        tree = parse('program begin var a: integer := 1; writeln(a + 2 * a); end.')
+        expected = [
+            'program prog',
+            '└ begin',
+            '  ├ :=',
+            '  │ ├ var a: integer',
+            '  │ └ 1:integer',
+            '  └ writeln (+)',
+            '    └ +',
+            '      ├ a(-1, None, NONE)',
+            '      └ *',
+            '        ├ 2:integer',
+            '        └ a(-1, None, NONE)',
+        ]
+        if tree.tree != expected:
+            errors_log.append('tree test: wrong tree %s' % tree.tree)
+        if list(tree.iter_tree(2)) != expected[:3] + ['  │ └ ...'] + expected[5:6] + ['    └ ...']:
+            errors_log.append('tree test: wrong depth limit %s' % list(tree.iter_tree(2)))
+        out = io.StringIO()
+        tree.write_tree(out)
+        if out.getvalue() != '\n'.join(expected) + '\n':
+            errors_log.append('tree test: wrong file output')
+
+        depth = 5000
+        tree = parse('program begin var a: integer := 1; %s a := a + 1; %s end.'
+                     % ('if a > 0 then begin ' * depth, 'end; ' * depth))
+        start = time.perf_counter()
+        try:
+            lines = sum(1 for _ in tree.iter_tree())
+        except RecursionError:
+            errors_log.append('tree test: RecursionError')
+            return errors_log
+        elapsed = time.perf_counter() - start
+        if lines != 5 * depth + 10:
+            errors_log.append('tree test: %s lines in deep tree' % lines)
+        elif elapsed > budget:
+            errors_log.append('tree test: %.1f s, budget %.1f s' % (elapsed, budget))
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_diagnostics_test(self, compiler_class):
+        # семантические ошибки всех операторов с позицией оператора (у вызова - имени функции) и кодом
+        prog = '''program p
+        begin
+            var a: integer := 1;
+            writeln(a + b);
+            a := f(1);
+            var a: real;
+        end.'''
+        expected = [(4, 13, 'undefined-var'), (5, 18, 'undefined-func'), (6, 13, 'redefined-var')]
+        errors_log = []
+        for engine in ('ply', 'rd'):
+            errors = []
+            compiler_class(engine).analyse(prog, errors)
+            found = [(*e.line_index.line_col(e.pos), e.code) for e in errors]
+            if found != expected:
+                errors_log.append('diagnostics test %s: errors %s' % (engine, found))
+            elif str(errors[0]) != 'Semantic error at line 4, column 13: Var is not defined: b':
+                errors_log.append('diagnostics test %s: message %s' % (engine, errors[0]))
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_const_test(self, compiler_class):
+        # константы подставляются значением на любом уровне, присваивание константе - ошибка
+        prog = '''program p
+        const N = 4;
+        var a: array [1..N] of integer;
+        begin
+            var i: integer;
+            for i := 1 to N do
+                a[i] := i * N;
+        end.'''
+        errors_log = []
+        for level in (0, 1):
+            errors = []
+            code = compiler_class(opt_level=level).compile(prog, errors)
+            if code is None or len(errors) != 0:
+                errors_log.append('const test -O%s: errors %s' % (level, errors))
+            elif any('/N ' in line for line in code) or 'ldc                   4' not in code:
+                errors_log.append('const test -O%s: constant is not inlined' % level)
+
+        # -O2: значение константы совпадает с уже проверенным общим выражением
+        prog = '''program begin var y: integer := 2 + 3; const B = 2 + 3; var a: array[1..B] of integer;
+            writeln(y + B); end.'''
+        for level in (1, 2):
+            errors = []
+            try:
+                code = compiler_class(opt_level=level).compile(prog, errors)
+            except AttributeError as e:
+                code, errors = None, errors + [e]
+            if code is None or len(errors) != 0:
+                errors_log.append('const test -O%s: shared value: errors %s' % (level, errors))
+
+        prog = '''program p
+        const N = 4;
+        var v: integer;
+        const M = v;
+        var a: array [1..v] of integer;
+        begin
+            N := 5;
+            readln(N);
+        end.'''
+        expected = [(4, 9, 'not-const'), (5, 9, 'array-bound'), (7, 15, 'const-assign'), (8, 13, 'const-assign')]
+        for engine in ('ply', 'rd'):
+            errors = []
+            compiler_class(engine).analyse(prog, errors)
+            found = [(*e.line_index.line_col(e.pos), e.code) for e in errors]
+            if found != expected:
+                errors_log.append('const test %s: errors %s' % (engine, found))
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_propagate_test(self, compiler_class):
+        # -O1: известные значения переменных, длина и элементы массива подставляются до присваивания,
+        # изменения в цикле и после ветвлений не подставляются
+        prog = '''program p
+        var g: integer;
+        function kernel(n: integer): integer;
+        begin
+            var a: array [1..4] of integer := (1, 2, 3, 4);
+            var s: integer := 0;
+            var k: integer := 3;
+            var i: integer;
+            s := k * a[2];
+            for i := 1 to a.length do
+                s := s + a[i] * k;
+            g := k;
+            if n > 0 then k := 1 else k := 2;
+            return s + k;
+        end;
+        function count(): integer;
+        begin
+            var j: integer := 0;
+            while j < 10 do
+                j := j + 1;
+            return j;
+        end;
+        begin
+            writeln(kernel(2) + count());
+        end.'''
+
+        def method(code, name):
+            start = next(i for i, line in enumerate(code) if line.startswith('.method') and ' %s(' % name in line)
+            return code[start:code.index('.end method', start)]
+
+        errors_log = []
+        kernels = {}
+        for level in (0, 1, 2):
+            errors = []
+            code = compiler_class(opt_level=level).compile(prog, errors)
+            if code is None or len(errors) != 0:
+                errors_log.append('propagate test -O%s: errors %s' % (level, errors))
+                return errors_log
+            kernel = kernels[level] = method(code, 'kernel')
+            k_loads = sum(1 for line in kernel if line.startswith('iload') and line.endswith(' 3'))
+            if level == 0:
+                if 'arraylength' not in kernel or k_loads != 4:
+                    errors_log.append('propagate test -O0: values are propagated')
+                continue
+            if 'arraylength' in kernel or 'ldc                   6' not in kernel or k_loads != 1:
+                errors_log.append('propagate test -O%s: values are not propagated' % level)
+            if not any(line.startswith('iaload') for line in kernel):
+                errors_log.append('propagate test -O%s: element with unknown index is propagated' % level)
+            if 'if_icmpge' not in ''.join(method(code, 'count')):
+                errors_log.append('propagate test -O%s: loop condition is folded' % level)
+        if len(kernels[1]) >= len(kernels[0]):
+            errors_log.append('propagate test: -O1 code is not shorter')
+
+        # строки сравниваются по длине: известные значения не должны менять результат сравнения
+        prog = '''program begin var s: string := "abc"; var t: string := "b";
+            if s < t then writeln(1) else writeln(2); end.'''
+        codes = [compiler_class(opt_level=level).compile(prog, []) for level in (0, 1)]
+        lengths = [sum(1 for line in code if line.endswith('String/length()I')) for code in codes]
+        if lengths[0] != 2 or lengths[1] != lengths[0] or not all('ldc                   1' in code for code in codes):
+            errors_log.append('propagate test: string comparison is folded')
+
+        # индекс у переменной, которая не массив: ошибка анализа, проход не падает
+        prog = 'program begin var x: integer := 1; x[1] := 2; writeln(x[1]); end.'
+        errors = []
+        try:
+            compiler_class().analyse(prog, errors)
+        except (AttributeError, TypeError) as e:
+            errors_log.append('propagate test: %r on indexed scalar' % e)
+        if not errors:
+            errors_log.append('propagate test: indexed scalar is accepted')
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_dead_code_test(self, compiler_class):
+        # -O1: ветви и циклы с известным условием и операторы после return не генерируются
+        prog = '''program p
+        function sign(x: integer): integer;
+        begin
+            if x > 0 then
+                return 1
+            else
+                return 0;
+            writeln("after if");
+        end;
+        function spin(): integer;
+        begin
+            var k: integer := 0;
+            while true do
+            begin
+                k := k + 1;
+                if k > 10 then return k;
+            end;
+            writeln("after while");
+        end;
+        begin
+            const DEBUG = false;
+            var i: integer;
+            if DEBUG then writeln("if");
+            while DEBUG do writeln("while");
+            for i := 5 to 1 do writeln("for");
+            writeln(sign(2) + spin() + i);
+        end.'''
+        dead = ['"after if"', '"after while"', '"if"', '"while"', '"for"']
+        errors_log = []
+        for level in (0, 1, 2):
+            errors = []
+            code = compiler_class(opt_level=level).compile(prog, errors)
+            if code is None or len(errors) != 0:
+                errors_log.append('dead code test -O%s: errors %s' % (level, errors))
+                return errors_log
+            found = [s for s in dead if any(line.endswith(' ' + s) for line in code)]
+            main = code[next(i for i, line in enumerate(code) if ' main(' in line):]
+            labels = sum(1 for line in main if line.startswith('LABEL_'))
+            if level == 0:
+                if found != dead:
+                    errors_log.append('dead code test -O0: code is removed %s' % found)
+            elif found or labels != 0 or 'putstatic             p/i I' not in main:
+                errors_log.append('dead code test -O%s: dead code %s, %s labels in main' % (level, found, labels))
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_types_test(self):
+        # типы интернированы, таблицы приведений совпадают с прежним выбором по приоритету
+        import typecaster as tc
+        errors_log = []
+        dte = vt.DataTypeEnum
+        if vt.DataType('real') is not vt.DataType(dte.float) or vt.DataType(vt.FLOAT_TYPE) is not vt.FLOAT_TYPE:
+            errors_log.append('types test: scalar type is not interned')
+        arr = vt.ArrayDataType('integer', 1, 5)
+        if arr is not vt.ArrayDataType(dte.int, 1, 5) or arr == vt.ArrayDataType(dte.int, 0, 4):
+            errors_log.append('types test: array type is not interned')
+        if arr != vt.ValListDataType(dte.int, 5) or arr == vt.ValListDataType(dte.float, 5) or arr == vt.INT_TYPE:
+            errors_log.append('types test: array type comparison')
+
+        expected = {('integer', 'real'): (tc.FLOAT_CASTER, dte.float), ('boolean', 'string'): (tc.STRING_CASTER, dte.string),
+                    ('boolean', 'integer'): (tc.INT_CASTER, dte.int), ('real', 'real'): (None, vt.FLOAT_TYPE),
+                    ('none', 'integer'): (None, dte.none)}
+        for (type1, type2), result in expected.items():
+            if tc.get_priority_caster(vt.DataType(type1), vt.DataType(type2)) != result:
+                errors_log.append('types test: priority of %s and %s' % (type1, type2))
+        if tc.get_priority_caster(arr, vt.INT_TYPE) != (None, None) or tc.get_caster(arr) is not None:
+            errors_log.append('types test: array is casted')
+
+        return errors_log if len(errors_log) != 0 else None
+
+    def run_ast_file_test(self, compiler_class, programs: dict):
+        # дерево из .ast дает тот же .j, что и компиляция исходника; устаревший .ast не используется
+        import ast_file
+        errors_log = []
+        with tempfile.TemporaryDirectory() as tmp_dir, redirect_stdout(io.StringIO()):
+            for key, prog in programs.items():
+                for level in (1, 2):
+                    file_path = os.path.join(tmp_dir, '%s_%s' % (key, level))
+                    with open(file_path, 'w', encoding='utf-8') as file:
+                        file.write(prog)
+                    results = []
+                    for _ in range(2):  # первый раз дерево сохраняется, второй - загружается
+                        compiler = compiler_class(opt_level=level)
+                        compiler.code_generate(file_path, True)
+                        with open(file_path + '.j', encoding='utf-8') as file:
+                            results.append(file.read())
+                    if 'semantic' in compiler.stats:
+                        errors_log.append('ast file test %s -O%s: tree is not loaded' % (key, level))
+                    elif results[0] != results[1]:
+                        errors_log.append('ast file test %s -O%s: code differs' % (key, level))
+
+            # общие узлы остаются общими
+            tree = compiler_class().parse('program begin var a: integer := 1; writeln(a + 1); writeln(a + 1); end.')
+            tree.semantic_analysis(None, True)
+            main = ast_file.loads(ast_file.dumps(tree)).body[0]
+            if main[1].expr is not main[2].expr or main[1].expr.arg1 is not main[0].var:
+                errors_log.append('ast file test: shared nodes are copied')
+            if main[1].expr.data_type is not vt.DataType('integer'):
+                errors_log.append('ast file test: loaded type is not interned')
+
+            file_path = os.path.join(tmp_dir, 'stale')
+            for text in ('program begin writeln(1); end.', 'program begin writeln(2); end.'):
+                with open(file_path, 'w', encoding='utf-8') as file:
+                    file.write(text)
+                compiler = compiler_class()
+                compiler.code_generate(file_path, True)
+            if 'semantic' not in compiler.stats:
+                errors_log.append('ast file test: stale tree is loaded')
+
+            with open(file_path + '.ast', 'r+b') as file:
+                file.seek(len(ast_file.MAGIC))
+                file.write(b'\xff\xff')
+            try:
+                ast_file.load(file_path + '.ast')
+                errors_log.append('ast file test: unknown version is loaded')
+            except ast_file.AstFormatError:
+                pass
+
+            # заголовок цел, данные обрезаны: дерево строится заново, файл перезаписывается
+            compiler_class().code_generate(file_path, True)
+            size = os.path.getsize(file_path + '.ast')
+            with open(file_path + '.ast', 'r+b') as file:
+                file.truncate(ast_file.HEADER.size + 10)
+            for _ in range(2):
+                compiler = compiler_class()
+                try:
+                    compiler.code_generate(file_path, True)
+                except Exception as e:
+                    errors_log.append('ast file test: truncated file: %r' % e)
+                    break
+            if 'semantic' in compiler.stats or os.path.getsize(file_path + '.ast') != size:
+                errors_log.append('ast file test: truncated file is not rewritten')
+            if any(name.endswith('.tmp') for name in os.listdir(tmp_dir)):
+                errors_log.append('ast file test: temporary file is left')
+
+        return errors_log if len(errors_log) != 0 else None
+
     def fill_func_list(self):
         self.func_dict['test_writeln_1']    = sem_check_test_writeln_1
         self.func_dict['test_for_1']        = sem_check_test_for_1
@@ -568,7 +1497,12 @@ class ProgTester:
         self.func_dict['test_if_else_4']    = sem_check_test_if_else_4
         self.func_dict['test_func_1']       = sem_check_test_func_1
         self.func_dict['test_func_2']       = sem_check_test_func_2
+        self.func_dict['test_func_3']       = sem_check_test_func_3
         self.func_dict['test_array_1']      = sem_check_test_array_1
         self.func_dict['test_array_2']      = sem_check_test_array_2
         self.func_dict['test_array_3']      = sem_check_test_array_3
         self.func_dict['test_func_array_1'] = sem_check_test_func_array_1
+        self.func_dict['test_lexer_1']      = sem_check_test_lexer_1
+        self.func_dict['test_scope_1']      = sem_check_test_scope_1
+        self.func_dict['test_comment_1']    = sem_check_test_comment_1
+        self.func_dict['test_const_1']      = sem_check_test_const_1
@@ -0,0 +1,173 @@
+from array import array
+from typing import List, Tuple
+from ply.lex import LexToken
+from source_file import GapOffsets, LineIndex
+
+
+# значения токенов хранятся как срез исходника и приводятся только по запросу
+VALUE_CONVERTERS = {
+    'INT': int,
+    'FLOAT': float,
+    'BOOL': lambda s: s == 'true',
+}
+
+
+class TokenStream:
+    '''
+    Токены в трех массивах: вид, начало, длина. Начала хранятся в GapOffsets, чтобы правка (relex)
+    не сдвигала весь хвост; starts - все начала от начала текста, start(i) и sub - без перевода хвоста
+    '''
+    def __init__(self, text: str, token_types: List[str]):
+        self.text = text
+        self.token_types = token_types
+        self.type_ids = {name: i for i, name in enumerate(token_types)}
+        self.kinds = array('i')
+        self.offsets = GapOffsets(array('i'), len(text))
+        self.lengths = array('i')
+        self.line_index = LineIndex(text)
+
+    @property
+    def starts(self) -> array:
+        return self.offsets.absolute()
+
+    @starts.setter
+    def starts(self, starts: array):
+        self.offsets = GapOffsets(starts, len(self.text))
+
+    def start(self, i: int) -> int:
+        return self.offsets[i]
+
+    @staticmethod
+    def from_lexer(lexer, text: str, token_types: List[str]) -> 'TokenStream':
+        stream = TokenStream(text, token_types)
+        type_ids = stream.type_ids
+        kinds_append = stream.kinds.append
+        starts = array('i')
+        starts_append = starts.append
+        lengths_append = stream.lengths.append
+
+        lexer.input(text)
+        get_token = lexer.token
+        while True:
+            tok = get_token()
+            if not tok:
+                break
+            kinds_append(type_ids[tok.type])
+            starts_append(tok.lexpos)
+            lengths_append(lexer.lexpos - tok.lexpos)
+        stream.starts = starts
+        return stream
+
+    def sub(self, first: int, stop: int) -> 'TokenStream':
+        # токены [first:stop] отдельным потоком: текст, таблица строк и смещения общие
+        stream = TokenStream.__new__(TokenStream)
+        stream.text = self.text
+        stream.token_types = self.token_types
+        stream.type_ids = self.type_ids
+        stream.kinds = self.kinds[first:stop]
+        stream.offsets = GapOffsets(self.offsets.slice(first, stop), len(self.text))
+        stream.lengths = self.lengths[first:stop]
+        stream.line_index = self.line_index
+        return stream
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def type(self, i: int) -> str:
+        return self.token_types[self.kinds[i]]
+
+    def text_of(self, i: int) -> str:
+        start = self.offsets[i]
+        return self.text[start:start + self.lengths[i]]
+
+    def value(self, i: int):
+        converter = VALUE_CONVERTERS.get(self.type(i))
+        text = self.text_of(i)
+        return converter(text) if converter is not None else text
+
+    def line_col(self, i: int) -> Tuple[int, int]:
+        return self.line_index.line_col(self.offsets[i])
+
+    def relex(self, lexer, text: str, edit_start: int, old_end: int, new_end: int) -> Tuple[int, int, int]:
+        '''
+        Перелексирует поток после правки: text[edit_start:new_end] заменил
+        старый фрагмент [edit_start:old_end]. Сканирование начинается с токена
+        перед правкой и останавливается, как только новый токен за правкой
+        начинается там же, где старый (лексер без состояний, дальше потоки совпадают).
+        Хвост за правкой не переписывается (GapOffsets), таблица строк правится на месте.
+        Возвращает (first, old_stop, new_stop): токены [first:old_stop] заменены на [first:new_stop]
+        '''
+        delta = new_end - old_end
+        kinds, starts, lengths = self.kinds, self.offsets, self.lengths
+        count = len(kinds)
+
+        # первый токен, который заканчивается не раньше правки, и еще один перед ним,
+        # т.к. токен может зависеть от символов сразу за своим концом (1. -> 1.5)
+        first = starts.bisect_left(edit_start)
+        if first > 0 and starts[first - 1] + lengths[first - 1] >= edit_start:
+            first -= 1
+        first = max(first - 1, 0)
+
+        new_kinds, new_starts, new_lengths = array('i'), array('i'), array('i')
+        type_ids = self.type_ids
+        old = first
+        lexer.input(text)
+        lexer.lexpos = starts[first] if first < count else edit_start
+        while True:
+            tok = lexer.token()
+            if not tok:
+                old = count
+                break
+            pos = tok.lexpos
+            if pos >= new_end:
+                while old < count and starts[old] + delta < pos:
+                    old += 1
+                if old < count and starts[old] + delta == pos:
+                    break
+            new_kinds.append(type_ids[tok.type])
+            new_starts.append(pos)
+            new_lengths.append(lexer.lexpos - pos)
+
+        new_stop = first + len(new_kinds)
+        kinds[first:old] = new_kinds
+        starts.replace(first, old, new_starts, len(text))
+        lengths[first:old] = new_lengths
+
+        self.text = text
+        self.line_index.relex(text, edit_start, old_end, new_end)
+        return first, old, new_stop
+
+    def lexer(self) -> 'TokenStreamLexer':
+        return TokenStreamLexer(self)
+
+
+class StreamToken(LexToken):
+    # номер строки считается только если его кто-то спросил
+    @property
+    def lineno(self):
+        return self.line_index.line(self.lexpos)
+
+
+class TokenStreamLexer:
+    '''
+    Адаптер для yacc: отдает токены потока по одному через token(),
+    LexToken создается только для текущего токена
+    '''
+    def __init__(self, stream: TokenStream):
+        self.stream = stream
+        self.starts = stream.starts
+        self.pos = 0
+
+    def token(self):
+        stream = self.stream
+        i = self.pos
+        if i >= len(stream.kinds):
+            return None
+        self.pos = i + 1
+
+        tok = StreamToken()
+        tok.type = stream.type(i)
+        tok.value = stream.value(i)
+        tok.lexpos = self.starts[i]
+        tok.line_index = stream.line_index
+        return tok
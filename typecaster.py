@@ -1,4 +1,4 @@
-from vartypes import DataTypeEnum, DataType
+from vartypes import DataTypeEnum, DataType, SCALAR_TYPES, INT_TYPE, FLOAT_TYPE, BOOL_TYPE, STRING_TYPE
 from abc import abstractmethod
 from typing import Tuple
 
@@ -38,7 +38,7 @@ class IntCaster(TypeCaster):
         return int(value)
 
     def get_type(self):
-        return DataType(DataTypeEnum.int)
+        return INT_TYPE
 
 
 class FloatCaster(TypeCaster):
@@ -59,7 +59,7 @@ class FloatCaster(TypeCaster):
         return float(value)
 
     def get_type(self):
-        return DataType(DataTypeEnum.float)
+        return FLOAT_TYPE
 
 
 class BoolCaster(TypeCaster):
@@ -83,7 +83,7 @@ class BoolCaster(TypeCaster):
                 return True
 
     def get_type(self):
-        return DataType(DataTypeEnum.bool)
+        return BOOL_TYPE
 
 
 class StringCaster(TypeCaster):
@@ -105,25 +105,31 @@ class StringCaster(TypeCaster):
         return str(value)
 
     def get_type(self):
-        return DataType(DataTypeEnum.string)
+        return STRING_TYPE
+
+
+# приведения без состояния: по одному объекту на тип
+INT_CASTER = IntCaster()
+FLOAT_CASTER = FloatCaster()
+BOOL_CASTER = BoolCaster()
+STRING_CASTER = StringCaster()
+
+# по type_id простого типа
+CASTERS = (None, INT_CASTER, FLOAT_CASTER, BOOL_CASTER, STRING_CASTER)
 
 
 def get_caster_and_type(object_type: DataTypeEnum)->Tuple[TypeCaster, DataTypeEnum]:
-    if object_type == DataTypeEnum.string:
-        return StringCaster(), DataTypeEnum.string
-    if object_type == DataTypeEnum.float:
-        return FloatCaster(), DataTypeEnum.float
-    if object_type == DataTypeEnum.int:
-        return IntCaster(), DataTypeEnum.int
-    if object_type == DataTypeEnum.bool:
-        return BoolCaster(), DataTypeEnum.bool
+    caster = get_caster(object_type)
+    return (caster, caster.get_type().dte) if caster is not None else None
 
 
 def get_caster(object_type: DataTypeEnum):
-    return get_caster_and_type(object_type)[0]
+    # массивам и спискам значений приведения нет
+    data_type = DataType(object_type) if type(object_type) is DataTypeEnum else object_type
+    return CASTERS[data_type.type_id] if data_type.type_id < len(CASTERS) else None
 
 
-def get_priority_caster(type1: DataType, type2: DataType)->Tuple[TypeCaster, DataTypeEnum]:
+def _priority_caster(type1: DataType, type2: DataType)->Tuple[TypeCaster, DataTypeEnum]:
     '''
     string -> float -> int -> bool
     string -> string
@@ -136,10 +142,21 @@ def get_priority_caster(type1: DataType, type2: DataType)->Tuple[TypeCaster, Dat
     if type1 == type2:
         return None, type1
 
-    if type(type1) is DataType and type(type2) is DataType:
-        if priority[type2.dte] > priority[type1.dte]:
-            type1, type2 = type2, type1
+    if priority[type2.dte] > priority[type1.dte]:
+        type1, type2 = type2, type1
+
+    return get_caster_and_type(type1.dte)
+
 
-        return get_caster_and_type(type1.dte)
+# PRIORITY[type_id1][type_id2] - результат get_priority_caster для простых типов
+PRIORITY = tuple(tuple(_priority_caster(type1, type2) for type2 in SCALAR_TYPES) for type1 in SCALAR_TYPES)
+
+
+def get_priority_caster(type1: DataType, type2: DataType)->Tuple[TypeCaster, DataTypeEnum]:
+    if type1.type_id < len(SCALAR_TYPES) and type2.type_id < len(SCALAR_TYPES):
+        return PRIORITY[type1.type_id][type2.type_id]
+
+    if type1 == type2:  # массивы
+        return None, type1
 
     return None, None
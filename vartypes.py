@@ -1,3 +1,4 @@
+import threading
 from enum import Enum
 from typing import Union
 
@@ -6,6 +7,7 @@ class VarType(Enum):
     LOCAL = 'LOCAL'
     GLOBAL = 'GLOBAL'
     PARAM = 'PARAM'
+    CONST = 'CONST'
     NONE = 'NONE'
 
 
@@ -24,33 +26,50 @@ class DataTypeEnum(Enum):
         elif self.none: return 'NONE'
 
 
+TYPES = []  # type_id -> тип
+_types = {}  # ключ типа -> тип
+_types_lock = threading.Lock()
+
+
+def _intern(cls, key, dte: DataTypeEnum, **fields):
+    # заводит тип один раз; под блокировкой, т.к. компиляции идут и в потоках
+    with _types_lock:
+        data_type = _types.get(key)
+        if data_type is None:
+            data_type = object.__new__(cls)
+            data_type.dte = dte
+            data_type.elem_id = _ELEM_IDS[dte]
+            for name, value in fields.items():
+                setattr(data_type, name, value)
+            data_type.type_id = len(TYPES)
+            TYPES.append(data_type)
+            _types[key] = data_type
+        return data_type
+
+
 class DataType:
-    def __init__(self, data_type: Union[str, DataTypeEnum]):
-        if type(data_type) is str:
-            self.dte = self.get_data_type_enum(data_type)
-        elif type(data_type) is DataTypeEnum:
-            self.dte = data_type
-        elif type(data_type) is DataType:
-            self.dte = data_type.data_type
+    '''
+    Типы интернированы: DataType('integer'), DataType(DataTypeEnum.int) - один и тот же объект,
+    поэтому равные типы сравниваются по is и не меняются после создания.
+    type_id - номер типа в таблицах (приведения, приоритеты, дескрипторы JVM): у простых типов
+    он совпадает с номером в DataTypeEnum, elem_id - номер простого типа элементов
+    '''
+    __slots__ = ('dte', 'type_id', 'elem_id')
+    def __new__(cls, data_type: Union[str, DataTypeEnum]):
+        dte = DataType.to_dte(data_type)
+        return _types.get(dte) or _intern(cls, dte, dte)
+
+    def __getnewargs__(self):
+        return (self.dte.value,)
 
     def __str__(self):
         return str(self.dte.value)
 
     def __eq__(self, other):
-        if type(other) is DataType:
-            return self.dte == other.dte
-        if type(other) is DataTypeEnum:
-            return self.dte == other
-
-        return False
+        return other is self or other is self.dte
 
     def __ne__(self, other):
-        if type(other) is DataType:
-            return self.dte != other.dte
-        if type(other) is DataTypeEnum:
-            return self.dte != other
-
-        return True
+        return other is not self and other is not self.dte
 
     def can_casted_to(self, data_type):
         if data_type == DataTypeEnum.string and self.dte != data_type:
@@ -58,6 +77,14 @@ class DataType:
         else:
             return True
 
+    @staticmethod
+    def to_dte(data_type) -> DataTypeEnum:
+        if type(data_type) is DataTypeEnum:
+            return data_type
+        if isinstance(data_type, DataType):
+            return data_type.dte
+        return DataType.get_data_type_enum(data_type)
+
     @staticmethod
     def get_data_type_enum(data_type: str)->DataTypeEnum:
         if data_type == 'integer':
@@ -75,72 +102,55 @@ class DataType:
 
 
 class ArrayDataType(DataType):
-    def __init__(self, data_type: Union[str, DataTypeEnum], first_index: int, last_index: int):
-        super().__init__(data_type)
-        self.first_index = first_index
-        self.last_index = last_index
-        self.length = last_index - first_index + 1
+    # один объект на (тип элементов, первый индекс, последний индекс)
+    __slots__ = ('first_index', 'last_index', 'length')
+    def __new__(cls, data_type: Union[str, DataTypeEnum], first_index: int, last_index: int):
+        dte = DataType.to_dte(data_type)
+        key = (ArrayDataType, dte, first_index, last_index)
+        return _types.get(key) or _intern(cls, key, dte, first_index=first_index, last_index=last_index,
+                                          length=last_index - first_index + 1)
+
+    def __getnewargs__(self):
+        return self.dte.value, self.first_index, self.last_index
 
     def __str__(self):
         return 'array [' + str(self.first_index) + '..' + str(self.last_index) + '] of ' + str(self.dte)
 
     def __eq__(self, other: DataType):
-        if type(other) is DataTypeEnum:
-            return False
-
-        if self.dte == other.dte:
-            if type(other) is ArrayDataType:
-                if self.first_index == other.first_index and self.last_index == other.last_index:
-                    return True
-            elif type(other) is ValListDataType:
-                if self.last_index - self.first_index + 1 == other.length:
-                    return True
-        return False
+        # равные массивы - один объект; со списком значений - по длине
+        return other is self or type(other) is ValListDataType and other.dte is self.dte and other.length == self.length
 
     def __ne__(self, other: DataType):
-        if type(other) is DataTypeEnum:
-            return True
-
-        if self.dte == other.dte:
-            if type(other) is ArrayDataType:
-                if self.first_index == other.first_index and self.last_index == other.last_index:
-                    return False
-            elif type(other) is ValListDataType:
-                if self.last_index - self.first_index + 1 == other.length:
-                    return False
-        return True
+        return not self.__eq__(other)
 
     def can_casted_to(self, data_type):
         return False
 
 
 class ValListDataType(DataType):
-    def __init__(self, data_type: Union[str, DataTypeEnum], length: int):
-        super().__init__(data_type)
-        self.length = length
+    __slots__ = ('length',)
+    def __new__(cls, data_type: Union[str, DataTypeEnum], length: int):
+        dte = DataType.to_dte(data_type)
+        key = (ValListDataType, dte, length)
+        return _types.get(key) or _intern(cls, key, dte, length=length)
+
+    def __getnewargs__(self):
+        return self.dte.value, self.length
 
     def __str__(self):
         return 'val_list len = ' + str(self.length) + ' of ' + str(self.dte)
 
     def __eq__(self, other: DataType):
-        if self.dte == other.dte:
-            if type(other) is ValListDataType:
-                if self.length == other.length:
-                    return True
-            elif type(other) is ArrayDataType:
-                if self.length == other.last_index - other.first_index + 1:
-                    return True
-        return False
+        return other is self or type(other) is ArrayDataType and other.dte is self.dte and other.length == self.length
 
     def __ne__(self, other: DataType):
-        if self.dte == other.dte:
-            if type(other) is ValListDataType:
-                if self.length == other.length:
-                    return False
-            elif type(other) is ArrayDataType:
-                if self.length == other.last_index - other.first_index + 1:
-                    return False
-        return True
+        return not self.__eq__(other)
 
     def can_casted_to(self, data_type):
-        return False
\ No newline at end of file
+        return False
+
+
+_ELEM_IDS = {dte: i for i, dte in enumerate(DataTypeEnum)}
+# простые типы заводятся первыми: их type_id - номера в DataTypeEnum
+SCALAR_TYPES = tuple(DataType(dte) for dte in DataTypeEnum)
+NONE_TYPE, INT_TYPE, FLOAT_TYPE, BOOL_TYPE, STRING_TYPE = SCALAR_TYPES